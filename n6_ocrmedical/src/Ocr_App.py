@@ -2,18 +2,29 @@
 # OCR - Medical (PySide6) — 12x12 Grid Refactor
 # ============================================================
 
-import sys, os
+import sys, os, time
+from functools import partial
 from datetime import datetime
 from typing import List
 from PySide6.QtCore import Qt, QSize, QTimer, Signal
 from PySide6.QtGui import QFontMetrics, QPainter, QPen, QColor, QIcon, QPixmap
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QFrame, QPushButton, QLabel, QListWidget, QListWidgetItem,
+    QFrame, QPushButton, QLabel, QListView, QAbstractItemView,
     QFileDialog, QSizePolicy, QLineEdit, QButtonGroup, QStackedWidget, QSpacerItem,
-    QGridLayout,
+    QGridLayout, QSpinBox, QCheckBox,
 )
-from PySide6.QtCore import QThread, Signal as CoreSignal, QObject
+from PySide6.QtCore import QThread, Signal as CoreSignal, QObject, QRunnable, QThreadPool
+from file_list_model import FileListModel, UploadRowDelegate, HistoryDelegate, format_size
+from ocr_errors import OCRCancelled, describe_error
+from ocr_metrics import JobTrace, get_metrics
+from metrics_view import MetricsDialog
+from search_box import SearchBox
+from search_index import get_search_index
+from job_store import DONE, FAILED, file_hash, get_job_store
+from folder_watcher import FolderWatcher
+from phash_index import get_phash_index
+from job_manager import BACKGROUND, INTERACTIVE, PREFETCH, JobManager
 
 # =========================
 # 1) HẰNG SỐ & THIẾT KẾ
@@ -39,6 +50,31 @@ FILE_LIST_HEIGHT = 80
 # Căn menu trái thẳng với DropZone
 SIDE_MENU_ALIGN_WITH_DROP = 44
 
+# OCR
+OCR_PROMPT = "Please extract text from this medical test image."
+OCR_MAX_WORKERS = 0  # số request OCR chạy song song khi "OCR all"; 0 = Auto (limiter của client tự chỉnh)
+OCR_STREAM = True    # nút Result: hiện text dần theo từng token
+OCR_TILED  = False   # ảnh dài: cắt dải ngang, OCR song song rồi ghép (tắt stream)
+OCR_CASCADE = False  # OCR ảnh nhỏ trước, chỉ gửi lại cỡ đầy đủ khi text không đạt (batch / prefetch, không áp dụng khi stream)
+
+# Prefetch: chọn 1 dòng -> decode preview + OCR (ưu tiên thấp) file đó và PREFETCH_AHEAD dòng kế tiếp
+PREFETCH_ENABLED  = False  # bật/tắt bằng ô "Prefetch" cạnh nút OCR all
+PREFETCH_AHEAD    = 2
+PREFETCH_DELAY_MS = 150    # chờ selection đứng yên (giữ phím mũi tên) rồi mới prefetch
+
+# File copy (cùng sha256) của ảnh đã OCR -> dùng lại kết quả, không gọi model.
+# Ảnh gần trùng (dHash giống >= DEDUP_SIMILARITY) chỉ được đánh dấu Duplicate để người dùng xem lại:
+# phiếu cùng mẫu của 2 bệnh nhân khác nhau cũng giống > 99% theo dHash, không được dùng lại text.
+DEDUP_ENABLED    = True
+DEDUP_SIMILARITY = 0.97
+
+# Quét thư mục nền: gửi kết quả về GUI theo từng lô
+SCAN_BATCH_SIZE = 500
+
+# History đọc từ JobStore: số job gần nhất, gom nhiều lần xong job thành 1 lần nạp lại
+HISTORY_LIMIT = 200
+HISTORY_REFRESH_MS = 500
+
 GREETING_ICONS = {
     "morning":   "n6_ocrmedical/resources/logo/sun.png",
     "afternoon": "n6_ocrmedical/resources/logo/cloud.png",
@@ -52,14 +88,7 @@ GREETING_ICONS = {
 
 def human_size(path: str) -> str:
     try:
-        size = os.path.getsize(path)
-        if size < 1024:
-            return "1 KB"
-        kb = size // 1024
-        if kb < 1024:
-            return f"{kb} KB"
-        mb = size / (1024 * 1024)
-        return f"{mb:.1f} MB" if mb < 10 else f"{int(mb)} MB"
+        return format_size(os.path.getsize(path))
     except Exception:
         return "--"
 
@@ -72,61 +101,6 @@ def elide(text: str, widget: QWidget, width: int) -> str:
 # 3) WIDGET TÁI DÙNG
 # =========================
 
-class HistoryItem(QWidget):
-    def __init__(self, filename: str, size_text: str = "--"):
-        super().__init__()
-        lay = QHBoxLayout(self)
-        lay.setContentsMargins(8, 5, 8, 5)
-        lay.setSpacing(6)
-
-        icon = QLabel("📄"); icon.setFixedWidth(16)
-        name = QLabel(filename); name.setStyleSheet("font-weight:600; color:#2d3748;")
-        size = QLabel(size_text); size.setStyleSheet("color:#6b7280; font-size:11px;")
-        caret = QLabel("▾")
-        caret.setStyleSheet("color:#9aa3af; font-size:14px;")
-        caret.setFixedWidth(16); caret.setAlignment(Qt.AlignCenter)
-
-        col = QVBoxLayout(); col.setSpacing(0)
-        col.addWidget(name); col.addWidget(size)
-
-        lay.addWidget(icon)
-        lay.addLayout(col)
-        lay.addStretch()
-        lay.addWidget(caret)
-
-
-class UploadRow(QWidget):
-    def __init__(self, idx: int, filename: str, size_text: str, status: str = "Ready"):
-        super().__init__()
-        self.setStyleSheet("QLabel{background:transparent;}")
-        lay = QHBoxLayout(self)
-        lay.setContentsMargins(4, 4, 4, 4)
-        lay.setSpacing(8)
-
-        idx_lbl = QLabel(f"{idx:02d}")
-        idx_lbl.setFixedWidth(26)
-        idx_lbl.setAlignment(Qt.AlignCenter)
-        idx_lbl.setStyleSheet("font-weight:700; color:#111827;")
-
-        name_lbl = QLabel(filename)
-        name_lbl.setStyleSheet("font-weight:600; color:#1f2937;")
-        name_lbl.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
-        name_lbl.setToolTip(filename)
-
-        status_lbl = QLabel(status)
-        status_lbl.setStyleSheet("color:#2e7d32; font-weight:600;")
-        status_lbl.setFixedWidth(84)
-
-        size_lbl = QLabel(size_text)
-        size_lbl.setStyleSheet("color:#6b7280;")
-        size_lbl.setFixedWidth(70)
-
-        lay.addWidget(idx_lbl)
-        lay.addWidget(name_lbl, 2)
-        lay.addWidget(status_lbl, 0)
-        lay.addWidget(size_lbl, 0, Qt.AlignRight)
-
-
 class DropZone(QWidget):
     def __init__(self, on_files_added, icon_path="n6_ocrmedical/resources/logo/arrow.png", icon_size=64, gap=2):
         super().__init__()
@@ -178,27 +152,245 @@ class DropZone(QWidget):
             self.on_files_added(files)
 
 
-class OCRWorker(QObject):
-    finished = Signal(str)  # emit khi xong OCR (trả về text)
+def begin_job(path: str, trace: JobTrace):
+    """Ghi job Running vào JobStore; trả về kết quả dùng lại được (không cần gọi model):
+    file đã OCR xong với cùng nội dung, hoặc 1 file khác có đúng cùng nội dung (sha256).
+    """
+    st = os.stat(path)  # trước khi hash: file đổi giữa chừng -> mtime khác, lần sau hash lại
+    with trace.span("hash"):
+        content_hash = file_hash(path)
+    store = get_job_store()
+    done = store.start(path, content_hash, st.st_size, st.st_mtime_ns)
+    if done is not None or not DEDUP_ENABLED:
+        return done
+    copy_of = store.find_done(content_hash, exclude=path)
+    if copy_of is None:
+        return None
+    trace.set(duplicate_of=copy_of[0], similarity=1.0)
+    save_result(path, copy_of[1], trace)
+    return copy_of[1]
+
+
+def stored_result(path: str):
+    """Kết quả Done trong JobStore nếu file vẫn đúng nội dung lúc OCR (đã bị ghi đè / xóa -> None).
+
+    Gọi trên GUI thread: size + mtime không đổi thì tin kết quả cũ, chỉ hash lại file khi chúng đổi.
+    """
+    store = get_job_store()
+    done = store.done_entry(path)
+    if done is None:
+        return None
+    result, content_hash, size, mtime_ns = done
+    try:
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+            return result
+        if file_hash(path) != content_hash:
+            return None
+    except OSError:
+        return None
+    store.set_stat(path, st.st_size, st.st_mtime_ns)
+    return result
+
+
+def save_result(path: str, text: str, trace: JobTrace):
+    """Ghi kết quả OCR vào JobStore + chỉ mục tìm kiếm (gọi trên thread worker, không chặn GUI)."""
+    try:
+        get_job_store().finish(path, text, trace.stages)
+    except Exception as e:  # DB hỏng / đĩa đầy không được làm hỏng kết quả OCR
+        print(f"[WARN] job store: {e}", file=sys.stderr)
+    try:
+        get_search_index().add(path, text)
+    except Exception as e:
+        print(f"[WARN] search index: {e}", file=sys.stderr)
+
 
-    def __init__(self, image_path, prompt):
+def save_cancelled(path: str):
+    """Hủy (Back, chọn dòng khác, nạp lại thư mục) không phải lỗi: trả job về hàng đợi."""
+    try:
+        get_job_store().requeue(path)
+    except Exception as e:
+        print(f"[WARN] job store: {e}", file=sys.stderr)
+
+
+def save_failure(path: str, error, trace: JobTrace):
+    try:
+        get_job_store().fail(path, describe_error(error), trace.stages)
+    except Exception as e:
+        print(f"[WARN] job store: {e}", file=sys.stderr)
+
+
+def _ocr_trace(job, path: str, **info) -> JobTrace:
+    trace = JobTrace("ui_job", path)
+    trace.add("queue_wait", (time.time() - job.queued_at) * 1000)
+    trace.set(**info)
+    return trace
+
+
+def _run_traced(job, path: str, trace: JobTrace, ocr):
+    """begin_job -> ocr() -> lưu kết quả; ghi metrics. Dùng chung cho job Result và batch."""
+    try:
+        result = begin_job(path, trace)
+        if result is not None:
+            job.info.update(trace.info)  # duplicate_of / similarity nếu dùng lại ảnh gần trùng
+            return result
+        job.check()
+        with trace.span("ocr"):
+            result = ocr()
+    except OCRCancelled:
+        trace.set(cancelled=True)
+        get_metrics().emit(trace)
+        save_cancelled(path)
+        raise
+    except Exception as e:
+        trace.set(error=f"{type(e).__name__}: {e}")
+        get_metrics().emit(trace)
+        save_failure(path, e, trace)
+        raise
+    get_metrics().emit(trace)
+    save_result(path, result, trace)
+    return result
+
+
+def result_job(job, image_path: str, prompt: str, stream: bool = False, tiled: bool = False,
+               cascade: bool = False):
+    """Job của nút Result (INTERACTIVE): stream token / trang về ResultPage qua job.delta."""
+    from lmstudio_client import call_qwen_ocr, stream_qwen_ocr
+    from page_source import is_document
+    doc = is_document(image_path)
+    urgent = job.priority >= INTERACTIVE  # prefetch cũng chạy result_job nhưng không được chen trước batch
+    trace = _ocr_trace(job, image_path, mode="stream" if stream else "single", tiled=tiled,
+                       cascade=cascade)
+
+    def on_page(page_no: int, total: int, text: str):
+        job.check()
+        job.delta(f"--- Page {page_no} ---\n{text}\n\n")
+
+    def ocr():
+        if stream and not tiled and not doc:
+            parts = []
+            t0 = time.perf_counter()
+            gen = stream_qwen_ocr(image_path, prompt, urgent=urgent)
+            try:
+                for d in gen:
+                    job.check()  # hủy -> đóng generator, ngắt kết nối stream
+                    if not parts:
+                        trace.add("first_token", (time.perf_counter() - t0) * 1000)
+                    parts.append(d)
+                    job.delta(d)
+            finally:
+                gen.close()
+            return "".join(parts)
+        # dải song song không stream token được; PDF/TIFF thì stream theo từng trang
+        return call_qwen_ocr(image_path, prompt, tiled=tiled, on_page=on_page if stream and doc else None,
+                             cascade=cascade, urgent=urgent)
+
+    return _run_traced(job, image_path, trace, ocr)
+
+
+def batch_job(job, image_path: str, prompt: str, tiled: bool = False, cascade: bool = False):
+    """1 ảnh trong batch "OCR all" / watch-folder (BACKGROUND)."""
+    from lmstudio_client import call_qwen_ocr
+    trace = _ocr_trace(job, image_path, mode="batch", tiled=tiled, cascade=cascade)
+
+    def on_page(page_no: int, total: int, text: str):
+        job.check()
+        if page_no < total:
+            job.progress(f"Page {page_no + 1}/{total}")
+
+    return _run_traced(job, image_path, trace,
+                       lambda: call_qwen_ocr(image_path, prompt, tiled=tiled, on_page=on_page,
+                                             cascade=cascade))
+
+
+class DirScanWorker(QObject):
+    """Quét thư mục bằng os.scandir trên thread riêng, gửi về từng lô file ảnh."""
+    batch    = Signal(int, list, list, dict)  # (scan_id, paths, sizes, path -> (status, error))
+    finished = Signal(int, int)         # (scan_id, tổng số file)
+
+    def __init__(self, scan_id: int, folder: str, extensions=None, batch_size: int = SCAN_BATCH_SIZE):
         super().__init__()
-        self.image_path = image_path
-        self.prompt = prompt
+        self.scan_id = scan_id
+        self.folder = folder
+        self.extensions = tuple(extensions) if extensions else None
+        self.batch_size = batch_size
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @staticmethod
+    def _states(paths) -> dict:
+        # chỉ Done/Failed có nghĩa với list mới quét; Queued/Running cũ hiện lại là Ready
+        try:
+            states = get_job_store().statuses(paths)
+        except Exception:
+            return {}
+        return {p: st for p, st in states.items() if st[0] in (DONE, FAILED)}
 
     def run(self):
-        from lmstudio_client import call_qwen_ocr
+        paths, sizes, total = [], [], 0
         try:
-            result = call_qwen_ocr(self.image_path, self.prompt)
-        except Exception as e:
-            result = f"[ERROR] {e}"
-        self.finished.emit(result)
+            with os.scandir(self.folder) as it:
+                for e in it:
+                    if self._cancelled:
+                        break
+                    try:
+                        if not e.is_file():
+                            continue
+                        if self.extensions and not e.name.lower().endswith(self.extensions):
+                            continue
+                        size = e.stat().st_size  # Windows: lấy từ cache của scandir, không syscall thêm
+                    except OSError:
+                        continue
+                    paths.append(e.path)
+                    sizes.append(size)
+                    if len(paths) >= self.batch_size:
+                        total += len(paths)
+                        self.batch.emit(self.scan_id, paths, sizes, self._states(paths))
+                        paths, sizes = [], []
+        except OSError:
+            pass
+        if paths and not self._cancelled:
+            total += len(paths)
+            self.batch.emit(self.scan_id, paths, sizes, self._states(paths))
+        self.finished.emit(self.scan_id, total)
+
+
+class DupSignals(QObject):
+    duplicate = Signal(int, int, str, float)  # (batch_id, row, path ảnh gần trùng, độ giống)
+
+
+class DupScanTask(QRunnable):
+    """Tính perceptual hash cho file vừa thêm vào list, báo dòng gần trùng với ảnh đã có."""
+
+    def __init__(self, batch_id: int, first_row: int, paths: list, similarity: float = DEDUP_SIMILARITY):
+        super().__init__()
+        self.batch_id = batch_id
+        self.first_row = first_row
+        self.paths = paths
+        self.similarity = similarity
+        self.signals = DupSignals()
+        self.cancelled = False
+
+    def run(self):
+        index = get_phash_index()
+        for i, path in enumerate(self.paths):
+            if self.cancelled:
+                return
+            try:
+                dups = index.find_duplicates(path, self.similarity)
+            except Exception:
+                continue
+            if dups:
+                dup_of, similarity = dups[0]
+                self.signals.duplicate.emit(self.batch_id, self.first_row + i, dup_of, similarity)
 
 
 # =========================
 # 4) MÀN HÌNH CHÍNH
 # =========================
-from lmstudio_client import call_qwen_ocr  # (giữ nguyên nếu cần dùng nơi khác)
+from lmstudio_client import call_qwen_ocr, get_default_client, POOL_SIZE, SUPPORTED_EXTENSIONS  # (giữ nguyên nếu cần dùng nơi khác)
 
 class Dashboard(QWidget):
     result_requested = Signal()
@@ -206,6 +398,38 @@ class Dashboard(QWidget):
     def __init__(self):
         super().__init__()
 
+        # ---- Mọi job OCR qua 1 JobManager: Result (INTERACTIVE) chen trước batch (BACKGROUND) ----
+        self.jobs = JobManager(background_workers=OCR_MAX_WORKERS or POOL_SIZE, parent=self)
+        self.jobs.started.connect(self.on_job_started)
+        self.jobs.progress.connect(self.on_job_progress)
+        self.jobs.delta.connect(self.on_job_delta)
+        self.jobs.done.connect(self.on_job_done)
+        self.jobs.failed.connect(self.on_job_failed)
+        self.jobs.cancelled.connect(self.on_job_cancelled)
+        self.ocr_results = {}   # full_path -> text
+        self._batch_id = 0      # tăng khi list bị clear -> bỏ qua signal cũ
+        self._batch_jobs = {}   # job_id -> (batch_id, row)
+        self._result_job = None  # job đang hiển thị trên ResultPage; kết quả job khác bị bỏ
+        self._result_path = None
+        self._prefetch = {}      # full_path -> job_id của job PREFETCH
+        self._prev_status = {}   # job_id PREFETCH -> (status, tooltip) của dòng, trả lại khi job bị hủy
+
+        # ---- Quét thư mục nền ----
+        self._scan_worker = None
+        self._scan_threads = set()  # giữ tham chiếu tới khi thread dừng hẳn
+        self._folder = None         # thư mục đang hiển thị trong list
+
+        # ---- Watch: file mới trong thư mục -> thêm vào list + tự OCR ----
+        self.watcher = FolderWatcher(SUPPORTED_EXTENSIONS, parent=self)
+        self.watcher.files_added.connect(self.on_watch_files_added)
+
+        # ---- Ảnh gần trùng: hash nền, 1 thread để không tranh CPU với OCR ----
+        self.dup_pool = QThreadPool(self)
+        self.dup_pool.setMaxThreadCount(1)
+        self._dup_tasks = []
+
+        self._metrics_dlg = None  # bảng p50/p95 theo stage (nút ⋯)
+
         # ---- ROOT: GridLayout 12x12 ----
         root = QGridLayout(self)
         root.setContentsMargins(MARGIN, MARGIN, MARGIN, MARGIN)
@@ -274,7 +498,8 @@ class Dashboard(QWidget):
         # Sidebar buttons
         self.btn_home = menu_btn("Home", "n6_ocrmedical/resources/logo/home.png", checked=True)
         l.addWidget(self.btn_home)
-        l.addWidget(menu_btn("All files", "n6_ocrmedical/resources/logo/folder.png"))
+        self.btn_all = menu_btn("All files", "n6_ocrmedical/resources/logo/folder.png")
+        l.addWidget(self.btn_all)
         l.addWidget(menu_btn("Setting", "n6_ocrmedical/resources/logo/settings.png"))
         l.addWidget(menu_btn("Support", "n6_ocrmedical/resources/logo/customer-support.png"))
         l.addWidget(menu_btn("Review", "n6_ocrmedical/resources/logo/star.png"))
@@ -309,14 +534,15 @@ class Dashboard(QWidget):
         title = QLabel("OCR - Medical")
         title.setStyleSheet("font-size:25px; font-weight:900;")
 
-        search = QLineEdit()
-        search.setPlaceholderText("Search files, patients IDs…")
+        search = SearchBox()
         search.setFixedHeight(28)
         search.setStyleSheet(
             "QLineEdit{border:1px solid #e5e7eb; border-radius:8px; padding-left:22px; background:#f9fafb;}"
             "QLineEdit:focus{border-color:#93c5fd; background:#fff;}"
         )
         search.addAction(QIcon("n6_ocrmedical/resources/logo/search.png"), QLineEdit.LeadingPosition)
+        search.hit_activated.connect(self.open_search_hit)
+        self.search_box = search
 
         header.addWidget(title)
         header.addStretch()
@@ -362,16 +588,29 @@ class Dashboard(QWidget):
         self.path_edit = QLineEdit("C:\\Users\\MY COMPUTER\\HIS\\OCR-Medical\\database")
         more = QPushButton("⋯")
         more.setFixedSize(28, 28)
+        more.setToolTip("OCR stage timings")
+        more.clicked.connect(self.show_metrics)
+
+        self.watch_chk = QCheckBox("Watch")
+        self.watch_chk.setToolTip("Tự thêm và OCR file mới xuất hiện trong thư mục")
+        self.watch_chk.toggled.connect(self.on_watch_toggled)
 
         path_row.addWidget(self.pick_btn)
         path_row.addWidget(self.path_edit, 1)
+        path_row.addWidget(self.watch_chk)
         path_row.addWidget(more)
         m.addLayout(path_row)
 
         self.total_lbl = QLabel("Total files: 0")
         m.addWidget(self.total_lbl)
 
-        self.file_list = QListWidget()
+        # Upload list + History dùng chung 1 model, mỗi view 1 delegate vẽ dòng
+        self.file_model = FileListModel(self)
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setItemDelegate(UploadRowDelegate(self.file_list))
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setSelectionMode(QAbstractItemView.SingleSelection)
         self.file_list.setFixedHeight(FILE_LIST_HEIGHT)
         m.addWidget(self.file_list)
 
@@ -388,9 +627,47 @@ class Dashboard(QWidget):
             """
         )
         self.result_btn.clicked.connect(self.on_result_clicked)
-        m.addWidget(self.result_btn, 0, Qt.AlignHCenter)
 
-        self.file_list.itemSelectionChanged.connect(self.update_result_btn_state)
+        # OCR all: chạy cả thư mục với số request song song cấu hình được
+        self.ocr_all_btn = QPushButton("OCR all")
+        self.ocr_all_btn.setCursor(Qt.PointingHandCursor)
+        self.ocr_all_btn.setFixedHeight(34)
+        self.ocr_all_btn.setStyleSheet(
+            "QPushButton{background:#fff; border:1px solid #e5e7eb; border-radius:16px; padding:6px 20px; font-weight:600;}"
+            "QPushButton:hover{background:#f3f4f6;}"
+        )
+        self.ocr_all_btn.clicked.connect(self.on_ocr_all_clicked)
+
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(0, 32)
+        self.workers_spin.setValue(OCR_MAX_WORKERS)
+        self.workers_spin.setPrefix("Parallel: ")
+        self.workers_spin.setSpecialValueText("Parallel: Auto")
+        self.workers_spin.setToolTip("Auto: số request song song tự tăng / giảm theo độ trễ và lỗi của server")
+        self.workers_spin.setFixedHeight(28)
+        self.workers_spin.valueChanged.connect(self.set_parallel)
+
+        btn_row = QHBoxLayout()
+        btn_row.addStretch()
+        btn_row.addWidget(self.result_btn)
+        btn_row.addWidget(self.ocr_all_btn)
+        self.prefetch_chk = QCheckBox("Prefetch")
+        self.prefetch_chk.setToolTip("OCR trước file đang chọn và vài file kế tiếp để Result hiện ngay")
+        self.prefetch_chk.setChecked(PREFETCH_ENABLED)
+        self.prefetch_chk.toggled.connect(lambda on: on or self._cancel_prefetch())
+
+        btn_row.addWidget(self.workers_spin)
+        btn_row.addWidget(self.prefetch_chk)
+        btn_row.addStretch()
+        m.addLayout(btn_row)
+
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self.prefetch_selection)
+
+        self.file_list.selectionModel().selectionChanged.connect(self.update_result_btn_state)
+        self.file_list.selectionModel().selectionChanged.connect(lambda *_: self._prefetch_timer.start())
 
         # --- Intro card ---
         intro_card = QFrame()
@@ -478,10 +755,20 @@ class Dashboard(QWidget):
         rh.setContentsMargins(GAP_PANEL, GAP_PANEL, GAP_PANEL, GAP_PANEL)
         h_title = QLabel("History")
         h_title.setStyleSheet("font-size:18px; font-weight:700;")
-        self.history = QListWidget()
+        self.history_model = FileListModel(self)
+        self.history = QListView()
+        self.history.setModel(self.history_model)
+        self.history.setItemDelegate(HistoryDelegate(self.history))
+        self.history.setUniformItemSizes(True)
         rh.addWidget(h_title)
         rh.addWidget(self.history, 1)
 
+        self._history_timer = QTimer(history_card)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.setInterval(HISTORY_REFRESH_MS)
+        self._history_timer.timeout.connect(self.reload_history)
+        self.reload_history()
+
         grid.addWidget(greeting, 0, 0, 4, 1)
         grid.addWidget(history_card, 4, 0, 8, 1)
 
@@ -515,77 +802,298 @@ class Dashboard(QWidget):
             self.populate_from_directory(folder)
 
     def populate_from_directory(self, folder: str):
-        # Đơn giản: quét file trong thư mục (tùy bạn cải tiến filter)
-        self.file_list.clear()
-        self.history.clear()
-        try:
-            files = [os.path.join(folder, f) for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-            for f in files:
-                name = os.path.basename(f)
-                self._append_file_item(self.file_list.count() + 1, name, f)
-            self._update_total_label()
-        except Exception:
-            pass
+        """Xóa list và quét lại thư mục trên thread nền (hủy lần quét trước nếu còn chạy)."""
+        self._batch_id += 1
+        self._folder = folder
+        self.jobs.cancel_all(BACKGROUND)  # batch của list cũ không còn ai xem
+        self._cancel_prefetch()
+        self.watcher.stop()  # bật lại khi quét xong, với danh sách file đầy đủ
+        self.dup_pool.clear()
+        for t in self._dup_tasks:
+            t.cancelled = True
+        self._dup_tasks = []
+        self.file_model.clear()
+        if self._scan_worker is not None:
+            self._scan_worker.cancel()
+
+        scan_id = self._batch_id
+        thread = QThread()
+        worker = DirScanWorker(scan_id, folder, SUPPORTED_EXTENSIONS)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.batch.connect(self.on_scan_batch)
+        worker.finished.connect(self.on_scan_finished)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(lambda t=thread: self._scan_threads.discard(t))
+        thread.finished.connect(thread.deleteLater)
+
+        self._scan_worker = worker
+        self._scan_threads.add(thread)
+        self.total_lbl.setText("Scanning… 0 files")
+        thread.start()
+
+    def on_scan_batch(self, scan_id: int, paths: list, sizes: list, states: dict):
+        if scan_id != self._batch_id:
+            return  # lô của lần quét đã bị hủy
+        first = self.file_model.rowCount()
+        self.file_model.append_paths(paths, sizes, states)
+        self.total_lbl.setText(f"Scanning… {self.file_model.rowCount()} files")
+        self._check_duplicates(first, paths)
+
+    def on_scan_finished(self, scan_id: int, total: int):
+        if scan_id != self._batch_id:
+            return
+        self._scan_worker = None
+        self._update_total_label()
+        if self.watch_chk.isChecked():
+            self.watcher.start(self._folder, self.file_model.paths())
+
+    def on_watch_toggled(self, checked: bool):
+        if not checked:
+            self.watcher.stop()
+        elif self._folder and self._scan_worker is None:
+            self.watcher.start(self._folder, self.file_model.paths())
+        # đang quét -> on_scan_finished sẽ bật watcher
+
+    def on_watch_files_added(self, paths: list, sizes: list):
+        """Chỉ nối thêm file mới (không quét lại cả thư mục) rồi đưa vào hàng đợi OCR."""
+        first = self.file_model.rowCount()
+        self.file_model.append_paths(paths, sizes)
+        self._update_total_label()
+        self._enqueue_rows(range(first, first + len(paths)))
 
     def add_files(self, files: List[str]):
-        for f in files:
-            name = os.path.basename(f) if f else "Unnamed"
-            self._append_file_item(self.file_list.count() + 1, name, f)
+        files = [f for f in files if f]
+        first = self.file_model.rowCount()
+        self.file_model.append_paths(files)
         self._update_total_label()
+        self._check_duplicates(first, files)
 
-    def _append_file_item(self, idx: int, name: str, full_path: str):
-        size = human_size(full_path)
-        row = UploadRow(idx, name, size, "Ready")
-        it = QListWidgetItem(self.file_list)
-        it.setSizeHint(row.sizeHint())
-        self.file_list.addItem(it)
-        self.file_list.setItemWidget(it, row)
+    def _check_duplicates(self, first_row: int, paths: list):
+        if not DEDUP_ENABLED or not paths:
+            return
+        task = DupScanTask(self._batch_id, first_row, list(paths))
+        task.signals.duplicate.connect(self.on_duplicate_found)
+        self._dup_tasks = [t for t in self._dup_tasks if not t.cancelled] + [task]
+        self.dup_pool.start(task)
 
-        hrow = HistoryItem(elide(name, self, 180), size)
-        hit = QListWidgetItem(self.history)
-        hit.setSizeHint(hrow.sizeHint())
-        self.history.addItem(hit)
-        self.history.setItemWidget(hit, hrow)
+    def on_duplicate_found(self, batch_id: int, row: int, dup_of: str, similarity: float):
+        if not self._is_current_batch(batch_id):
+            return
+        if self.file_model.status(row) == "Ready":
+            self._flag_duplicate(row, dup_of, similarity)
 
-        it.setData(Qt.UserRole, full_path)  # lưu đường dẫn thật vào item
+    def _flag_duplicate(self, row: int, dup_of: str, similarity: float):
+        self.file_model.set_status(row, "Duplicate",
+                                   f"≈ {os.path.basename(dup_of)} ({similarity:.0%}) — {dup_of}")
 
     def _update_total_label(self):
-        self.total_lbl.setText(f"Total files: {self.file_list.count()}")
+        self.total_lbl.setText(f"Total files: {self.file_model.rowCount()}")
+
+    def _selected_row(self) -> int:
+        rows = self.file_list.selectionModel().selectedRows()
+        return rows[0].row() if rows else -1
+
+    def update_result_btn_state(self, *_):
+        self.result_btn.setEnabled(self._selected_row() >= 0)
+
+    def prefetch_selection(self):
+        """Decode preview + xếp job OCR PREFETCH cho dòng đang chọn và PREFETCH_AHEAD dòng kế;
+        job của các dòng không còn trong cửa sổ bị hủy (đang chờ thì rút khỏi hàng, gần như miễn phí).
+        """
+        row = self._selected_row()
+        if row < 0 or not self.prefetch_chk.isChecked():
+            self._cancel_prefetch()
+            return
+        model = self.file_model
+        rows = range(row, min(row + 1 + PREFETCH_AHEAD, model.rowCount()))
+        busy = self._result_path if self._result_job is not None else None  # nút Result đã gửi job
+        wanted = {model.path(r): r for r in rows
+                  if model.status(r) in ("Ready", "Duplicate")
+                  and model.path(r) not in self.ocr_results and model.path(r) != busy}
+
+        for path, job_id in list(self._prefetch.items()):
+            if path not in wanted or not self.jobs.is_active(job_id):
+                if job_id != self._result_job:  # job đã được nút Result nhận thì giữ lại
+                    self.jobs.cancel(job_id)
+                del self._prefetch[path]
 
-    def update_result_btn_state(self):
-        self.result_btn.setEnabled(len(self.file_list.selectedItems()) > 0)
+        main_win = self.window()
+        if hasattr(main_win, "result_page"):
+            main_win.result_page.prefetch_preview(model.path(row))
+        for path, r in wanted.items():
+            if path in self._prefetch:
+                continue
+            job_id = self.jobs.submit(partial(result_job, image_path=path, prompt=OCR_PROMPT,
+                                              stream=False, tiled=OCR_TILED, cascade=OCR_CASCADE), PREFETCH)
+            self._prefetch[path] = job_id
+            self._batch_jobs[job_id] = (self._batch_id, r)  # cập nhật trạng thái dòng như job batch
+            self._prev_status[job_id] = (model.status(r), model.error(r))  # "Duplicate" giữ lại khi hủy
+
+    def _cancel_prefetch(self):
+        for job_id in self._prefetch.values():
+            if job_id != self._result_job:
+                self.jobs.cancel(job_id)
+        self._prefetch = {}
+
+    def on_ocr_all_clicked(self):
+        """Đưa mọi file Ready/Failed/Duplicate vào hàng đợi OCR của pool (Duplicate vẫn OCR riêng)."""
+        model = self.file_model
+        self._enqueue_rows(r for r in range(model.rowCount())
+                           if model.status(r) in ("Ready", "Failed", "Duplicate"))
+
+    def _enqueue_rows(self, rows):
+        batch_id = self._batch_id
+        model = self.file_model
+        rows = list(rows)
+        get_job_store().enqueue(model.path(r) for r in rows)
+        for row in rows:
+            full_path = model.path(row)
+            model.set_status(row, "Queued")
+            job_id = self.jobs.submit(partial(batch_job, image_path=full_path, prompt=OCR_PROMPT,
+                                              tiled=OCR_TILED, cascade=OCR_CASCADE), BACKGROUND)
+            self._batch_jobs[job_id] = (batch_id, row)
+
+    def _is_current_batch(self, batch_id: int) -> bool:
+        return batch_id == self._batch_id  # list đã được nạp lại -> bỏ qua kết quả cũ
+
+    def _batch_row(self, job_id: int, pop: bool = False) -> int:
+        """Dòng trong list của job batch; -1 nếu không phải job batch hoặc list đã nạp lại."""
+        ref = self._batch_jobs.pop(job_id, None) if pop else self._batch_jobs.get(job_id)
+        if ref is None or not self._is_current_batch(ref[0]):
+            return -1
+        return ref[1]
+
+    def on_job_started(self, job_id: int):
+        row = self._batch_row(job_id)
+        if row >= 0:
+            self.file_model.set_status(row, "Running")
+
+    def on_job_progress(self, job_id: int, text: str):
+        row = self._batch_row(job_id)
+        if row >= 0:
+            self.file_model.set_status(row, text)
+
+    def on_job_delta(self, job_id: int, text: str):
+        main_win = self.window()
+        if job_id == self._result_job and hasattr(main_win, "result_page"):
+            main_win.result_page.append_result_delta(text)
+
+    def on_job_done(self, job_id: int, text: str, info: dict):
+        self._history_timer.start()
+        self._prev_status.pop(job_id, None)
+        if job_id == self._result_job:
+            self._result_job = None
+            self.on_ocr_finished(text)
+        row = self._batch_row(job_id, pop=True)
+        if row < 0:
+            return
+        self.ocr_results[self.file_model.path(row)] = text
+        self.file_model.set_status(row, "Done")
+        if "duplicate_of" in info:  # đã dùng lại kết quả của file copy
+            self._flag_duplicate(row, info["duplicate_of"], info["similarity"])
+
+    def on_job_failed(self, job_id: int, error):
+        self._history_timer.start()
+        self._prev_status.pop(job_id, None)
+        if job_id == self._result_job:
+            self._result_job = None
+            self.on_ocr_failed(error)
+        row = self._batch_row(job_id, pop=True)
+        if row >= 0:
+            self.file_model.set_status(row, "Failed", describe_error(error))
+
+    def on_job_cancelled(self, job_id: int):
+        if job_id == self._result_job:
+            self._result_job = None
+        status, error = self._prev_status.pop(job_id, ("Ready", None))
+        row = self._batch_row(job_id, pop=True)
+        if row >= 0:
+            self.file_model.set_status(row, status, error)
+
+    def cancel_result_job(self):
+        """Bấm Back / chọn file khác: hủy job Result đang chạy, kết quả muộn không ghi đè ResultPage."""
+        if self._result_job is not None:
+            self.jobs.cancel(self._result_job)
+            self._result_job = None
+
+    def reload_history(self):
+        """History = các job kết thúc gần nhất trong JobStore (còn lại sau khi tắt app)."""
+        jobs = get_job_store().recent(HISTORY_LIMIT)
+        self.history_model.clear()
+        self.history_model.append_paths([j.path for j in jobs], [j.size for j in jobs],
+                                        {j.path: (j.status, j.error) for j in jobs})
+
+    def set_parallel(self, n: int):
+        """0 = Auto: mở đủ thread, số request thật sự bay do AdaptiveLimiter của client quyết định."""
+        self.jobs.set_background_workers(n or POOL_SIZE)
+
+    def show_metrics(self):
+        if self._metrics_dlg is None:
+            self._metrics_dlg = MetricsDialog(get_metrics(), self, limiter=get_default_client().limiter)
+        self._metrics_dlg.show()
+        self._metrics_dlg.raise_()
+
+    def open_search_hit(self, full_path: str):
+        """Mở kết quả của file được chọn từ ô tìm kiếm: file còn trên đĩa thì đi như nút Result
+        (nội dung đã đổi từ lần OCR trước -> OCR lại), file đã xóa thì hiện text lưu trong chỉ mục.
+        """
+        if os.path.isfile(full_path):
+            self.open_result(full_path)
+            return
+        self.cancel_result_job()
+        main_win = self.window()
+        if not hasattr(main_win, "result_page"):
+            return
+        main_win.result_page.set_image_info(full_path)
+        main_win.result_page.set_result(get_search_index().get_text(full_path) or "")
+        main_win.show_result_page()
 
     def on_result_clicked(self):
-        selected = self.file_list.selectedItems()
-        if not selected:
-            return
+        row = self._selected_row()
+        if row >= 0:
+            self.open_result(self.file_model.path(row))
 
-        item = selected[0]
-        full_path = item.data(Qt.UserRole)
+    def open_result(self, full_path: str):
+        self.cancel_result_job()  # job của file chọn trước đó
 
         # 👉 Chuyển ngay sang ResultPage, hiển thị "Loading..."
         main_win = self.window()
+        cached = stored_result(full_path)  # file bị ghi đè sau lần OCR trước -> OCR lại
         if hasattr(main_win, "result_page"):
             # Cập nhật ảnh + file info
             main_win.result_page.set_image_info(full_path)
-            main_win.result_page.set_result("🔄 OCR đang quét dữ liệu, đợi tí nhé!")
+            main_win.result_page.set_result(cached or "🔄 OCR đang quét dữ liệu, đợi tí nhé!")
 
             main_win.show_result_page()
 
-        # 👉 Tạo thread để gọi model
-        self.thread = QThread()
-        self.worker = OCRWorker(full_path, "Please extract text from this medical test image.")
-        self.worker.moveToThread(self.thread)
-
-        # Kết nối tín hiệu
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_ocr_finished)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
+        # Đã OCR xong trong batch -> không gọi model lại
+        if cached is not None:
+            return
 
-        # Start thread
-        self.thread.start()
+        # Đã prefetch: job đang chạy -> nhận luôn thay vì gửi request thứ 2;
+        # job còn chờ trong hàng PREFETCH -> rút ra, chạy lại dưới dạng INTERACTIVE (stream, làn riêng)
+        self._result_path = full_path
+        job_id = self._prefetch.get(full_path)
+        row_ref = prev = None
+        if job_id is not None and self.jobs.is_active(job_id):
+            if not self.jobs.withdraw(job_id):
+                self._result_job = job_id
+                return
+            del self._prefetch[full_path]
+            row_ref = self._batch_jobs.pop(job_id, None)
+            prev = self._prev_status.pop(job_id, None)
+
+        # 👉 Job INTERACTIVE: chạy trên làn riêng, không chờ sau hàng đợi batch
+        self._result_job = self.jobs.submit(
+            partial(result_job, image_path=full_path, prompt=OCR_PROMPT, stream=OCR_STREAM, tiled=OCR_TILED,
+                    cascade=OCR_CASCADE),
+            INTERACTIVE)
+        if row_ref is not None:  # dòng trong list vẫn hiện Running / Done, Back thì trả lại trạng thái cũ
+            self._batch_jobs[self._result_job] = row_ref
+            if prev is not None:
+                self._prev_status[self._result_job] = prev
 
     def on_ocr_finished(self, result_text):
         # Khi có kết quả thì update vào ResultPage
@@ -593,11 +1101,17 @@ class Dashboard(QWidget):
         if hasattr(main_win, "result_page"):
             main_win.result_page.set_result(result_text)
 
+    def on_ocr_failed(self, error):
+        main_win = self.window()
+        if hasattr(main_win, "result_page"):
+            main_win.result_page.set_error(describe_error(error))
+
 
 # =========================
 # 5) MAIN WINDOW
 # =========================
 from result_page import ResultPage
+from filelog_page import FileLogPage
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -608,9 +1122,11 @@ class MainWindow(QMainWindow):
         self.stacked = QStackedWidget()
         self.dashboard = Dashboard()
         self.result_page = ResultPage()
+        self.file_log = FileLogPage()
 
         self.stacked.addWidget(self.dashboard)  # index 0
         self.stacked.addWidget(self.result_page)  # index 1
+        self.stacked.addWidget(self.file_log)  # index 2
         self.setCentralWidget(self.stacked)
 
         # 🔹 Nút Result trong sidebar Dashboard
@@ -621,6 +1137,11 @@ class MainWindow(QMainWindow):
         self.result_page.back_btn.clicked.connect(self.show_dashboard)
         # 🔹 Nút Home trong sidebar ResultPage
         self.result_page.btn_home.clicked.connect(self.show_dashboard)
+        # 🔹 Nút All files -> File Log; tìm kiếm / History ở đó mở kết quả như ô tìm kiếm Dashboard
+        self.dashboard.btn_all.clicked.connect(self.show_file_log)
+        self.result_page.btn_all.clicked.connect(self.show_file_log)
+        self.file_log.btn_home.clicked.connect(self.show_dashboard)
+        self.file_log.file_activated.connect(self.dashboard.open_search_hit)
 
     def show_result_page(self):
         self.stacked.setCurrentIndex(1)
@@ -630,7 +1151,13 @@ class MainWindow(QMainWindow):
         if hasattr(self.result_page, "btn_home"):
             self.result_page.btn_home.setChecked(False)
 
+    def show_file_log(self):
+        self.dashboard.cancel_result_job()
+        self.stacked.setCurrentIndex(2)  # showEvent nạp lại danh sách từ JobStore
+        self.file_log.btn_file_log.setChecked(True)
+
     def show_dashboard(self):
+        self.dashboard.cancel_result_job()
         self.stacked.setCurrentIndex(0)
         # ép sidebar Dashboard highlight đúng
         if hasattr(self.dashboard, "btn_home"):
@@ -0,0 +1,243 @@
+# ============================================================
+# Benchmark client OCR với server giả lập (không cần mạng / GPU)
+#
+#   python n6_ocrmedical/src/bench.py -n 200 -j 8 --modes client,stream,async,batch
+#
+# Server giả lập chạy ở process riêng để CPU/RAM đo được chỉ là của client;
+# --servers N chạy N server (mỗi server --slots slot GPU) để đo chia tải nhiều máy.
+# In ra: img/s, p50/p95/p99 latency, CPU ms/ảnh, RSS tăng thêm; --json để so sánh trong CI.
+#
+# Concurrency tự chỉnh (AdaptiveLimiter, -j là mức tối đa) dưới tải thay đổi theo thời gian:
+#   python n6_ocrmedical/src/bench.py -n 600 -j 16 --modes client --adaptive --slot-schedule 0:4,10:1,20:8
+# -> in thêm limit trung bình theo từng giây để xem limit bám theo số slot của server.
+#
+# Cascade (ảnh nhỏ trước, chỉ ảnh không đạt mới gửi lại cỡ đầy đủ):
+#   python n6_ocrmedical/src/bench.py --modes client,batch --cascade --latency-per-mb-ms 2000 --hard-rate 0.2
+# -> so img/s và p50 với khi không có --cascade; cột esc (chế độ client) = số ảnh phải OCR lại cỡ đầy đủ.
+# ============================================================
+
+import argparse, asyncio, glob, itertools, json, os, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrency_limit import AdaptiveLimiter
+from lmstudio_client import OCRClient, AsyncOCRClient, SUPPORTED_EXTENSIONS
+from endpoint_pool import POLICIES
+from ocr_metrics import MetricsSink, percentile
+import ocr_cli
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES = os.path.join(HERE, "..", "data", "raw")
+PROMPT = "Please extract text from this medical test image."
+
+
+def rss_mb():
+    if resource is None:
+        return None
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / 1024 / 1024 if sys.platform == "darwin" else r / 1024
+
+
+def start_server(args):
+    """Chạy fake_lmstudio.py ở process con, trả về (process, base_url)."""
+    cmd = [sys.executable, os.path.join(HERE, "fake_lmstudio.py"), "--port", "0",
+           "--latency-ms", str(args.latency_ms), "--tps", str(args.tps),
+           "--tokens", str(args.tokens), "--error-rate", str(args.error_rate),
+           "--slots", str(args.slots), "--slot-schedule", args.slot_schedule,
+           "--latency-per-mb-ms", str(args.latency_per_mb_ms), "--hard-rate", str(args.hard_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    return proc, proc.stdout.readline().strip()
+
+
+# ---- các chế độ đo: mỗi hàm trả về list (latency_ms, ok) ----
+
+def run_client(base_url, paths, args, sink, stream=False):
+    limiter = AdaptiveLimiter(max_limit=args.concurrency) if args.adaptive else None
+    client = OCRClient(base_url=base_url, pool_size=args.concurrency, metrics=sink,
+                       lb_policy=args.lb_policy, limiter=limiter)
+
+    def one(p):
+        t0 = time.perf_counter()
+        try:
+            if stream:
+                for _ in client.ocr_stream(p, PROMPT, use_cache=False):
+                    pass
+            elif args.cascade:
+                client.ocr_cascade(p, PROMPT, use_cache=False)
+            else:
+                client.ocr(p, PROMPT, use_cache=False)
+            ok = True
+        except Exception:
+            ok = False
+        return (time.perf_counter() - t0) * 1000, ok
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        out = list(ex.map(one, paths))
+    client.close()
+    return out
+
+
+def run_async(base_url, paths, args, sink):
+    async def main():
+        out = []
+        gate = asyncio.Semaphore(args.concurrency)
+        async with AsyncOCRClient(base_url=base_url, max_in_flight=args.concurrency,
+                                  metrics=sink, lb_policy=args.lb_policy) as client:
+            async def one(p):
+                async with gate:  # đo từ lúc thật sự bắt đầu, như các chế độ dùng thread pool
+                    t0 = time.perf_counter()
+                    try:
+                        await client.ocr(p, PROMPT, use_cache=False)
+                        ok = True
+                    except Exception:
+                        ok = False
+                    out.append(((time.perf_counter() - t0) * 1000, ok))
+
+            await asyncio.gather(*(one(p) for p in paths))
+        return out
+    return asyncio.run(main())
+
+
+def run_batch(base_url, paths, args, sink):
+    """Đường batch headless (ocr_cli) ghi JSONL; latency lấy từ elapsed_ms (không có stage)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        lst = os.path.join(tmp, "files.txt")
+        out = os.path.join(tmp, "out.jsonl")
+        with open(lst, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths))
+        cli_args = ocr_cli.build_parser().parse_args(
+            ["--files-from", lst, "-o", out, "-j", str(args.concurrency),
+             "--base-url", base_url, "--lb-policy", args.lb_policy,
+             "--progress-every", str(10 ** 9)]
+            + (["--adaptive"] if args.adaptive else []) + (["--cascade"] if args.cascade else []))
+        ocr_cli.run(cli_args)
+        with open(out, encoding="utf-8") as f:
+            recs = [json.loads(l) for l in f]
+    return [(r["elapsed_ms"], not r["error"]) for r in recs]
+
+
+MODES = {
+    "client": lambda u, p, a, m: run_client(u, p, a, m),
+    "stream": lambda u, p, a, m: run_client(u, p, a, m, stream=True),
+    "async":  run_async,
+    "batch":  run_batch,
+}
+
+
+def limit_timeline(samples, t_start: float) -> list:
+    """[(giây, limit trung bình)] từ các record có "limit" (JobTrace của client có limiter)."""
+    per_sec = {}
+    for ts, limit in samples:
+        per_sec.setdefault(max(int(ts - t_start), 0), []).append(limit)
+    return [(sec, round(sum(v) / len(v), 1)) for sec, v in sorted(per_sec.items())]
+
+
+def measure(mode, base_url, paths, args) -> dict:
+    sink = MetricsSink(log_path=None, keep=len(paths) * 4)
+    limits, escalated = [], []
+
+    def on_record(rec):
+        if rec.get("limit") is not None:
+            limits.append((rec["ts"], rec["limit"]))
+        if rec.get("quality_issues"):
+            escalated.append(rec["label"])  # lượt ảnh nhỏ không đạt -> OCR lại cỡ đầy đủ
+
+    sink.add_hook(on_record)
+    t_start = time.time()
+    cpu0, rss0, t0 = time.process_time(), rss_mb(), time.perf_counter()
+    results = MODES[mode](base_url, paths, args, sink)
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    lat = [ms for ms, ok in results if ok]
+    rss1 = rss_mb()
+    return {
+        "mode": mode, "images": len(results), "errors": sum(1 for _, ok in results if not ok),
+        "escalated": len(escalated),
+        "wall_s": round(wall, 3), "img_per_s": round(len(results) / wall, 2),
+        "p50_ms": percentile(lat, 50), "p95_ms": percentile(lat, 95), "p99_ms": percentile(lat, 99),
+        "cpu_ms_per_img": round(cpu * 1000 / max(len(results), 1), 2),
+        "peak_rss_mb": round(rss1, 1) if rss1 is not None else None,
+        "rss_growth_mb": round(rss1 - rss0, 1) if rss1 is not None else None,
+        "stages": sink.summary(),
+        "limit_timeline": limit_timeline(limits, t_start),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark OCR client against a local fake LM Studio")
+    p.add_argument("--images", default=DEFAULT_IMAGES, help="thư mục ảnh mẫu")
+    p.add_argument("-n", "--count", type=int, default=100, help="số request mỗi chế độ")
+    p.add_argument("-j", "--concurrency", type=int, default=8)
+    p.add_argument("--modes", default="client,stream,async,batch")
+    p.add_argument("--base-url", help="dùng server có sẵn (url1,url2...) thay vì tự chạy fake server")
+    p.add_argument("--servers", type=int, default=1, help="số fake server chạy song song (đo chia tải)")
+    p.add_argument("--lb-policy", default="least_outstanding", choices=POLICIES)
+    p.add_argument("--latency-ms", type=float, default=100)
+    p.add_argument("--tps", type=float, default=400)
+    p.add_argument("--tokens", type=int, default=60)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--latency-per-mb-ms", type=float, default=0.0, help="trễ thêm theo kích thước ảnh gửi lên")
+    p.add_argument("--hard-rate", type=float, default=0.0,
+                   help="tỉ lệ ảnh nhỏ mà fake server trả text không đọc được")
+    p.add_argument("--slots", type=int, default=8)
+    p.add_argument("--slot-schedule", default="",
+                   help="đổi số slot của fake server theo thời gian, vd. 0:4,10:1,20:8")
+    p.add_argument("--adaptive", action="store_true",
+                   help="client/stream/batch dùng AdaptiveLimiter (-j = limit tối đa)")
+    p.add_argument("--cascade", action="store_true",
+                   help="client/batch: OCR ảnh thu nhỏ trước, chỉ ảnh không đạt mới OCR lại cỡ đầy đủ")
+    p.add_argument("--json", action="store_true", help="in kết quả dạng JSON (cho CI)")
+    p.add_argument("--stages", action="store_true", help="in thêm p50/p95 theo từng stage")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    images = sorted(f for f in glob.glob(os.path.join(args.images, "*"))
+                    if f.lower().endswith(SUPPORTED_EXTENSIONS))
+    if not images:
+        print(f"Không có ảnh trong {args.images}", file=sys.stderr)
+        return 2
+    paths = list(itertools.islice(itertools.cycle(images), args.count))
+
+    procs = []
+    base_url = args.base_url
+    if base_url is None:
+        servers = [start_server(args) for _ in range(max(args.servers, 1))]
+        procs = [p for p, _ in servers]
+        base_url = ",".join(u for _, u in servers)
+    try:
+        report = [measure(m.strip(), base_url, paths, args) for m in args.modes.split(",") if m.strip()]
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        print(f"{'mode':<8}{'img/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>5}{'esc':>5}{'cpu/img':>9}{'rss MB':>8}")
+        for r in report:
+            print(f"{r['mode']:<8}{r['img_per_s']:>8.2f}{fmt(r['p50_ms']):>9}{fmt(r['p95_ms']):>9}"
+                  f"{fmt(r['p99_ms']):>9}{r['errors']:>5}{r['escalated']:>5}{r['cpu_ms_per_img']:>9.2f}"
+                  f"{fmt(r['peak_rss_mb']):>8}")
+        for r in report:
+            if r["limit_timeline"]:
+                print(f"\n[{r['mode']}] limit/s: " + " ".join(f"{v:g}" for _, v in r["limit_timeline"]))
+        if args.stages:
+            for r in report:
+                if not r["stages"]:
+                    continue
+                print(f"\n[{r['mode']}] {'stage':<12}{'n':>6}{'p50':>9}{'p95':>9}")
+                for name, st in r["stages"].items():
+                    print(f"{'':<{len(r['mode']) + 3}}{name:<12}{st['count']:>6}{fmt(st['p50']):>9}{fmt(st['p95']):>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# ============================================================
+# Benchmark tìm kiếm full-text (SearchIndex) trên chỉ mục giả lập cỡ lớn
+#
+#   python n6_ocrmedical/src/bench_search.py -n 1000000 --db /tmp/ocr_index_1m.sqlite3
+#
+# Lần đầu tạo chỉ mục N phiếu xét nghiệm giả (1M ~ 2 phút), các lần sau dùng lại file --db.
+# In ra: best / p50 latency cho từng câu tìm (1 từ, nhiều từ, mã bệnh nhân); --json cho CI.
+# --max-ms: trả về mã lỗi 1 nếu câu nào có p50 vượt ngưỡng.
+# ============================================================
+
+import argparse, json, os, random, statistics, sys, time
+
+from search_index import SearchIndex
+
+WORDS = ("Kết quả xét nghiệm Glucose Ure Creatinin AST ALT Cholesterol Triglycerid HDL LDL Hồng cầu "
+         "Bạch cầu Tiểu cầu mmol/L U/L bình thường Acid Uric Bilirubin Albumin Protein Natri Kali Clo "
+         "Canxi Sắt Ferritin HbA1c CRP Procalcitonin TSH FT3 FT4 PSA AFP CEA CA125 Amylase Lipase GGT").split()
+QUERIES = ["glucose", "xet nghiem", "glucose ure", "glucose ure creatinin", "ferritin hba1c crp",
+           "kali natri cl", "BN0000123"]
+
+
+def build(index: SearchIndex, n: int, seed: int = 1, batch: int = 5000):
+    r = random.Random(seed)
+    items = []
+    for i in range(n):
+        fields = " ".join(f"{w} {r.uniform(1, 200):.1f}" for w in r.sample(WORDS, 12))
+        text = f"Mã BN: BN{i:07d} Họ tên bệnh nhân {r.randint(1, 99999)} {fields}"
+        items.append((f"/scan/{i:07d}.jpg", text, 1.7e9 + i, None))
+        if len(items) == batch:
+            index.add_many(items)
+            items = []
+    if items:
+        index.add_many(items)
+
+
+def measure(index: SearchIndex, query: str, repeat: int) -> dict:
+    index.search(query)  # làm nóng cache trang SQLite
+    times, hits = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        hits = len(index.search(query))
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"query": query, "terms": len(query.split()), "hits": hits,
+            "best_ms": round(min(times), 1), "p50_ms": round(statistics.median(times), 1)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark SearchIndex.search on a synthetic index")
+    p.add_argument("-n", "--count", type=int, default=200_000, help="số tài liệu trong chỉ mục")
+    p.add_argument("--db", help="file chỉ mục (mặc định: file tạm theo -n, dùng lại giữa các lần chạy)")
+    p.add_argument("-q", "--query", action="append", help="câu tìm (lặp lại được); mặc định bộ QUERIES")
+    p.add_argument("-r", "--repeat", type=int, default=10)
+    p.add_argument("--max-ms", type=float, help="ngưỡng p50 (ms), vượt -> exit 1")
+    p.add_argument("--json", action="store_true", help="in kết quả dạng JSON (cho CI)")
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    db = args.db or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "db",
+                                 f"bench_index_{args.count}.sqlite3")
+    index = SearchIndex(db)
+    have = index.count()
+    if have < args.count:
+        t0 = time.perf_counter()
+        build(index, args.count - have, seed=have + 1)
+        print(f"built {args.count - have} docs in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    results = [measure(index, q, args.repeat) for q in args.query or QUERIES]
+    index.close()
+    if args.json:
+        print(json.dumps({"docs": args.count, "results": results}, ensure_ascii=False))
+    else:
+        print(f"{'query':28s} {'terms':>5s} {'hits':>5s} {'best ms':>8s} {'p50 ms':>8s}")
+        for r in results:
+            print(f"{r['query']:28s} {r['terms']:5d} {r['hits']:5d} {r['best_ms']:8.1f} {r['p50_ms']:8.1f}")
+    slow = [r for r in results if args.max_ms is not None and r["p50_ms"] > args.max_ms]
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import threading, time
+from contextlib import contextmanager
+
+from ocr_errors import DeadlineExceeded, OCRHTTPError, OCRTimeout
+
+LIMIT_INITIAL = 4
+LIMIT_MIN = 1
+LIMIT_MAX = 16
+LIMIT_TOLERANCE = 1.5     # latency (EWMA) > tolerance x baseline -> server đang xếp hàng -> giảm
+LIMIT_BACKOFF = 0.9       # giảm nhân khi latency tăng
+LIMIT_ERROR_BACKOFF = 0.5 # giảm nhân khi timeout / 429 / tỉ lệ lỗi 5xx cao
+ERROR_RATE_MAX = 0.2      # lỗi 5xx lẻ tẻ (không do tải) không làm giảm limit
+LATENCY_ALPHA = 0.3       # EWMA latency ngắn hạn
+ERROR_ALPHA = 0.1         # EWMA tỉ lệ lỗi (~10 request gần nhất)
+BASELINE_DRIFT = 0.002    # baseline trôi dần lên nếu server chậm hẳn đi (prompt dài hơn, model khác)
+URGENT_RESERVE = 1        # request gấp (nút Result) được vượt limit chừng này slot
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Timeout của 1 lần gửi hoặc 429: server báo quá tải rõ ràng -> giảm ngay."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, OCRTimeout):
+        return True
+    return isinstance(exc, OCRHTTPError) and exc.status == 429
+
+
+def is_server_error(exc: BaseException) -> bool:
+    return isinstance(exc, OCRHTTPError) and exc.status >= 500
+
+
+class AdaptiveLimiter:
+    """Giới hạn số request OCR đang bay, tự điều chỉnh theo latency và lỗi (AIMD).
+
+    Mỗi request xong mà latency vẫn gần baseline (latency thấp nhất từng thấy) và limit
+    đang được dùng hết -> limit += 1/limit (~ +1 sau mỗi "vòng" limit request).
+    Latency EWMA vượt tolerance x baseline (GPU đã đầy, request xếp hàng trong server),
+    timeout, 429, hoặc tỉ lệ lỗi 5xx > ERROR_RATE_MAX -> limit nhân với backoff,
+    tối đa 1 lần mỗi latency để cả loạt request đang bay không cùng kéo limit xuống.
+    Lỗi 4xx / hết deadline job / hủy thì không tính. limit luôn nằm trong [min_limit, max_limit].
+    Request urgent (người dùng đang chờ) được cấp slot trước mọi request thường đang chờ,
+    và được dùng thêm urgent_reserve slot ngoài limit để không phải chờ batch trả slot.
+    """
+
+    def __init__(self, initial: float = LIMIT_INITIAL, min_limit: int = LIMIT_MIN,
+                 max_limit: int = LIMIT_MAX, tolerance: float = LIMIT_TOLERANCE,
+                 backoff: float = LIMIT_BACKOFF, error_backoff: float = LIMIT_ERROR_BACKOFF,
+                 urgent_reserve: int = URGENT_RESERVE):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Cần 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.error_backoff = error_backoff
+        self.urgent_reserve = urgent_reserve
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.urgent_waiting = 0
+        self.latency_ms = None    # EWMA
+        self.baseline_ms = None
+        self.error_rate = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    # ---- giữ / trả slot ----
+    def _blocked(self, urgent: bool) -> bool:
+        if urgent:
+            return self.in_flight >= self.limit + self.urgent_reserve
+        return self.in_flight >= self.limit or self.urgent_waiting > 0
+
+    def acquire(self, timeout: float = None, urgent: bool = False) -> bool:
+        """Chờ tới khi số request đang bay < limit; False nếu hết timeout."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self.waiting += 1
+            self.urgent_waiting += urgent
+            try:
+                while self._blocked(urgent):
+                    rem = None if end is None else end - time.monotonic()
+                    if rem is not None and rem <= 0:
+                        return False
+                    self._cond.wait(rem)
+                self.in_flight += 1
+                return True
+            finally:
+                self.waiting -= 1
+                self.urgent_waiting -= urgent
+                if urgent:
+                    self._cond.notify_all()  # request thường đang nhường chỗ có thể đi tiếp
+
+    def release(self, latency_ms: float = None, error: BaseException = None):
+        """latency_ms=None và error=None -> chỉ trả slot (request bị bỏ giữa chừng)."""
+        with self._cond:
+            used = self.in_flight >= self._limit / 2  # limit thấp hơn nhu cầu thật mới nên tăng
+            self.in_flight -= 1
+            if error is not None:
+                self._on_error(error)
+            elif latency_ms is not None:
+                self._on_success(latency_ms, used)
+            self._cond.notify_all()  # limit có thể đã tăng -> đánh thức nhiều thread
+
+    @contextmanager
+    def slot(self, deadline=None, urgent: bool = False):
+        """with limiter.slot(deadline): ... -> đo latency cả khối, lỗi quá tải làm giảm limit."""
+        rem = None if deadline is None else deadline.remaining()
+        if not self.acquire(rem, urgent):
+            raise DeadlineExceeded("OCR job deadline exceeded (waiting for a concurrency slot)")
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.release(error=e)
+            raise
+        except BaseException:  # GeneratorExit khi người dùng dừng đọc stream giữa chừng
+            self.release()
+            raise
+        self.release((time.perf_counter() - t0) * 1000)
+
+    # ---- điều chỉnh ----
+    def _on_success(self, latency_ms: float, used: bool):
+        self.error_rate *= 1 - ERROR_ALPHA
+        self.latency_ms = (latency_ms if self.latency_ms is None else
+                           (1 - LATENCY_ALPHA) * self.latency_ms + LATENCY_ALPHA * latency_ms)
+        if self.baseline_ms is None or latency_ms < self.baseline_ms:
+            self.baseline_ms = latency_ms
+        else:
+            self.baseline_ms += (latency_ms - self.baseline_ms) * BASELINE_DRIFT
+        if self.latency_ms > self.tolerance * self.baseline_ms:
+            self._decrease(self.backoff)
+        elif used and self._limit < self.max_limit:
+            self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+            self.increases += 1
+
+    def _on_error(self, err: BaseException):
+        if is_overload(err):
+            self._decrease(self.error_backoff)
+        elif is_server_error(err):
+            self.error_rate = (1 - ERROR_ALPHA) * self.error_rate + ERROR_ALPHA
+            if self.error_rate > ERROR_RATE_MAX:
+                self._decrease(self.error_backoff)
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency_ms or 0.0) / 1000:
+            return  # đã giảm trong vòng 1 latency gần đây
+        self._last_decrease = now
+        self._limit = max(self._limit * factor, float(self.min_limit))
+        self.decreases += 1
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting,
+                    "urgent_waiting": self.urgent_waiting,
+                    "latency_ms": self.latency_ms, "baseline_ms": self.baseline_ms,
+                    "error_rate": round(self.error_rate, 3),
+                    "increases": self.increases, "decreases": self.decreases}
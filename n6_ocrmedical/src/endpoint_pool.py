@@ -0,0 +1,171 @@
+import threading, time, requests
+from contextlib import contextmanager
+
+from ocr_errors import CircuitOpenError, DeadlineExceeded, OCRCancelled
+from ocr_retry import BREAKER_FAILURES, BREAKER_RESET, CircuitBreaker
+
+HEALTH_INTERVAL = 10   # giây giữa 2 lần GET /models kiểm tra mỗi server
+HEALTH_TIMEOUT = 3
+LATENCY_ALPHA = 0.2    # hệ số EWMA cho latency quan sát được
+
+POLICIES = ("least_outstanding", "latency")
+
+
+def parse_urls(base_url) -> list:
+    """'http://a/v1,http://b/v1' hoặc list/tuple -> list URL (bỏ '/' cuối)."""
+    urls = base_url.split(",") if isinstance(base_url, str) else list(base_url)
+    urls = [u.strip().rstrip("/") for u in urls if u and u.strip()]
+    if not urls:
+        raise ValueError("Cần ít nhất 1 base_url")
+    return urls
+
+
+def is_endpoint_fault(exc: Exception) -> bool:
+    """Lỗi do server (mạng, timeout, 5xx) mới tính vào breaker; 4xx / hết deadline job thì không."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    resp = getattr(exc, "response", None)
+    status = getattr(resp, "status_code", None) or getattr(exc, "status", None)
+    return not isinstance(status, int) or status >= 500
+
+
+class Endpoint:
+    __slots__ = ("url", "outstanding", "latency_ms", "breaker", "requests", "errors")
+
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url
+        self.outstanding = 0
+        self.latency_ms = None   # EWMA; None = chưa có số đo
+        self.breaker = breaker
+        self.requests = 0
+        self.errors = 0
+
+    def snapshot(self) -> dict:
+        return {"url": self.url, "outstanding": self.outstanding, "latency_ms": self.latency_ms,
+                "state": self.breaker.state, "requests": self.requests, "errors": self.errors}
+
+
+class EndpointPool:
+    """Chọn server LM Studio cho từng request trong nhiều máy chạy cùng model.
+
+    policy="least_outstanding": server ít request đang chạy nhất (hoà -> latency thấp hơn).
+    policy="latency": nhỏ nhất theo latency EWMA x (outstanding + 1).
+    Mỗi server có 1 CircuitBreaker: lỗi breaker_failures lần liên tiếp (hoặc health check
+    fail) -> ngắt breaker_reset giây, sau đó cho 1 request thử (half-open).
+    Thread nền GET /models định kỳ khi có nhiều server; mọi server đều ngắt -> CircuitOpenError.
+    """
+
+    def __init__(self, urls, policy: str = "least_outstanding",
+                 health_interval: float = HEALTH_INTERVAL,
+                 breaker_failures: int = BREAKER_FAILURES, breaker_reset: float = BREAKER_RESET):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.endpoints = [Endpoint(u, CircuitBreaker(breaker_failures, breaker_reset))
+                          for u in parse_urls(urls)]
+        self.policy = policy
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._rr = 0  # xoay vòng khi hoà để chia đều server chưa có số đo
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    @property
+    def urls(self) -> list:
+        return [ep.url for ep in self.endpoints]
+
+    # ---- chọn server ----
+    def _score(self, ep: Endpoint):
+        lat = ep.latency_ms or 0.0
+        if self.policy == "latency":
+            return (lat * (ep.outstanding + 1), ep.outstanding)
+        return (ep.outstanding, lat)
+
+    def pick(self) -> Endpoint:
+        self._ensure_health_thread()
+        now = time.monotonic()
+        with self._lock:
+            n = len(self.endpoints)
+            order = [self.endpoints[(self._rr + i) % n] for i in range(n)]
+            self._rr = (self._rr + 1) % n
+            live = [ep for ep in order if ep.breaker.ready(now)]
+            if not live:
+                wait = min(ep.breaker.retry_after(now) for ep in order)
+                raise CircuitOpenError("All OCR endpoints are unavailable (circuit open)",
+                                       retry_after=wait)
+            ep = min(live, key=self._score)
+            ep.breaker.on_pick()
+            ep.outstanding += 1
+            ep.requests += 1
+            return ep
+
+    def release(self, ep: Endpoint, ok: bool, latency_ms: float = None):
+        """ok=None: request bị bỏ giữa chừng -> chỉ trả slot, không tính thành công / lỗi."""
+        with self._lock:
+            ep.outstanding -= 1
+            if ok is None:
+                ep.breaker.abandon()
+            elif ok:
+                ep.breaker.success()
+                if latency_ms is not None:
+                    ep.latency_ms = (latency_ms if ep.latency_ms is None else
+                                     (1 - LATENCY_ALPHA) * ep.latency_ms + LATENCY_ALPHA * latency_ms)
+            else:
+                ep.errors += 1
+                ep.breaker.failure(time.monotonic())
+
+    @contextmanager
+    def acquire(self):
+        """with pool.acquire() as ep: ... -> tự release; lỗi phía server ném ra được tính là fail."""
+        ep = self.pick()
+        t0 = time.perf_counter()
+        try:
+            yield ep
+        except (DeadlineExceeded, OCRCancelled):  # client tự bỏ: không biết server sống hay chết
+            self.release(ep, None)
+            raise
+        except Exception as e:
+            self.release(ep, not is_endpoint_fault(e))
+            raise
+        except BaseException:  # GeneratorExit khi người dùng dừng đọc stream giữa chừng, Ctrl+C
+            self.release(ep, None)
+            raise
+        self.release(ep, True, (time.perf_counter() - t0) * 1000)
+
+    # ---- health check ----
+    def check(self, ep: Endpoint) -> bool:
+        try:
+            ok = requests.get(f"{ep.url}/models", timeout=HEALTH_TIMEOUT).ok
+        except requests.RequestException:
+            ok = False
+        with self._lock:
+            if not ok:
+                ep.breaker.trip(time.monotonic())  # còn chết -> ngắt (gia hạn) thêm
+            else:
+                ep.breaker.expire(time.monotonic())
+        return ok
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for ep in self.endpoints:
+                if self._stop.is_set():
+                    return
+                self.check(ep)
+
+    def _ensure_health_thread(self):
+        if len(self.endpoints) < 2 or self._health_thread is not None:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, daemon=True,
+                                                       name="endpoint-health")
+                self._health_thread.start()
+
+    def stats(self) -> list:
+        with self._lock:
+            return [ep.snapshot() for ep in self.endpoints]
+
+    def close(self):
+        self._stop.set()
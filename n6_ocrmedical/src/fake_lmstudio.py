@@ -0,0 +1,290 @@
+# ============================================================
+# Server giả lập LM Studio (/v1/chat/completions) để đo client không cần GPU
+#
+#   python n6_ocrmedical/src/fake_lmstudio.py --port 1234 --latency-ms 300 --tps 80
+#
+# Cấu hình: độ trễ prefill, tokens/s, tỉ lệ lỗi 5xx, số slot GPU, stream SSE.
+# --slot-schedule 0:4,20:1,40:8 -> đổi số slot theo thời gian (mô phỏng máy bị chiếm / được giải phóng).
+# --hard-rate 0.2 -> 20% request có ảnh nhỏ (< --hard-below-kb) trả text không đọc được (đo cascade).
+# --fail-first 3 -> 3 request đầu trả 500 (test retry / circuit breaker không phụ thuộc may rủi).
+# Dùng trong code: with FakeLMStudio(latency_ms=50) as srv: OCRClient(base_url=srv.base_url)
+# ============================================================
+
+import argparse, json, random, sys, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ("Kết quả xét nghiệm Glucose Ure Creatinin AST ALT Cholesterol "
+         "Triglycerid HDL LDL Hồng cầu Bạch cầu Tiểu cầu mmol/L U/L bình thường").split()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # ---- đọc body: Content-Length hoặc chunked upload ----
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            self.server.fake._count("chunked_uploads")
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, code: int, obj):
+        out = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_GET(self):
+        srv = self.server.fake
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": srv.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        srv = self.server.fake
+        body = self._read_body()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            req = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        srv._count("requests")
+        srv.last_request = req
+        if srv.rng_error():
+            srv._count("errors")
+            self._send_json(500, {"error": "simulated server error"})
+            return
+
+        n_tokens = min(srv.tokens, int(req.get("max_tokens") or srv.tokens))
+        text = srv.unreadable_text() if srv.rng_hard(len(body)) else srv.text(n_tokens)
+        prompt_tokens = max(len(body) // 4, 1)  # ước lượng thô theo kích thước payload
+        with srv.slots:  # GPU chỉ xử lý 'slots' request cùng lúc, còn lại xếp hàng
+            srv._inflight(+1)
+            try:
+                time.sleep(srv.latency_ms / 1000 + srv.latency_per_mb_ms * len(body) / 1e9)
+                if req.get("stream"):
+                    self._stream(srv, text)
+                else:
+                    time.sleep(n_tokens / srv.tps)
+                    # bị cắt bởi max_tokens (hoặc --truncate) -> finish_reason=length như server thật
+                    finish = "length" if srv.truncate or n_tokens < srv.tokens else "stop"
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "model": srv.model,
+                        "choices": [{"index": 0, "finish_reason": finish,
+                                     "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens,
+                                  "total_tokens": prompt_tokens + n_tokens},
+                    })
+            finally:
+                srv._inflight(-1)
+
+    def _stream(self, srv, text: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        words = text.split(" ")
+        for i, w in enumerate(words):
+            time.sleep(1 / srv.tps)
+            delta = {"choices": [{"index": 0, "delta": {"content": w if i == 0 else " " + w}}]}
+            chunk(("data: " + json.dumps(delta, ensure_ascii=False) + "\n\n").encode("utf-8"))
+        chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _Slots:
+    """Như Semaphore nhưng đổi được số slot lúc đang chạy (request đang xử lý không bị cắt)."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.busy = 0
+        self._cond = threading.Condition()
+
+    def set(self, n: int):
+        with self._cond:
+            self.n = n
+            self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            while self.busy >= self.n:
+                self._cond.wait()
+            self.busy += 1
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.busy -= 1
+            self._cond.notify_all()
+
+
+def parse_schedule(text: str) -> list:
+    """'0:4,20:1,40:8' -> [(0.0, 4), (20.0, 1), (40.0, 8)] (giây kể từ lúc server chạy, số slot)."""
+    out = []
+    for part in (text or "").split(","):
+        if part.strip():
+            t, n = part.split(":")
+            out.append((float(t), int(n)))
+    return sorted(out)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # client đóng keep-alive connection khi thoát -> không in traceback
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeLMStudio:
+    """Server giả lập chạy trên thread nền; base_url dùng thẳng cho OCRClient."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 200,
+                 tps: float = 100, tokens: int = 120, error_rate: float = 0.0, slots: int = 4,
+                 latency_per_mb_ms: float = 0.0, truncate: bool = False,
+                 model: str = "qwen/qwen2.5-vl-7b", seed: int = None, slot_schedule=(),
+                 hard_rate: float = 0.0, hard_below_kb: float = 150, fail_first: int = 0):
+        self.latency_ms = latency_ms
+        self.tps = tps
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.fail_first = fail_first  # số request đầu tiên luôn trả 500
+        self.hard_rate = hard_rate
+        self.hard_below = hard_below_kb * 1024
+        self.latency_per_mb_ms = latency_per_mb_ms
+        self.truncate = truncate
+        self.model = model
+        self.slots = _Slots(slots)
+        self.slot_schedule = list(slot_schedule)
+        self.stats = {"requests": 0, "errors": 0, "inflight": 0, "max_inflight": 0, "chunked_uploads": 0}
+        self.last_request = None  # JSON request /chat/completions gần nhất (test so nội dung body)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def rng_error(self) -> bool:
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return True
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def rng_hard(self, body_bytes: int) -> bool:
+        """Ảnh gửi lên quá nhỏ -> đôi khi model "không đọc ra" (ảnh cỡ đầy đủ luôn đọc được)."""
+        with self._lock:
+            return self.hard_rate > 0 and body_bytes < self.hard_below and self._rng.random() < self.hard_rate
+
+    def unreadable_text(self) -> str:
+        return "K?t qu? ## ~~ ..."
+
+    def text(self, n_tokens: int) -> str:
+        return " ".join(WORDS[i % len(WORDS)] for i in range(n_tokens))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _inflight(self, d: int):
+        with self._lock:
+            self.stats["inflight"] += d
+            self.stats["max_inflight"] = max(self.stats["max_inflight"], self.stats["inflight"])
+
+    def _run_schedule(self):
+        t0 = time.monotonic()
+        for at, n in self.slot_schedule:
+            time.sleep(max(at - (time.monotonic() - t0), 0))
+            self.slots.set(n)
+
+    def start_schedule(self):
+        if self.slot_schedule:
+            threading.Thread(target=self._run_schedule, daemon=True, name="slot-schedule").start()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.start_schedule()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Fake LM Studio /v1/chat/completions server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=1234, help="0 = cổng ngẫu nhiên")
+    p.add_argument("--latency-ms", type=float, default=200, help="độ trễ prefill mỗi request")
+    p.add_argument("--latency-per-mb-ms", type=float, default=0.0, help="thêm trễ theo kích thước payload")
+    p.add_argument("--tps", type=float, default=100, help="tokens/giây khi sinh text")
+    p.add_argument("--tokens", type=int, default=120, help="số token trả về (<= max_tokens)")
+    p.add_argument("--error-rate", type=float, default=0.0, help="tỉ lệ trả 500 (0..1)")
+    p.add_argument("--slots", type=int, default=4, help="số request GPU xử lý song song")
+    p.add_argument("--slot-schedule", default="",
+                   help="đổi số slot theo thời gian: 'giây:slots,...' vd. 0:4,20:1,40:8")
+    p.add_argument("--truncate", action="store_true", help="báo finish_reason=length")
+    p.add_argument("--hard-rate", type=float, default=0.0,
+                   help="tỉ lệ request ảnh nhỏ trả text không đọc được (0..1)")
+    p.add_argument("--hard-below-kb", type=float, default=150,
+                   help="body nhỏ hơn chừng này KB mới có thể bị --hard-rate")
+    p.add_argument("--fail-first", type=int, default=0, help="số request đầu tiên luôn trả 500")
+    p.add_argument("--seed", type=int)
+    return p
+
+
+def main(argv=None) -> int:
+    a = build_parser().parse_args(argv)
+    srv = FakeLMStudio(a.host, a.port, a.latency_ms, a.tps, a.tokens, a.error_rate, a.slots,
+                       a.latency_per_mb_ms, a.truncate, seed=a.seed,
+                       slot_schedule=parse_schedule(a.slot_schedule),
+                       hard_rate=a.hard_rate, hard_below_kb=a.hard_below_kb, fail_first=a.fail_first)
+    # dòng đầu stdout: base_url (bench.py đọc dòng này khi chạy server ở process riêng)
+    print(srv.base_url, flush=True)
+    srv.start_schedule()
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect
+from PySide6.QtGui import QColor, QFont, QFontMetrics
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+
+# Màu trạng thái của từng dòng file
+STATUS_COLORS = {
+    "Ready":   "#2e7d32",
+    "Queued":  "#6b7280",
+    "Running": "#1d4ed8",
+    "Done":    "#2e7d32",
+    "Failed":  "#b91c1c",
+    "Duplicate": "#b45309",  # gần trùng ảnh đã có -> người dùng xem lại, vẫn OCR riêng
+}
+
+# Role riêng (Qt.UserRole giữ nguyên = đường dẫn thật như trước)
+PathRole     = Qt.UserRole
+StatusRole   = Qt.UserRole + 1
+SizeTextRole = Qt.UserRole + 2
+
+
+def format_size(size) -> str:
+    if size is None:
+        return "--"
+    if size < 1024:
+        return "1 KB"
+    kb = size // 1024
+    if kb < 1024:
+        return f"{kb} KB"
+    mb = size / (1024 * 1024)
+    return f"{mb:.1f} MB" if mb < 10 else f"{int(mb)} MB"
+
+
+class FileEntry:
+    __slots__ = ("path", "name", "size", "status", "error")
+
+    def __init__(self, path: str, size=None, status: str = "Ready"):
+        self.path = path
+        self.name = os.path.basename(path) if path else "Unnamed"
+        self.size = size        # None -> stat lười khi dòng được vẽ lần đầu
+        self.status = status
+        self.error = None
+
+
+class FileListModel(QAbstractListModel):
+    """Danh sách file (upload list + History dùng chung), mỗi dòng chỉ là 1 FileEntry."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries = []
+
+    # ---- Qt API ----
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        e = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return e.name
+        if role == PathRole:
+            return e.path
+        if role == StatusRole:
+            return e.status
+        if role == SizeTextRole:
+            if e.size is None:
+                try:
+                    e.size = os.path.getsize(e.path)
+                except OSError:
+                    e.size = -1
+            return format_size(e.size) if e.size >= 0 else "--"
+        if role == Qt.ToolTipRole:
+            return e.error or e.path
+        return None
+
+    # ---- Nghiệp vụ ----
+    def append_paths(self, paths, sizes=None, states=None):
+        """Thêm nhiều file trong 1 lần beginInsertRows (nhanh với list lớn).
+
+        states: path -> (status, error) đọc từ JobStore, để dòng đã OCR hiện "Done" ngay.
+        """
+        if not paths:
+            return
+        first = len(self._entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        if sizes is None:
+            new = [FileEntry(p) for p in paths]
+        else:
+            new = [FileEntry(p, s) for p, s in zip(paths, sizes)]
+        if states:
+            for e in new:
+                st = states.get(e.path)
+                if st is not None:
+                    e.status, e.error = st
+        self._entries.extend(new)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._entries = []
+        self.endResetModel()
+
+    def paths(self) -> list:
+        return [e.path for e in self._entries]
+
+    def path(self, row: int) -> str:
+        return self._entries[row].path
+
+    def status(self, row: int) -> str:
+        return self._entries[row].status
+
+    def error(self, row: int):
+        return self._entries[row].error
+
+    def set_status(self, row: int, status: str, error: str = None):
+        if not 0 <= row < len(self._entries):
+            return
+        e = self._entries[row]
+        e.status = status
+        e.error = error
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [StatusRole, Qt.ToolTipRole])
+
+
+class UploadRowDelegate(QStyledItemDelegate):
+    """Vẽ 1 dòng: số thứ tự | tên | trạng thái | dung lượng (thay cho UploadRow widget)."""
+
+    ROW_H = 30
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_H)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, QColor("#eef2ff"))
+        elif option.state & QStyle.State_MouseOver:
+            painter.fillRect(option.rect, QColor("#f9fafb"))
+
+        r = option.rect.adjusted(4, 4, -4, -4)
+        bold = QFont(option.font); bold.setBold(True)
+
+        idx_rect    = QRect(r.left(), r.top(), 26, r.height())
+        size_rect   = QRect(r.right() - 70, r.top(), 70, r.height())
+        status_rect = QRect(size_rect.left() - 8 - 84, r.top(), 84, r.height())
+        name_rect   = QRect(idx_rect.right() + 8, r.top(),
+                            status_rect.left() - 8 - idx_rect.right() - 8, r.height())
+
+        painter.setFont(bold)
+        painter.setPen(QColor("#111827"))
+        painter.drawText(idx_rect, Qt.AlignCenter, f"{index.row() + 1:02d}")
+
+        painter.setPen(QColor("#1f2937"))
+        name = QFontMetrics(bold).elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, name_rect.width())
+        painter.drawText(name_rect, Qt.AlignVCenter | Qt.AlignLeft, name)
+
+        status = index.data(StatusRole)
+        # "Page i/n" (PDF/TIFF đang chạy) dùng màu Running
+        painter.setPen(QColor(STATUS_COLORS.get(status, STATUS_COLORS["Running"])))
+        painter.drawText(status_rect, Qt.AlignVCenter | Qt.AlignLeft, status)
+
+        painter.setFont(option.font)
+        painter.setPen(QColor("#6b7280"))
+        painter.drawText(size_rect, Qt.AlignVCenter | Qt.AlignRight, index.data(SizeTextRole))
+        painter.restore()
+
+
+class HistoryDelegate(QStyledItemDelegate):
+    """Vẽ 1 dòng History: icon | tên + dung lượng | caret (thay cho HistoryItem widget)."""
+
+    ROW_H = 42
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_H)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, QColor("#eef2ff"))
+
+        r = option.rect.adjusted(8, 5, -8, -5)
+        icon_rect  = QRect(r.left(), r.top(), 16, r.height())
+        caret_rect = QRect(r.right() - 16, r.top(), 16, r.height())
+        text_rect  = QRect(icon_rect.right() + 6, r.top(),
+                           caret_rect.left() - 6 - icon_rect.right() - 6, r.height())
+
+        painter.drawText(icon_rect, Qt.AlignCenter, "📄")
+
+        bold = QFont(option.font); bold.setBold(True)
+        painter.setFont(bold)
+        painter.setPen(QColor("#2d3748"))
+        name = QFontMetrics(bold).elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignTop | Qt.AlignLeft, name)
+
+        small = QFont(option.font); small.setPixelSize(11)
+        painter.setFont(small)
+        painter.setPen(QColor("#6b7280"))
+        painter.drawText(text_rect, Qt.AlignBottom | Qt.AlignLeft, index.data(SizeTextRole))
+
+        caret = QFont(option.font); caret.setPixelSize(14)
+        painter.setFont(caret)
+        painter.setPen(QColor("#9aa3af"))
+        painter.drawText(caret_rect, Qt.AlignCenter, "▾")
+        painter.restore()
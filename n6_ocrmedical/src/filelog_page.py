@@ -1,13 +1,29 @@
+import os
 from PySide6.QtWidgets import (
     QWidget, QFrame, QVBoxLayout, QHBoxLayout, QGridLayout,
-    QLabel, QPushButton, QLineEdit, QListWidget, QListWidgetItem
+    QLabel, QPushButton, QLineEdit, QListWidget, QListWidgetItem, QButtonGroup
 )
 from PySide6.QtGui import QIcon, QPixmap
-from PySide6.QtCore import Qt, QSize
+from PySide6.QtCore import Qt, QSize, Signal
+from search_box import SearchBox
+from file_list_model import format_size
+from job_store import JobStore, get_job_store
+
+MARGIN    = 24
+GUTTER    = 24
+GAP_PANEL = 26
+
+FILE_LOG_DAYS = 60
+FILE_LOG_HISTORY = 50
 
 class FileLogPage(QWidget):
-    def __init__(self):
+    """Nhật ký OCR: thư mục theo ngày + History, đọc từ JobStore (không quét lại thư mục)."""
+
+    file_activated = Signal(str)  # chọn kết quả tìm kiếm / dòng History -> mở text đã OCR
+
+    def __init__(self, store: JobStore = None):
         super().__init__()
+        self.store = store
 
         root = QGridLayout(self)
         root.setContentsMargins(MARGIN, MARGIN, MARGIN, MARGIN)
@@ -37,6 +53,8 @@ class FileLogPage(QWidget):
         l.addSpacing(30)
 
         # Sidebar menu
+        group = QButtonGroup(self); group.setExclusive(True)
+
         def menu_btn(text, icon_path, checked=False):
             b = QPushButton(text)
             b.setCheckable(True)
@@ -44,10 +62,13 @@ class FileLogPage(QWidget):
             b.setIconSize(QSize(20,20))
             b.setStyleSheet("QPushButton{padding:6px; text-align:left;}")
             if checked: b.setChecked(True)
+            group.addButton(b)
             return b
 
-        l.addWidget(menu_btn("Home", "icons/home.png"))
-        l.addWidget(menu_btn("File Log", "icons/folder.png", checked=True))
+        self.btn_home = menu_btn("Home", "icons/home.png")
+        l.addWidget(self.btn_home)
+        self.btn_file_log = menu_btn("File Log", "icons/folder.png", checked=True)
+        l.addWidget(self.btn_file_log)
         l.addWidget(menu_btn("Extract Info", "icons/scan.png"))
         l.addWidget(menu_btn("Setting", "icons/settings.png"))
         l.addWidget(menu_btn("Review", "icons/star.png"))
@@ -63,8 +84,9 @@ class FileLogPage(QWidget):
         # Header
         header = QHBoxLayout()
         title = QLabel("OCR - Medical"); title.setStyleSheet("font-size:22px; font-weight:900;")
-        search = QLineEdit(); search.setPlaceholderText("Search files, patients IDs…")
-        search.setFixedHeight(28)
+        search = SearchBox(); search.setFixedHeight(28)
+        search.hit_activated.connect(self.file_activated)
+        self.search_box = search
         header.addWidget(title); header.addStretch(); header.addWidget(search)
         v.addLayout(header)
 
@@ -76,12 +98,9 @@ class FileLogPage(QWidget):
             toolbar.addWidget(b)
         v.addLayout(toolbar)
 
-        # File list (folders)
-        file_list = QListWidget()
-        for i in range(6):
-            item = QListWidgetItem(QIcon("icons/folder.png"), "09/10/2025")
-            file_list.addItem(item)
-        v.addWidget(file_list)
+        # File list (folders): mỗi ngày có job OCR xong là 1 thư mục
+        self.day_list = QListWidget()
+        v.addWidget(self.day_list)
 
         return panel
 
@@ -98,10 +117,28 @@ class FileLogPage(QWidget):
         # History
         h_title = QLabel("History"); h_title.setStyleSheet("font-size:16px; font-weight:700;")
         v.addWidget(h_title)
-        history = QListWidget()
-        for i in range(5):
-            item = QListWidgetItem(QIcon("icons/file.png"), "file_280...25.text   3.5Mb")
-            history.addItem(item)
-        v.addWidget(history)
+        self.history = QListWidget()
+        self.history.itemActivated.connect(lambda item: self.file_activated.emit(item.data(Qt.UserRole)))
+        v.addWidget(self.history)
 
         return panel
+
+    def refresh(self):
+        """Nạp lại thư mục theo ngày + History từ JobStore."""
+        store = self.store or get_job_store()
+        self.day_list.clear()
+        for day, n in store.days(FILE_LOG_DAYS):
+            item = QListWidgetItem(QIcon("icons/folder.png"), day)
+            item.setToolTip(f"{n} files")
+            self.day_list.addItem(item)
+        self.history.clear()
+        for job in store.recent(FILE_LOG_HISTORY):
+            item = QListWidgetItem(QIcon("icons/file.png"),
+                                   f"{os.path.basename(job.path)}   {format_size(job.size)}   {job.status}")
+            item.setData(Qt.UserRole, job.path)
+            item.setToolTip(job.error or job.path)
+            self.history.addItem(item)
+
+    def showEvent(self, e):
+        self.refresh()
+        super().showEvent(e)
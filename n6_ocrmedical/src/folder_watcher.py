@@ -0,0 +1,140 @@
+import os, time
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, Signal
+
+WATCH_DEBOUNCE_MS = 500   # gom loạt sự kiện (copy 50 file 1 lúc) thành 1 lần so sánh
+WATCH_SETTLE_MS = 1500    # file phải giữ nguyên size + mtime chừng này mới coi là ghi xong
+
+
+class WatchSignals(QObject):
+    done = Signal(int, list, list, bool)  # (gen, paths mới, sizes, còn file đang ghi dở)
+
+
+class WatchDiffTask(QRunnable):
+    """Liệt kê thư mục, chỉ stat các tên chưa biết; file mới chỉ được báo khi đã ghi xong.
+
+    known / pending thuộc FolderWatcher nhưng chỉ bị sửa ở đây (pool 1 thread -> không tranh chấp).
+    """
+
+    def __init__(self, gen: int, folder: str, extensions, known: set, pending: dict, settle_s: float):
+        super().__init__()
+        self.gen = gen
+        self.folder = folder
+        self.extensions = extensions
+        self.known = known
+        self.pending = pending  # path -> ((size, mtime_ns), lúc thấy chữ ký này lần đầu)
+        self.settle_s = settle_s
+        self.signals = WatchSignals()
+
+    def run(self):
+        now = time.monotonic()
+        paths, sizes, seen = [], [], set()
+        try:
+            with os.scandir(self.folder) as it:
+                for e in it:
+                    if e.path in self.known:
+                        continue
+                    if self.extensions and not e.name.lower().endswith(self.extensions):
+                        continue
+                    try:
+                        if not e.is_file():
+                            continue
+                        st = e.stat()
+                    except OSError:
+                        continue  # file bị xóa / đổi tên giữa chừng
+                    seen.add(e.path)
+                    sig = (st.st_size, st.st_mtime_ns)
+                    prev = self.pending.get(e.path)
+                    if prev is None or prev[0] != sig:
+                        self.pending[e.path] = (sig, now)  # mới thấy hoặc vẫn đang được ghi
+                    elif st.st_size > 0 and now - prev[1] >= self.settle_s:
+                        del self.pending[e.path]
+                        self.known.add(e.path)
+                        paths.append(e.path)
+                        sizes.append(st.st_size)
+        except OSError:
+            pass
+        for p in [p for p in self.pending if p not in seen]:
+            del self.pending[p]  # file tạm của scanner đã bị đổi tên / xóa
+        self.signals.done.emit(self.gen, paths, sizes, bool(self.pending))
+
+
+class FolderWatcher(QObject):
+    """Theo dõi 1 thư mục (QFileSystemWatcher: inotify / ReadDirectoryChangesW), báo file mới đã ghi xong."""
+    files_added = Signal(list, list)  # (paths, sizes)
+
+    def __init__(self, extensions=None, debounce_ms: int = WATCH_DEBOUNCE_MS,
+                 settle_ms: int = WATCH_SETTLE_MS, parent=None):
+        super().__init__(parent)
+        self.extensions = tuple(extensions) if extensions else None
+        self.settle_ms = settle_ms
+        self.folder = None
+        self._gen = 0
+        self._known = set()
+        self._pending = {}
+        self._running = False   # đang có WatchDiffTask chạy
+        self._dirty = False     # có sự kiện mới trong lúc task chạy -> so sánh lại
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._fs = QFileSystemWatcher(self)
+        self._fs.directoryChanged.connect(self._on_changed)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self._diff)
+        self._settle = QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.setInterval(settle_ms)
+        self._settle.timeout.connect(self._diff)
+
+    def start(self, folder: str, known_paths):
+        """Bắt đầu theo dõi; known_paths = các file đã có trong list (không báo lại)."""
+        self.stop()
+        if not self._fs.addPath(folder):
+            return False
+        self.folder = folder
+        self._known = set(known_paths)
+        self._pending = {}
+        self._diff()  # bắt file tới trong lúc quét ban đầu
+        return True
+
+    def stop(self):
+        self._gen += 1  # bỏ qua kết quả của task cũ
+        self._debounce.stop()
+        self._settle.stop()
+        if self._fs.directories():
+            self._fs.removePaths(self._fs.directories())
+        self.folder = None
+
+    def is_active(self) -> bool:
+        return self.folder is not None
+
+    def _on_changed(self, _path: str):
+        self._debounce.start()
+
+    def _diff(self):
+        if self.folder is None:
+            return
+        if self._running:
+            self._dirty = True
+            return
+        self._running = True
+        task = WatchDiffTask(self._gen, self.folder, self.extensions, self._known, self._pending,
+                             self.settle_ms / 1000)
+        task.signals.done.connect(self._on_diff_done)
+        self._pool.start(task)
+
+    def _on_diff_done(self, gen: int, paths: list, sizes: list, pending: bool):
+        self._running = False
+        if gen != self._gen:
+            if self.folder is not None:
+                self._diff()  # task cũ chạy với known cũ -> so sánh lại với thư mục mới
+            return
+        if paths:
+            self.files_added.emit(paths, sizes)
+        if self._dirty:
+            self._dirty = False
+            self._debounce.start()
+        elif pending:
+            self._settle.start()  # size/mtime không phát sự kiện khi đứng yên -> tự kiểm lại
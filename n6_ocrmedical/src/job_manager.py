@@ -0,0 +1,147 @@
+import itertools, threading, time
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from ocr_errors import OCRCancelled
+
+# Ưu tiên: job người dùng đang chờ (nút Result) luôn trước batch / watch-folder
+INTERACTIVE = 10
+PREFETCH = 5      # đoán trước file người dùng sắp bấm Result: trước batch, cùng làn với batch
+BACKGROUND = 0
+INTERACTIVE_WORKERS = 2  # làn riêng: không phải xếp hàng sau 2000 ảnh của batch
+BACKGROUND_WORKERS = 4
+
+
+class OCRJob(QRunnable):
+    """1 job trong JobManager: gọi fn(job) trên thread của pool.
+
+    fn kiểm tra job.check() ở các điểm dừng được (giữa các token / trang) để hủy sớm;
+    request đang bay không dừng giữa chừng được -> kết quả bị bỏ, báo cancelled.
+    """
+
+    def __init__(self, manager, job_id: int, fn, priority: int):
+        super().__init__()
+        self.setAutoDelete(False)  # JobManager giữ tham chiếu tới khi job kết thúc
+        self.manager = manager
+        self.job_id = job_id
+        self.fn = fn
+        self.priority = priority
+        self.queued_at = time.time()
+        self.info = {}  # fn ghi thêm thông tin trả về kèm kết quả (duplicate_of…)
+        self.cancelled = False
+
+    def check(self):
+        if self.cancelled:
+            raise OCRCancelled("cancelled")
+
+    def progress(self, text: str):
+        if not self.cancelled:
+            self.manager.progress.emit(self.job_id, text)
+
+    def delta(self, text: str):
+        if not self.cancelled:
+            self.manager.delta.emit(self.job_id, text)
+
+    def run(self):
+        m = self.manager
+        if self.cancelled:
+            m._finish(self.job_id)
+            m.cancelled.emit(self.job_id)
+            return
+        m.started.emit(self.job_id)
+        try:
+            result = self.fn(self)
+            self.check()
+        except OCRCancelled:
+            m._finish(self.job_id)
+            m.cancelled.emit(self.job_id)
+        except Exception as e:
+            m._finish(self.job_id)
+            m.failed.emit(self.job_id, e)
+        else:
+            m._finish(self.job_id)
+            m.done.emit(self.job_id, result, self.info)
+
+
+class JobManager(QObject):
+    """Điều phối mọi job OCR của app: id riêng, ưu tiên, hủy job đang chờ / đang chạy.
+
+    Job INTERACTIVE chạy trên pool riêng nên độ trễ không phụ thuộc độ dài hàng đợi batch;
+    trong mỗi pool, job ưu tiên cao hơn được lấy ra trước. Mọi signal mang job_id,
+    nơi nhận tự bỏ qua kết quả của job không còn quan tâm.
+    """
+    started   = Signal(int)                # job_id
+    progress  = Signal(int, str)           # (job_id, "Page i/n")
+    delta     = Signal(int, str)           # (job_id, đoạn text stream)
+    done      = Signal(int, object, dict)  # (job_id, kết quả, job.info)
+    failed    = Signal(int, object)        # (job_id, exception)
+    cancelled = Signal(int)                # job_id
+
+    def __init__(self, background_workers: int = BACKGROUND_WORKERS,
+                 interactive_workers: int = INTERACTIVE_WORKERS, parent=None):
+        super().__init__(parent)
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.background_pool = QThreadPool(self)
+        self.background_pool.setMaxThreadCount(background_workers)
+        self.interactive_pool = QThreadPool(self)
+        self.interactive_pool.setMaxThreadCount(interactive_workers)
+
+    def _pool(self, priority: int) -> QThreadPool:
+        return self.interactive_pool if priority >= INTERACTIVE else self.background_pool
+
+    def set_background_workers(self, n: int):
+        self.background_pool.setMaxThreadCount(n)
+
+    def submit(self, fn, priority: int = BACKGROUND) -> int:
+        """Xếp fn(job) vào hàng đợi, trả về job_id."""
+        job_id = next(self._ids)
+        job = OCRJob(self, job_id, fn, priority)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._pool(priority).start(job, priority)
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """Hủy job: đang chờ -> rút khỏi hàng đợi ngay; đang chạy -> dừng ở điểm check() kế tiếp."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancelled = True
+        if self._pool(job.priority).tryTake(job):
+            self._finish(job_id)
+            self.cancelled.emit(job_id)
+        return True
+
+    def withdraw(self, job_id: int) -> bool:
+        """Rút job chưa chạy khỏi hàng đợi mà không báo cancelled (được thay bằng job khác).
+        False nếu job đã bắt đầu chạy / đã xong.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.cancelled or not self._pool(job.priority).tryTake(job):
+            return False
+        self._finish(job_id)
+        return True
+
+    def cancel_all(self, priority: int = None):
+        """Hủy mọi job (hoặc mọi job có priority cho trước)."""
+        with self._lock:
+            ids = [i for i, j in self._jobs.items() if priority is None or j.priority == priority]
+        for job_id in ids:
+            self.cancel(job_id)
+
+    def is_active(self, job_id: int) -> bool:
+        """Job còn đang chờ / đang chạy và chưa bị hủy."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job is not None and not job.cancelled
+
+    def pending(self, priority: int = None) -> int:
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if priority is None or j.priority == priority)
+
+    def _finish(self, job_id: int):
+        with self._lock:
+            self._jobs.pop(job_id, None)
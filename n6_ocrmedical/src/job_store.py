@@ -0,0 +1,200 @@
+import hashlib, json, os, sqlite3, threading, time
+from collections import namedtuple
+
+JOB_STORE_PATH = "n6_ocrmedical/data/db/jobs.sqlite3"
+HASH_CHUNK = 1024 * 1024
+
+# Trạng thái lưu trong store (UI còn có "Ready" / "Page i/n" nhưng không ghi xuống đĩa)
+QUEUED, RUNNING, DONE, FAILED = "Queued", "Running", "Done", "Failed"
+
+Job = namedtuple("Job", "path hash status attempts size error queued_at started_at finished_at")
+
+
+def file_hash(path: str) -> str:
+    """sha256 nội dung file, đọc theo chunk (file PDF lớn không nằm hết trong RAM)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class JobStore:
+    """Trạng thái job OCR trên đĩa (SQLite): mỗi file 1 dòng, sống qua tắt app / crash.
+
+    Job "Done" có hash trùng nội dung hiện tại -> bỏ qua khi chạy lại batch, trả kết quả cũ.
+    Job còn "Running" lúc mở store (app chết giữa chừng) được đưa về "Queued".
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " path TEXT PRIMARY KEY, hash TEXT, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, size INTEGER, result TEXT, error TEXT,"
+            " timings TEXT, queued_at REAL, started_at REAL, finished_at REAL, mtime_ns INTEGER)"
+        )
+        if "mtime_ns" not in {r[1] for r in self._db.execute("PRAGMA table_info(jobs)")}:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN mtime_ns INTEGER")  # store tạo trước khi có cột
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(finished_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs(hash)")
+        self._db.execute("UPDATE jobs SET status=? WHERE status=?", (QUEUED, RUNNING))
+        self._db.commit()
+
+    # ---- ghi ----
+    def enqueue(self, paths):
+        """Đưa file vào hàng đợi; job đã Done giữ nguyên (hash được kiểm lại lúc chạy)."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO jobs(path, status, queued_at) VALUES (?,?,?)"
+                " ON CONFLICT(path) DO UPDATE SET status=excluded.status, queued_at=excluded.queued_at"
+                " WHERE jobs.status != ?",
+                [(p, QUEUED, now, DONE) for p in paths])
+            self._db.commit()
+
+    def start(self, path: str, content_hash: str, size: int = None, mtime_ns: int = None):
+        """Đánh dấu Running. Nếu đã Done với cùng hash -> trả về kết quả cũ (không chạy lại).
+        size + mtime_ns lúc hash: done_entry() biết file chưa đổi mà không cần hash lại.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT status, hash, result FROM jobs WHERE path=?",
+                                   (path,)).fetchone()
+            if row is not None and row[0] == DONE and row[1] == content_hash:
+                return row[2]
+            self._db.execute(
+                "INSERT INTO jobs(path, hash, status, attempts, size, mtime_ns, queued_at, started_at)"
+                " VALUES (?,?,?,1,?,?,?,?)"
+                " ON CONFLICT(path) DO UPDATE SET hash=excluded.hash, status=excluded.status,"
+                "  attempts=jobs.attempts+1, size=excluded.size, mtime_ns=excluded.mtime_ns,"
+                "  started_at=excluded.started_at, error=NULL, finished_at=NULL",
+                (path, content_hash, RUNNING, size, mtime_ns, time.time(), time.time()))
+            self._db.commit()
+            return None
+
+    def finish(self, path: str, result: str, timings: dict = None):
+        self._end(path, DONE, result, None, timings)
+
+    def fail(self, path: str, error: str, timings: dict = None):
+        self._end(path, FAILED, None, error, timings)
+
+    def _end(self, path, status, result, error, timings):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, timings=?, finished_at=? WHERE path=?",
+                (status, result, error, json.dumps(timings) if timings else None, time.time(), path))
+            self._db.commit()
+
+    def requeue(self, path: str):
+        """Job Running bị hủy giữa chừng (không phải lỗi) -> về Queued, lần quét sau hiện lại là Ready."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status=?, started_at=NULL WHERE path=? AND status=?",
+                             (QUEUED, path, RUNNING))
+            self._db.commit()
+
+    def set_stat(self, path: str, size: int, mtime_ns: int):
+        """File bị touch / copy đè nhưng hash vẫn khớp -> lần sau khỏi hash lại."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET size=?, mtime_ns=? WHERE path=?", (size, mtime_ns, path))
+            self._db.commit()
+
+    def forget(self, path: str):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE path=?", (path,))
+            self._db.commit()
+
+    # ---- đọc ----
+    def statuses(self, paths) -> dict:
+        """path -> (status, error) cho các path đã có trong store."""
+        out = {}
+        paths = list(paths)
+        with self._lock:
+            for i in range(0, len(paths), 500):  # giới hạn số tham số của SQLite
+                chunk = paths[i:i + 500]
+                out.update((p, (s, e)) for p, s, e in self._db.execute(
+                    f"SELECT path, status, error FROM jobs WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk))
+        return out
+
+    def result(self, path: str, content_hash: str = None):
+        """Kết quả job Done; content_hash khác hash lúc OCR (file đã bị ghi đè) -> None."""
+        with self._lock:
+            row = self._db.execute("SELECT result, hash FROM jobs WHERE path=? AND status=?",
+                                   (path, DONE)).fetchone()
+        if row is None or (content_hash is not None and row[1] != content_hash):
+            return None
+        return row[0]
+
+    def done_entry(self, path: str):
+        """(result, hash, size, mtime_ns) của job Done, None nếu chưa có."""
+        with self._lock:
+            row = self._db.execute("SELECT result, hash, size, mtime_ns FROM jobs WHERE path=? AND status=?",
+                                   (path, DONE)).fetchone()
+        return tuple(row) if row else None
+
+    def find_done(self, content_hash: str, exclude: str = None):
+        """(path, result) của 1 job Done khác có cùng sha256 nội dung (file copy), None nếu không có."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, result FROM jobs WHERE hash=? AND status=? AND path IS NOT ? LIMIT 1",
+                (content_hash, DONE, exclude)).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, path: str):
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(Job._fields)} FROM jobs WHERE path=?",
+                                   (path,)).fetchone()
+        return Job(*row) if row else None
+
+    def timings(self, path: str) -> dict:
+        with self._lock:
+            row = self._db.execute("SELECT timings FROM jobs WHERE path=?", (path,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def recent(self, limit: int = 200, status: str = None) -> list:
+        """Job kết thúc gần nhất trước (History)."""
+        sql = f"SELECT {', '.join(Job._fields)} FROM jobs WHERE finished_at IS NOT NULL"
+        args = []
+        if status:
+            sql += " AND status=?"
+            args.append(status)
+        sql += " ORDER BY finished_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [Job(*r) for r in self._db.execute(sql, args)]
+
+    def days(self, limit: int = 60) -> list:
+        """[(dd/mm/YYYY, số job xong)] mới nhất trước (thư mục theo ngày của File Log)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT date(finished_at, 'unixepoch', 'localtime') AS d, COUNT(*) FROM jobs"
+                " WHERE finished_at IS NOT NULL GROUP BY d ORDER BY d DESC LIMIT ?",
+                (limit,)).fetchall()
+        return [("/".join(reversed(d.split("-"))), n) for d, n in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """Store dùng chung cho app (tạo lười ở lần gọi đầu)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = JobStore()
+        return _default_store
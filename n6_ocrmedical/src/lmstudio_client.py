@@ -1,8 +1,56 @@
-import base64, json, pathlib, tempfile, requests
+import asyncio, base64, copy, io, json, os, threading, time, uuid, requests
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+try:  # Pillow không bắt buộc: thiếu thì gửi nguyên file như cũ
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:  # aiohttp chỉ cần cho AsyncOCRClient
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from concurrency_limit import AdaptiveLimiter
+from endpoint_pool import EndpointPool
+from ocr_cache import OCRCache, make_key
+from ocr_errors import OCRError, OCRResponseError, classify, parse_completion
+from ocr_metrics import JobTrace, MetricsSink, get_metrics
+from ocr_quality import assess
+from ocr_retry import JOB_DEADLINE, Deadline, RetryPolicy
+from ocr_tiling import TILE_BAND_RATIO, TILE_OVERLAP, TILE_WORKERS, crop_bands, merge_band_texts
+from page_source import DOCUMENT_EXTENSIONS, is_document, count_pages, iter_pages
 
 BASE_URL = "http://192.168.1.197:1234/v1"
+# Nhiều máy cùng chạy MODEL_ID: thêm URL vào đây (hoặc "url1,url2"), request được chia theo tải
+BASE_URLS = (BASE_URL,)
 MODEL_ID = "qwen/qwen2.5-vl-7b"
 
+# Timeout tách riêng: connect nhanh fail, read chờ model sinh text
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 180
+POOL_SIZE = 16  # số connection keep-alive giữ lại tới server
+
+# Tiền xử lý ảnh trước khi base64
+MAX_LONG_SIDE = 1600  # cạnh dài tối đa (px) gửi lên model
+IMAGE_QUALITY = 85    # chất lượng JPEG/WebP khi encode lại
+# Cascade: lượt đầu ảnh nhỏ (ít token ảnh -> prefill nhanh), chỉ ảnh không qua ocr_quality.assess mới gửi lại cỡ đầy đủ
+CASCADE_LONG_SIDE = 1024
+CASCADE_QUALITY = 80
+
+# Body request sinh dần khi upload: base64 từng khúc (bội của 3 -> không có "=" giữa chừng)
+B64_CHUNK = 3 * 64 * 1024
+
+DOC_WORKERS = 2  # số trang PDF/TIFF OCR cùng lúc (cũng là số trang đã raster giữ trong RAM)
+
+# Đuôi file ảnh mà server nhận được (xem infer_mime_from_filename);
+# PDF/TIFF nhiều trang được raster từng trang thành PNG trước khi gửi
+IMAGE_EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg")
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + DOCUMENT_EXTENSIONS
+
 def infer_mime_from_filename(filename: str) -> str:
     low = filename.lower()
     if low.endswith(".png"):
@@ -11,35 +59,773 @@ def infer_mime_from_filename(filename: str) -> str:
         return "image/webp"
     if low.endswith(".jpg") or low.endswith(".jpeg"):
         return "image/jpeg"
+    if low.endswith(".tif") or low.endswith(".tiff"):
+        return "image/tiff"
+    if low.endswith(".pdf"):
+        return "application/pdf"
     return "application/octet-stream"
 
-def to_data_url(path: str) -> str:
-    mime = infer_mime_from_filename(path)
-    with open(path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-    return f"data:{mime};base64,{b64}"
-
-def call_qwen_ocr(image_path: str, prompt_text: str) -> str:
-    url = f"{BASE_URL}/chat/completions"
-    image_url = to_data_url(image_path)  # gửi ảnh base64
-
-    payload = {
-        "model": MODEL_ID,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": prompt_text},
-                    {"type": "input_image", "image_url": {"url": image_url}},
-                ],
-            }
-        ],
-        "temperature": 0.1,
-        "max_tokens": 1500,
-        "stream": False,
-    }
-    headers = {"Content-Type": "application/json"}
-    resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=180)
-    resp.raise_for_status()
-    data = resp.json()
-    return data["choices"][0]["message"]["content"]
+
+def iter_sse_deltas(lines):
+    """Đọc các dòng SSE của /chat/completions (stream=True), yield từng đoạn text."""
+    for line in lines:
+        if not line or not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        choices = json.loads(data).get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+class StreamedBody(io.RawIOBase):
+    """Body JSON của /chat/completions sinh dần khi upload: prefix | base64(ảnh) | suffix.
+
+    Ảnh lấy từ bytes (memoryview, không copy) hoặc đọc thẳng từ file theo khúc B64_CHUNK,
+    nên RAM mỗi request chỉ cỡ 1 khúc, không phụ thuộc cỡ ảnh. Biết trước độ dài
+    (__len__, tell()) -> requests gửi Content-Length thay vì chunked (super_len tính
+    len - tell(); IOBase.tell() mặc định ném lỗi -> 0 -> chunked). sent_at = lúc đọc hết body
+    (upload xong) để tách upload / inference. Mỗi lần gửi (kể cả thử lại) cần 1 body mới.
+    """
+
+    def __init__(self, prefix: bytes, source, size: int, suffix: bytes):
+        super().__init__()
+        self.prefix = prefix
+        self.source = source  # bytes / memoryview hoặc đường dẫn file
+        self.size = size
+        self.suffix = suffix
+        self.sent_at = None
+        self._chunks = self._iter_chunks()
+        self._buf = b""
+        self._pos = 0  # đã đọc tới đâu trong _buf (không cắt bytes mỗi lần read)
+        self._offset = 0  # tổng số byte đã trả ra
+
+    def __len__(self):
+        return len(self.prefix) + 4 * ((self.size + 2) // 3) + len(self.suffix)
+
+    def tell(self):
+        return self._offset
+
+    def readable(self):
+        return True
+
+    def _iter_chunks(self):
+        yield self.prefix
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, "rb") as f:
+                for chunk in iter(lambda: f.read(B64_CHUNK), b""):
+                    yield base64.b64encode(chunk)
+        else:
+            view = memoryview(self.source)
+            for i in range(0, len(view), B64_CHUNK):
+                yield base64.b64encode(view[i:i + B64_CHUNK])
+        yield self.suffix
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            out = self._buf[self._pos:] + b"".join(self._chunks)
+            self._buf, self._pos = b"", 0
+        else:
+            parts = []
+            while n > 0:
+                if self._pos >= len(self._buf):
+                    self._buf, self._pos = next(self._chunks, None), 0
+                    if self._buf is None:
+                        self._buf = b""
+                        break
+                part = self._buf[self._pos:self._pos + n]
+                self._pos += len(part)
+                n -= len(part)
+                parts.append(part)
+            out = b"".join(parts)
+        self._offset += len(out)
+        if not out and self.sent_at is None:
+            self.sent_at = time.perf_counter()
+        return out
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class RequestBody:
+    """Khuôn body của 1 request: open() tạo StreamedBody mới cho mỗi lần gửi."""
+
+    def __init__(self, prefix: bytes, source, size: int, suffix: bytes):
+        self.prefix = prefix
+        self.source = source
+        self.size = size
+        self.suffix = suffix
+
+    def open(self) -> StreamedBody:
+        return StreamedBody(self.prefix, self.source, self.size, self.suffix)
+
+    def __len__(self):
+        return len(self.open())
+
+    def getvalue(self) -> bytes:
+        """Cả body trong RAM (test / debug)."""
+        return self.open().read()
+
+
+class ImagePreprocessor:
+    """Thu nhỏ + encode lại ảnh trước khi upload.
+
+    process() trả về (bytes, mime, stats); stats có orig_bytes, sent_bytes,
+    saved_bytes, orig_size, sent_size để theo dõi lượng byte tiết kiệm mỗi ảnh.
+    raw=None -> Pillow đọc thẳng từ file (không nạp cả file vào RAM); bytes=None nghĩa là
+    gửi nguyên file gốc (encode lại không lợi gì), body đọc file theo khúc lúc upload.
+    """
+
+    FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+    def __init__(self, max_long_side: int = MAX_LONG_SIDE, fmt: str = "JPEG",
+                 quality: int = IMAGE_QUALITY, grayscale: bool = False):
+        fmt = fmt.upper()
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.max_long_side = max_long_side
+        self.fmt = fmt
+        self.quality = quality
+        self.grayscale = grayscale
+
+    def config(self) -> dict:
+        return {"max_long_side": self.max_long_side, "fmt": self.fmt,
+                "quality": self.quality, "grayscale": self.grayscale}
+
+    def process(self, path: str, raw: bytes = None, mime: str = None):
+        mime = mime or infer_mime_from_filename(path)
+        orig_bytes = len(raw) if raw is not None else os.path.getsize(path)
+        stats = {"orig_bytes": orig_bytes, "sent_bytes": orig_bytes, "saved_bytes": 0,
+                 "orig_size": None, "sent_size": None}
+        if Image is None:
+            return raw, mime, stats
+
+        try:
+            im = Image.open(io.BytesIO(raw) if raw is not None else path)
+        except OSError:
+            return raw, mime, stats  # Pillow không đọc được -> gửi nguyên file
+        with im:
+            stats["orig_size"] = im.size
+            if self.max_long_side and max(im.size) > self.max_long_side:
+                # thu nhỏ trước khi xoay: JPEG được decode ở tỉ lệ nhỏ (draft), không bung cả ảnh gốc
+                im.thumbnail((self.max_long_side, self.max_long_side), Image.LANCZOS)
+            im = ImageOps.exif_transpose(im)  # ảnh chụp điện thoại hay bị xoay
+            if self.grayscale:
+                im = im.convert("L")
+            elif im.mode not in ("RGB", "L"):
+                # bỏ kênh alpha: nền trắng như giấy
+                rgba = im.convert("RGBA")
+                im = Image.new("RGB", rgba.size, (255, 255, 255))
+                im.paste(rgba, mask=rgba.getchannel("A"))
+            buf = io.BytesIO()
+            im.save(buf, self.fmt, quality=self.quality)
+            stats["sent_size"] = im.size
+
+        out = buf.getvalue()
+        if len(out) >= orig_bytes and stats["sent_size"] == stats["orig_size"] and mime != "application/octet-stream":
+            # encode lại không lợi gì -> giữ file gốc
+            stats["sent_size"] = stats["orig_size"]
+            return raw, mime, stats
+        stats["sent_bytes"] = len(out)
+        stats["saved_bytes"] = orig_bytes - len(out)
+        return out, self.FORMATS[self.fmt], stats
+
+
+class _OCRBase:
+    """Phần dùng chung của OCRClient / AsyncOCRClient: payload, ảnh, cache.
+
+    preprocessor=None -> gửi nguyên file; on_preprocess(path, stats) được gọi
+    sau mỗi lần tiền xử lý ảnh. cache=OCRCache(...) -> ảnh trùng (cùng bytes,
+    prompt, model, tham số) trả kết quả từ đĩa, không gọi model.
+    metrics=MetricsSink(...) -> mỗi request ghi 1 JobTrace (thời gian từng stage,
+    byte gửi/nhận, token usage).
+    base_url có thể là list (hoặc chuỗi "url1,url2"): mỗi request chọn 1 server qua
+    EndpointPool (lb_policy="least_outstanding" | "latency"), server lỗi bị ngắt mạch.
+    retry=RetryPolicy(...) thử lại lỗi tạm thời (None = không thử lại); mỗi ảnh / trang có
+    tối đa job_deadline giây kể cả các lần thử. Lỗi ném ra luôn là OCRError (ocr_errors).
+    """
+
+    _DEFAULT = object()
+
+    def __init__(self, base_url=BASE_URL, model: str = MODEL_ID,
+                 temperature: float = 0.1, max_tokens: int = 1500,
+                 preprocessor=_DEFAULT, on_preprocess=None, cache: OCRCache = None,
+                 metrics: MetricsSink = None, lb_policy: str = "least_outstanding",
+                 retry=_DEFAULT, job_deadline: float = JOB_DEADLINE):
+        self.endpoints = EndpointPool(base_url, policy=lb_policy)
+        self.base_url = self.endpoints.urls[0]
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.preprocessor = ImagePreprocessor() if preprocessor is _OCRBase._DEFAULT else preprocessor
+        self.on_preprocess = on_preprocess
+        self.cache = cache
+        self.metrics = metrics
+        self.retry = RetryPolicy() if retry is _OCRBase._DEFAULT else (retry or RetryPolicy(attempts=1))
+        self.job_deadline = job_deadline
+
+    def build_payload(self, image_url: str, prompt_text: str, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": prompt_text},
+                        {"type": "input_image", "image_url": {"url": image_url}},
+                    ],
+                }
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+
+    def prepare_body(self, image_path: str, raw: bytes, mime: str, prompt_text: str,
+                     stream: bool = False, trace: JobTrace = None, preprocessor=_DEFAULT) -> RequestBody:
+        """Body request cho ảnh: không dựng data URL / JSON đầy đủ trong RAM.
+
+        raw=None -> preprocessor đọc thẳng từ file; ảnh gửi nguyên gốc thì base64 đọc từ file
+        theo khúc khi upload (RAM không phụ thuộc cỡ file).
+        preprocessor: thay self.preprocessor cho riêng request này (lượt ảnh nhỏ của cascade).
+        """
+        trace = trace or JobTrace("request", image_path)
+        pre = self.preprocessor if preprocessor is _OCRBase._DEFAULT else preprocessor
+        mime = mime or infer_mime_from_filename(image_path)
+        if pre is not None:
+            with trace.span("preprocess"):
+                raw, mime, stats = pre.process(image_path, raw, mime)
+            if self.on_preprocess is not None:
+                self.on_preprocess(image_path, stats)
+        if raw is None:
+            source, size = image_path, os.path.getsize(image_path)
+        else:
+            source, size = raw, len(raw)
+        trace.set(image_bytes=size)
+        with trace.span("serialize"):
+            # JSON với 1 token thay chỗ ảnh, cắt đôi tại token: ảnh base64 chèn vào giữa lúc gửi
+            token = f"@@image-{uuid.uuid4().hex}@@"
+            head, tail = json.dumps(self.build_payload(token, prompt_text, stream)).rsplit(token, 1)
+            body = RequestBody(f"{head}data:{mime};base64,".encode("ascii"), source, size,
+                               tail.encode("ascii"))
+        trace.set(payload_bytes=len(body))
+        return body
+
+    def new_deadline(self) -> Deadline:
+        return Deadline(self.job_deadline)
+
+    @staticmethod
+    def _on_retry(trace: JobTrace):
+        def on_retry(attempt, err, delay):
+            trace.add("backoff", delay * 1000)
+            trace.set(last_retry_error=f"{type(err).__name__}: {err}")
+        return on_retry
+
+    def _emit(self, trace: JobTrace):
+        if self.metrics is not None:
+            self.metrics.emit(trace)
+
+    def cache_key(self, image, prompt_text: str, preprocessor=_DEFAULT) -> str:
+        """image: bytes hoặc đường dẫn file (hash theo khúc)."""
+        pre = self.preprocessor if preprocessor is _OCRBase._DEFAULT else preprocessor
+        params = {"temperature": self.temperature, "max_tokens": self.max_tokens,
+                  "preprocess": pre.config() if pre else None}
+        return make_key(image, prompt_text, self.model, params)
+
+    def _cache_lookup(self, image_path: str, prompt_text: str, use_cache: bool,
+                      trace: JobTrace = None):
+        """Trả về (key, cached_text); key là None khi không dùng cache."""
+        if self.cache is None or not use_cache:
+            return None, None
+        trace = trace or JobTrace("request", image_path)
+        with trace.span("cache"):
+            key = self.cache_key(image_path, prompt_text)
+            cached = self.cache.get(key)
+        if cached is not None:
+            trace.set(cached=True)
+        return key, cached
+
+
+class OCRClient(_OCRBase):
+    """Client LM Studio dùng 1 requests.Session (pool keep-alive) cho mọi request.
+
+    limiter=AdaptiveLimiter(...) -> số request đang bay (mọi thread, mọi trang / dải) tự
+    điều chỉnh theo latency và lỗi; thread vượt limit chờ slot (stage queue_wait).
+    cascade_preprocessor: cách thu nhỏ ảnh cho lượt đầu của ocr_cascade (None = bỏ lượt đầu).
+    """
+
+    def __init__(self, base_url=BASE_URL, model: str = MODEL_ID,
+                 pool_size: int = POOL_SIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 limiter: AdaptiveLimiter = None, cascade_preprocessor=_OCRBase._DEFAULT, **kwargs):
+        super().__init__(base_url, model, **kwargs)
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self.urgent = False
+        self.cascade_preprocessor = (
+            ImagePreprocessor(CASCADE_LONG_SIDE, quality=CASCADE_QUALITY, grayscale=True)
+            if cascade_preprocessor is _OCRBase._DEFAULT else cascade_preprocessor)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    @contextmanager
+    def _slot(self, trace: JobTrace, deadline: Deadline):
+        """Giữ 1 slot của limiter trong suốt 1 lần gửi (không có limiter -> không chờ)."""
+        if self.limiter is None:
+            yield
+            return
+        t = time.perf_counter()
+        with self.limiter.slot(deadline, urgent=self.urgent):
+            trace.add("queue_wait", (time.perf_counter() - t) * 1000)
+            trace.set(limit=self.limiter.limit)
+            yield
+
+    def urgent_view(self) -> "OCRClient":
+        """Cùng session / server / cache / limiter nhưng mọi request (cả dải, trang con) được
+        limiter ưu tiên hơn batch: dùng cho job người dùng đang chờ (nút Result)."""
+        view = copy.copy(self)
+        view.urgent = True
+        return view
+
+    def ocr(self, image_path: str, prompt_text: str, use_cache: bool = True,
+            deadline: Deadline = None) -> str:
+        trace = JobTrace("request", image_path)
+        # raw=None: cache key, preprocess và body đều đọc file theo khúc, không nạp cả file
+        return self.ocr_bytes(None, infer_mime_from_filename(image_path), prompt_text,
+                              use_cache=use_cache, label=image_path, trace=trace, deadline=deadline)
+
+    def ocr_bytes(self, raw: bytes, mime: str, prompt_text: str, use_cache: bool = True,
+                  label: str = "<bytes>", trace: JobTrace = None, deadline: Deadline = None,
+                  preprocessor=_OCRBase._DEFAULT) -> str:
+        """OCR ảnh đã có sẵn trong RAM (vd. 1 dải cắt từ ảnh lớn); label chỉ để log.
+        raw=None -> label là đường dẫn file, đọc từ đĩa (ocr()).
+        """
+        trace = trace or JobTrace("request", label)
+        try:
+            return self._ocr_bytes(raw, mime, prompt_text, use_cache, label, trace,
+                                   deadline or self.new_deadline(), preprocessor)
+        except Exception as e:
+            trace.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._emit(trace)
+
+    def _ocr_bytes(self, raw, mime, prompt_text, use_cache, label, trace: JobTrace,
+                   deadline: Deadline, preprocessor=_OCRBase._DEFAULT, accept=None) -> str:
+        """accept(text, finish_reason) -> False: không ghi kết quả vào cache (lượt ảnh nhỏ bị loại)."""
+        key = None
+        if self.cache is not None and use_cache:
+            with trace.span("cache"):
+                key = self.cache_key(raw if raw is not None else label, prompt_text, preprocessor)
+                cached = self.cache.get(key)
+            if cached is not None:
+                trace.set(cached=True)
+                return cached
+
+        payload = self.prepare_body(label, raw, mime, prompt_text, trace=trace,  # ảnh base64 sinh khi gửi
+                                    preprocessor=preprocessor)
+
+        def attempt(n):
+            body = payload.open()
+            with self._slot(trace, deadline), self.endpoints.acquire() as ep:
+                trace.set(endpoint=ep.url, attempts=n + 1)
+                try:
+                    t0 = time.perf_counter()
+                    resp = self.session.post(f"{ep.url}/chat/completions", data=body,
+                                             headers={"Content-Length": str(len(body))},
+                                             timeout=deadline.timeout(*self.timeout), stream=True)
+                    t1 = time.perf_counter()  # đã có header: server xử lý xong (non-stream)
+                    sent = body.sent_at or t0
+                    trace.add("upload", (sent - t0) * 1000)
+                    trace.add("inference", (t1 - sent) * 1000)
+                    with resp:
+                        resp.raise_for_status()
+                        with trace.span("download"):
+                            return resp.content
+                except requests.RequestException as e:
+                    raise deadline.explain(classify(e, ep.url)) from e
+
+        content = self.retry.call(attempt, deadline, self._on_retry(trace))
+        trace.set(response_bytes=len(content))
+        with trace.span("parse"):
+            data, text = parse_completion(content)
+        trace.set_usage(data)
+        if key is not None and (accept is None or accept(text, trace.info.get("finish_reason"))):
+            self.cache.put(key, text)
+        return text
+
+    def ocr_tiled(self, image_path: str, prompt_text: str, use_cache: bool = True,
+                  band_ratio: float = TILE_BAND_RATIO, overlap: float = TILE_OVERLAP,
+                  max_workers: int = TILE_WORKERS, deadline: Deadline = None) -> str:
+        """OCR ảnh dài theo từng dải ngang chồng nhau (song song), rồi ghép text.
+
+        Ảnh không đủ dài để cắt -> chỉ 1 dải, tương đương ocr().
+        """
+        with open(image_path, "rb") as f:
+            raw = f.read()
+        return self.ocr_tiled_bytes(raw, infer_mime_from_filename(image_path), prompt_text,
+                                    use_cache, band_ratio, overlap, max_workers, label=image_path,
+                                    deadline=deadline)
+
+    def ocr_tiled_bytes(self, raw: bytes, mime: str, prompt_text: str, use_cache: bool = True,
+                        band_ratio: float = TILE_BAND_RATIO, overlap: float = TILE_OVERLAP,
+                        max_workers: int = TILE_WORKERS, label: str = "<bytes>",
+                        deadline: Deadline = None) -> str:
+        deadline = deadline or self.new_deadline()  # các dải dùng chung 1 deadline
+        bands = crop_bands(raw, band_ratio, overlap)
+        if len(bands) == 1:
+            return self.ocr_bytes(raw, mime, prompt_text, use_cache=use_cache, label=label,
+                                  deadline=deadline)
+
+        def one(i):
+            return self.ocr_bytes(bands[i], "image/png", prompt_text, use_cache=use_cache,
+                                  label=f"{label}#band{i}", deadline=deadline)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(bands))) as ex:
+            texts = list(ex.map(one, range(len(bands))))
+        return merge_band_texts(texts)
+
+    def ocr_cascade(self, image_path: str, prompt_text: str, use_cache: bool = True,
+                    tiled: bool = False, deadline: Deadline = None) -> str:
+        """OCR ảnh nhỏ trước; text không qua ocr_quality.assess mới OCR lại cỡ đầy đủ (tiled -> theo dải)."""
+        with open(image_path, "rb") as f:
+            raw = f.read()
+        return self.ocr_cascade_bytes(raw, infer_mime_from_filename(image_path), prompt_text,
+                                      use_cache, tiled, label=image_path, deadline=deadline)
+
+    def _downscales(self, raw: bytes) -> bool:
+        """Ảnh có lớn hơn cỡ của lượt đầu không (chỉ đọc header, không decode)."""
+        if Image is None or self.cascade_preprocessor is None:
+            return False
+        try:
+            with Image.open(io.BytesIO(raw)) as im:
+                return max(im.size) > self.cascade_preprocessor.max_long_side
+        except OSError:
+            return False
+
+    def ocr_cascade_bytes(self, raw: bytes, mime: str, prompt_text: str, use_cache: bool = True,
+                          tiled: bool = False, label: str = "<bytes>", deadline: Deadline = None) -> str:
+        deadline = deadline or self.new_deadline()  # 2 lượt dùng chung 1 deadline
+        if self._downscales(raw):
+            trace = JobTrace("request", label)
+            try:
+                # cache chỉ giữ text qua assess: lần chạy lại không trả nhầm text bị cắt (cache không có finish_reason)
+                text = self._ocr_bytes(raw, mime, prompt_text, use_cache, label, trace, deadline,
+                                       self.cascade_preprocessor,
+                                       accept=lambda t, finish: assess(t, finish).ok)
+                quality = assess(text, trace.info.get("finish_reason"))
+                trace.set(cascade="low", quality_issues=list(quality.issues))
+            except Exception as e:
+                trace.set(error=f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                self._emit(trace)
+            if quality.ok:
+                return text
+        # ảnh vốn đã nhỏ (lượt đầu không rẻ hơn) hoặc text lượt đầu không dùng được
+        if tiled:
+            return self.ocr_tiled_bytes(raw, mime, prompt_text, use_cache, label=label, deadline=deadline)
+        trace = JobTrace("request", label)
+        trace.set(cascade="full")
+        return self.ocr_bytes(raw, mime, prompt_text, use_cache=use_cache, label=label,
+                              trace=trace, deadline=deadline)
+
+    def ocr_document(self, path: str, prompt_text: str, use_cache: bool = True,
+                     tiled: bool = False, on_page=None, max_workers: int = DOC_WORKERS,
+                     cascade: bool = False) -> str:
+        """OCR PDF/TIFF nhiều trang: raster lười từng trang, OCR tối đa max_workers trang cùng lúc.
+
+        Kết quả ghép theo thứ tự trang; on_page(page_no, total, text) được gọi theo thứ tự.
+        Mỗi trang có deadline riêng (job_deadline).
+        """
+        total = count_pages(path)
+
+        def one(page_no, png):
+            label = f"{path}#page{page_no}"
+            if cascade:
+                return self.ocr_cascade_bytes(png, "image/png", prompt_text, use_cache, tiled, label=label)
+            if tiled:
+                return self.ocr_tiled_bytes(png, "image/png", prompt_text, use_cache, label=label)
+            return self.ocr_bytes(png, "image/png", prompt_text, use_cache=use_cache, label=label)
+
+        parts = []
+
+        def collect(page_no, fut):
+            text = fut.result()
+            parts.append(f"--- Page {page_no} ---\n{text}")
+            if on_page is not None:
+                on_page(page_no, total, text)
+
+        # cửa sổ theo thứ tự trang: trang cũ nhất xong mới raster thêm trang mới
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            window = deque()
+            for page_no, png in iter_pages(path):
+                window.append((page_no, ex.submit(one, page_no, png)))
+                del png
+                if len(window) >= max_workers:
+                    collect(*window.popleft())
+            while window:
+                collect(*window.popleft())
+        return "\n\n".join(parts)
+
+    def ocr_file(self, path: str, prompt_text: str, use_cache: bool = True,
+                 tiled: bool = False, on_page=None, cascade: bool = False) -> str:
+        """Chọn đường OCR theo loại file: PDF/TIFF -> ocr_document, cascade -> ocr_cascade,
+        tiled -> ocr_tiled, còn lại ocr()."""
+        if is_document(path):
+            return self.ocr_document(path, prompt_text, use_cache, tiled, on_page, cascade=cascade)
+        if cascade:
+            return self.ocr_cascade(path, prompt_text, use_cache=use_cache, tiled=tiled)
+        if tiled:
+            return self.ocr_tiled(path, prompt_text, use_cache=use_cache)
+        return self.ocr(path, prompt_text, use_cache=use_cache)
+
+    def ocr_stream(self, image_path: str, prompt_text: str, use_cache: bool = True,
+                   deadline: Deadline = None):
+        """Như ocr() nhưng yield từng đoạn text ngay khi server sinh ra (SSE).
+
+        Chỉ thử lại khi chưa nhận được token nào (đã yield thì không gửi lại được).
+        """
+        trace = JobTrace("stream", image_path)
+        try:
+            yield from self._ocr_stream(image_path, prompt_text, use_cache, trace,
+                                        deadline or self.new_deadline())
+        except Exception as e:
+            trace.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._emit(trace)
+
+    def _ocr_stream(self, image_path, prompt_text, use_cache, trace: JobTrace, deadline: Deadline):
+        key, cached = self._cache_lookup(image_path, prompt_text, use_cache, trace)
+        if cached is not None:
+            yield cached
+            return
+
+        payload = self.prepare_body(image_path, None, None, prompt_text, stream=True, trace=trace)
+        parts = []
+        on_retry = self._on_retry(trace)
+        n = 0
+        while True:
+            deadline.check()
+            try:
+                yield from self._stream_once(payload, parts, trace, deadline, n)
+                break
+            except OCRError as e:
+                delay = None if parts else self.retry.delay_for(n, e, deadline)
+                if delay is None:
+                    raise
+                on_retry(n, e, delay)
+            time.sleep(delay)
+            n += 1
+        text = "".join(parts)
+        trace.set(response_chars=len(text), chunks=len(parts))
+        if key is not None:
+            self.cache.put(key, text)
+
+    def _stream_once(self, payload: RequestBody, parts: list, trace: JobTrace, deadline: Deadline, n: int):
+        body = payload.open()
+        with self._slot(trace, deadline), self.endpoints.acquire() as ep:
+            trace.set(endpoint=ep.url, attempts=n + 1)
+            try:
+                t0 = time.perf_counter()
+                with self.session.post(f"{ep.url}/chat/completions", data=body,
+                                       headers={"Content-Length": str(len(body))},
+                                       timeout=deadline.timeout(*self.timeout), stream=True) as resp:
+                    t1 = time.perf_counter()
+                    sent = body.sent_at or t0
+                    trace.add("upload", (sent - t0) * 1000)
+                    trace.add("inference", (t1 - sent) * 1000)
+                    resp.raise_for_status()
+                    t_first = None
+                    for delta in iter_sse_deltas(resp.iter_lines()):
+                        if t_first is None:
+                            t_first = time.perf_counter()
+                            trace.add("first_token", (t_first - t1) * 1000)
+                        parts.append(delta)
+                        yield delta
+                        deadline.check()
+                    if t_first is not None:
+                        trace.add("generate", (time.perf_counter() - t_first) * 1000)
+            except requests.RequestException as e:
+                raise deadline.explain(classify(e, ep.url)) from e
+            except ValueError as e:  # dòng SSE không phải JSON
+                raise OCRResponseError(f"Invalid stream chunk: {e!r}", ep.url) from e
+
+    def close(self):
+        self.endpoints.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncOCRClient(_OCRBase):
+    """Client asyncio (aiohttp): 1 connection pool, tối đa max_in_flight request cùng lúc.
+
+    Đọc file / resize / cache chạy qua asyncio.to_thread để không chặn event loop.
+    Tạo và dùng trong cùng 1 event loop.
+    """
+
+    def __init__(self, base_url=BASE_URL, model: str = MODEL_ID,
+                 max_in_flight: int = 8, pool_size: int = POOL_SIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 **kwargs):
+        if aiohttp is None:
+            raise ImportError("AsyncOCRClient cần aiohttp: pip install aiohttp")
+        super().__init__(base_url, model, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.pool_size = max(pool_size, max_in_flight)
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout,
+                headers={"Content-Type": "application/json"})
+        return self._session
+
+    def _prepare_body(self, image_path: str, prompt_text: str, use_cache: bool, trace: JobTrace):
+        key, cached = self._cache_lookup(image_path, prompt_text, use_cache, trace)
+        if cached is not None:
+            return key, cached, None
+        return key, None, self.prepare_body(image_path, None, None, prompt_text, trace=trace)
+
+    async def ocr(self, image_path: str, prompt_text: str, use_cache: bool = True,
+                  deadline: Deadline = None) -> str:
+        trace = JobTrace("async", image_path)
+        try:
+            return await self._ocr(image_path, prompt_text, use_cache, trace,
+                                   deadline or self.new_deadline())
+        except Exception as e:
+            trace.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._emit(trace)
+
+    async def _ocr(self, image_path, prompt_text, use_cache, trace: JobTrace,
+                   deadline: Deadline) -> str:
+        t_wait = time.perf_counter()
+        async with self._sem:
+            trace.add("queue_wait", (time.perf_counter() - t_wait) * 1000)
+            key, cached, body = await asyncio.to_thread(
+                self._prepare_body, image_path, prompt_text, use_cache, trace)
+            if cached is not None:
+                return cached
+
+            async def attempt(n):
+                with self.endpoints.acquire() as ep:
+                    trace.set(endpoint=ep.url, attempts=n + 1)
+                    rem = deadline.remaining()
+                    rem = None if rem is None else max(rem, 0.001)
+                    try:
+                        t0 = time.perf_counter()
+                        async with self._get_session().post(
+                                f"{ep.url}/chat/completions", data=body.open(),
+                                headers={"Content-Length": str(len(body))},
+                                timeout=aiohttp.ClientTimeout(
+                                    total=rem, sock_connect=self.timeout.sock_connect,
+                                    sock_read=self.timeout.sock_read)) as resp:
+                            trace.add("request", (time.perf_counter() - t0) * 1000)  # upload + inference
+                            resp.raise_for_status()
+                            with trace.span("download"):
+                                return await resp.read()
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        raise deadline.explain(classify(e, ep.url)) from e
+
+            content = await self.retry.acall(attempt, deadline, self._on_retry(trace))
+        trace.set(response_bytes=len(content))
+        with trace.span("parse"):
+            data, text = parse_completion(content)
+        trace.set_usage(data)
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, text)
+        return text
+
+    async def ocr_many(self, image_paths, prompt_text: str, use_cache: bool = True):
+        """Async iterator (path, text, error) theo thứ tự xong trước trả trước.
+
+        Chỉ giữ ~2x max_in_flight task cùng lúc nên image_paths có thể là generator rất dài.
+        """
+        async def one(path):
+            try:
+                return path, await self.ocr(path, prompt_text, use_cache), None
+            except Exception as e:
+                return path, None, e
+
+        window = self.max_in_flight * 2
+        pending = set()
+        for path in image_paths:
+            pending.add(asyncio.ensure_future(one(path)))
+            if len(pending) >= window:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    yield t.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                yield t.result()
+
+    async def close(self):
+        self.endpoints.close()
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def get_default_client() -> OCRClient:
+    """Client dùng chung cho cả app (tạo lười ở lần gọi đầu)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = OCRClient(base_url=BASE_URLS, cache=OCRCache(), metrics=get_metrics(),
+                                        limiter=AdaptiveLimiter(max_limit=POOL_SIZE))
+        return _default_client
+
+def set_default_client(client: OCRClient):
+    global _default_client
+    with _default_lock:
+        _default_client = client
+
+def _client(urgent: bool) -> OCRClient:
+    client = get_default_client()
+    return client.urgent_view() if urgent else client
+
+def call_qwen_ocr(image_path: str, prompt_text: str, use_cache: bool = True, tiled: bool = False,
+                  on_page=None, cascade: bool = False, urgent: bool = False) -> str:
+    return _client(urgent).ocr_file(image_path, prompt_text, use_cache=use_cache,
+                                    tiled=tiled, on_page=on_page, cascade=cascade)
+
+def stream_qwen_ocr(image_path: str, prompt_text: str, use_cache: bool = True, urgent: bool = False):
+    return _client(urgent).ocr_stream(image_path, prompt_text, use_cache=use_cache)
+
+async def acall_qwen_ocr(image_path: str, prompt_text: str, client: AsyncOCRClient = None,
+                         use_cache: bool = True) -> str:
+    """Bản async của call_qwen_ocr; client=None -> tạo client tạm (nên truyền client để dùng lại pool)."""
+    if client is not None:
+        return await client.ocr(image_path, prompt_text, use_cache=use_cache)
+    async with AsyncOCRClient() as c:
+        return await c.ocr(image_path, prompt_text, use_cache=use_cache)
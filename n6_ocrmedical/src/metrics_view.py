@@ -0,0 +1,81 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView
+)
+from PySide6.QtCore import Qt, QTimer
+
+from ocr_metrics import MetricsSink
+
+METRICS_REFRESH_MS = 1000
+
+# (nhãn hiển thị, kind trong JobTrace); None = tất cả
+KINDS = (("All", None), ("Request", "request"), ("Stream", "stream"),
+         ("Async", "async"), ("UI job", "ui_job"))
+
+
+class MetricsDialog(QDialog):
+    """Bảng p50/p95 (ms) theo từng stage của các lần OCR gần nhất, tự làm mới mỗi giây.
+
+    limiter (AdaptiveLimiter của client) -> footer hiện thêm limit hiện tại / số request đang bay.
+    """
+
+    def __init__(self, sink: MetricsSink, parent=None, limiter=None):
+        super().__init__(parent)
+        self.sink = sink
+        self.limiter = limiter
+        self.setWindowTitle("OCR stage timings")
+        self.resize(420, 420)
+
+        lay = QVBoxLayout(self)
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Job type:"))
+        self.kind_box = QComboBox()
+        for text, kind in KINDS:
+            self.kind_box.addItem(text, kind)
+        self.kind_box.currentIndexChanged.connect(self.refresh)
+        top.addWidget(self.kind_box)
+        top.addStretch(1)
+        lay.addLayout(top)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Stage", "Count", "p50 (ms)", "p95 (ms)"])
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        lay.addWidget(self.table, 1)
+
+        self.footer = QLabel("")
+        self.footer.setStyleSheet("color:#6b7280;")
+        lay.addWidget(self.footer)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(METRICS_REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, e):
+        self._timer.stop()
+        super().hideEvent(e)
+
+    def refresh(self, *_):
+        summary = self.sink.summary(self.kind_box.currentData())
+        self.table.setRowCount(len(summary))
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        for r, (stage, s) in enumerate(summary.items()):
+            cells = (stage, str(s["count"]), fmt(s["p50"]), fmt(s["p95"]))
+            for c, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if c:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+        jobs = summary.get("total", {}).get("count", 0)
+        text = f"Last {jobs} jobs (in-memory window)"
+        if self.limiter is not None:
+            s = self.limiter.snapshot()
+            text += (f"\nConcurrency limit: {s['limit']} (in flight {s['in_flight']},"
+                     f" waiting {s['waiting']}, ↑{s['increases']} ↓{s['decreases']})")
+        self.footer.setText(text)
@@ -0,0 +1,116 @@
+import hashlib, json, os, sqlite3, threading, time
+
+CACHE_PATH = "n6_ocrmedical/data/cache/ocr_cache.sqlite3"
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # tổng dung lượng text được giữ lại
+CACHE_MAX_ENTRIES = 100_000          # số kết quả tối đa (bảng SQLite không phình mãi với text ngắn)
+HASH_CHUNK = 1024 * 1024
+
+
+def image_digest(image) -> bytes:
+    """sha256 của ảnh: bytes, hoặc đường dẫn file (đọc theo khúc, không nạp cả file vào RAM)."""
+    if not isinstance(image, (str, os.PathLike)):
+        return hashlib.sha256(image).digest()
+    h = hashlib.sha256()
+    with open(image, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def make_key(image, prompt: str, model: str, params: dict) -> str:
+    """Key = sha256(ảnh) + prompt + model + tham số sinh (JSON sort_keys); image là bytes hoặc đường dẫn."""
+    h = hashlib.sha256()
+    h.update(image_digest(image))
+    h.update(json.dumps({"prompt": prompt, "model": model, "params": params},
+                        sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class OCRCache:
+    """Cache kết quả OCR trên đĩa (SQLite), đuổi theo LRU khi vượt max_bytes hoặc max_entries."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        self._db.commit()
+        self._total, self._count = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        with self._lock:
+            self._evict()  # max_* nhỏ hơn lần mở trước
+            self._db.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT text FROM entries WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_access=? WHERE key=?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+            if old is not None:
+                self._total -= old[0]
+            else:
+                self._count += 1
+            self._db.execute("INSERT OR REPLACE INTO entries(key, text, size, last_access) VALUES (?,?,?,?)",
+                             (key, text, size, time.time()))
+            self._total += size
+            self._evict()
+            self._db.commit()
+
+    def _full(self) -> bool:
+        return self._total > self.max_bytes or self._count > self.max_entries
+
+    def _evict(self):
+        # bỏ các entry lâu không dùng nhất cho tới khi dưới giới hạn
+        while self._full():
+            rows = self._db.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self._total = self._count = 0
+                return
+            for key, size in rows:
+                self._db.execute("DELETE FROM entries WHERE key=?", (key,))
+                self._total -= size
+                self._count -= 1
+                if not self._full():
+                    return
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._total = self._count = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._count,
+                    "max_entries": self.max_entries, "bytes": self._total, "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,200 @@
+# ============================================================
+# OCR - Medical — chạy batch không giao diện (không cần PySide6)
+#
+#   python n6_ocrmedical/src/ocr_cli.py <thư mục|file>... -o out.jsonl -j 4 --resume
+#
+# Mỗi ảnh ghi 1 dòng JSON: path, text, error, bytes, pages, started_at, elapsed_ms.
+# PDF/TIFF nhiều trang: text các trang ghép theo thứ tự trong 1 dòng.
+# ============================================================
+
+import argparse, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from concurrency_limit import AdaptiveLimiter
+from endpoint_pool import POLICIES
+from lmstudio_client import (
+    BASE_URLS, MODEL_ID, SUPPORTED_EXTENSIONS, OCRClient,
+)
+from ocr_cache import OCRCache
+from ocr_retry import JOB_DEADLINE, RETRY_ATTEMPTS, RetryPolicy
+from search_index import SearchIndex
+
+DEFAULT_PROMPT = "Please extract text from this medical test image."
+
+
+def iter_inputs(inputs, files_from=None, recursive=False):
+    """Yield đường dẫn ảnh theo thứ tự, lười (không dựng list 100k phần tử)."""
+    def scan(folder):
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"[WARN] {folder}: {e}", file=sys.stderr)
+            return
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from scan(e.path)
+            elif e.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield e.path
+
+    for p in inputs:
+        if os.path.isdir(p):
+            yield from scan(p)
+        else:
+            yield p
+    if files_from:
+        with open(files_from, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def load_done(output_path: str) -> set:
+    """Các path đã OCR thành công trong file output cũ (cho --resume)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # dòng cuối bị cắt dở khi process bị kill
+            if not rec.get("error"):
+                done.add(rec["path"])
+    return done
+
+
+def ends_mid_line(output_path: str) -> bool:
+    """File output cũ không kết thúc bằng xuống dòng (process bị kill giữa lúc ghi 1 dòng)."""
+    try:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except OSError:  # chưa có file / file rỗng
+        return False
+
+
+def ocr_one(client: OCRClient, path: str, prompt: str, tiled: bool = False, cascade: bool = False) -> dict:
+    rec = {"path": path, "text": None, "error": None, "bytes": None, "pages": 1,
+           "started_at": time.time(), "elapsed_ms": None}
+
+    def on_page(page_no, total, text):
+        rec["pages"] = total
+
+    t0 = time.perf_counter()
+    try:
+        rec["bytes"] = os.path.getsize(path)
+        rec["text"] = client.ocr_file(path, prompt, tiled=tiled, on_page=on_page, cascade=cascade)
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+    rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return rec
+
+
+def run(args) -> int:
+    cache = OCRCache(args.cache) if args.cache else None
+    index = SearchIndex(args.index) if args.index else None
+    client = OCRClient(base_url=args.base_url, model=args.model, lb_policy=args.lb_policy,
+                       pool_size=max(args.concurrency, 1), cache=cache,
+                       limiter=AdaptiveLimiter(max_limit=max(args.concurrency, 1)) if args.adaptive else None,
+                       retry=RetryPolicy(attempts=args.retries + 1), job_deadline=args.deadline)
+    done = load_done(args.output) if args.resume else set()
+
+    ok = failed = skipped = 0
+    next_report = args.progress_every
+    t_start = time.perf_counter()
+    mode = "a" if args.resume else "w"
+    broken_tail = args.resume and ends_mid_line(args.output)
+    with open(args.output, mode, encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        if broken_tail:
+            out.write("\n")  # dòng dở dang giữ riêng 1 dòng, bản ghi mới không bị dính vào nó
+
+        def drain(futures):
+            nonlocal ok, failed, next_report
+            indexed = []
+            for fut in futures:
+                rec = fut.result()
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                if rec["error"]:
+                    failed += 1
+                else:
+                    ok += 1
+                    indexed.append((rec["path"], rec["text"], rec["started_at"], None))
+            out.flush()
+            if index is not None and indexed:
+                index.add_many(indexed)  # 1 transaction cho cả lô
+            n = ok + failed
+            if n >= next_report:
+                next_report = n + args.progress_every
+                rate = n / (time.perf_counter() - t_start)
+                print(f"[{n}] ok={ok} failed={failed} skipped={skipped} {rate:.2f} img/s",
+                      file=sys.stderr)
+
+        # cửa sổ trượt: chỉ giữ ~2x concurrency future trong bộ nhớ
+        pending = set()
+        for path in iter_inputs(args.inputs, args.files_from, args.recursive):
+            if path in done:
+                skipped += 1
+                continue
+            pending.add(ex.submit(ocr_one, client, path, args.prompt, args.tiled, args.cascade))
+            if len(pending) >= args.concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                drain(finished)
+        if pending:
+            drain(wait(pending)[0])
+
+    client.close()
+    if index is not None:
+        index.close()
+    elapsed = time.perf_counter() - t_start
+    print(f"Done: ok={ok} failed={failed} skipped={skipped} in {elapsed:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Headless batch OCR -> JSONL")
+    p.add_argument("inputs", nargs="*", help="thư mục hoặc file ảnh")
+    p.add_argument("--files-from", help="file text, mỗi dòng 1 đường dẫn ảnh")
+    p.add_argument("-r", "--recursive", action="store_true", help="quét cả thư mục con")
+    p.add_argument("-o", "--output", required=True, help="file JSONL kết quả")
+    p.add_argument("-j", "--concurrency", type=int, default=4, help="số request song song")
+    p.add_argument("--adaptive", action="store_true",
+                   help="tự tăng / giảm số request song song theo độ trễ và lỗi (-j là mức tối đa)")
+    p.add_argument("--resume", action="store_true",
+                   help="bỏ qua ảnh đã OCR thành công trong --output, ghi nối tiếp")
+    p.add_argument("--prompt", default=DEFAULT_PROMPT)
+    p.add_argument("--base-url", default=",".join(BASE_URLS),
+                   help="1 hoặc nhiều server cùng model, cách nhau dấu phẩy (chia tải tự động)")
+    p.add_argument("--lb-policy", default="least_outstanding", choices=POLICIES,
+                   help="cách chọn server khi có nhiều --base-url")
+    p.add_argument("--model", default=MODEL_ID)
+    p.add_argument("--tiled", action="store_true",
+                   help="ảnh dài: cắt dải ngang chồng nhau, OCR song song rồi ghép")
+    p.add_argument("--cascade", action="store_true",
+                   help="OCR ảnh thu nhỏ trước, chỉ OCR lại cỡ đầy đủ (hoặc --tiled) khi text không đạt")
+    p.add_argument("--retries", type=int, default=RETRY_ATTEMPTS - 1,
+                   help="số lần thử lại lỗi tạm thời (5xx, mất kết nối, timeout)")
+    p.add_argument("--deadline", type=float, default=JOB_DEADLINE,
+                   help="giây tối đa cho mỗi ảnh / trang, kể cả thử lại")
+    p.add_argument("--cache", metavar="PATH", help="bật cache kết quả OCR (SQLite) tại PATH")
+    p.add_argument("--index", metavar="PATH",
+                   help="ghi kết quả vào chỉ mục tìm kiếm full-text (SQLite FTS5) tại PATH")
+    p.add_argument("--progress-every", type=int, default=100)
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.inputs and not args.files_from:
+        build_parser().error("cần ít nhất 1 input hoặc --files-from")
+    if args.concurrency < 1:
+        build_parser().error("--concurrency phải >= 1")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import json
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # lỗi tạm thời, gửi lại có thể thành công
+
+
+class OCRError(Exception):
+    """Gốc của mọi lỗi OCR; retryable=True -> gửi lại request có thể thành công."""
+
+    retryable = False
+
+    def __init__(self, message: str, endpoint: str = None):
+        super().__init__(message)
+        self.endpoint = endpoint
+
+
+class OCRUnavailable(OCRError):
+    """Không kết nối được server (refused / reset / DNS)."""
+    retryable = True
+
+
+class CircuitOpenError(OCRUnavailable):
+    """Mọi server đang bị ngắt mạch -> fail nhanh, không gửi request."""
+    retryable = False
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OCRTimeout(OCRError):
+    """Hết read/connect timeout của 1 lần gửi."""
+    retryable = True
+
+
+class DeadlineExceeded(OCRTimeout):
+    """Hết thời gian tổng cho cả job (mọi lần thử cộng lại)."""
+    retryable = False
+
+
+class OCRHTTPError(OCRError):
+    def __init__(self, message: str, status: int, endpoint: str = None):
+        super().__init__(message, endpoint)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRY_STATUSES
+
+
+class OCRResponseError(OCRError):
+    """Server trả 200 nhưng nội dung không đúng định dạng /chat/completions."""
+
+
+class OCRCancelled(OCRError):
+    """Job bị hủy (người dùng bấm Back / chọn file khác / nạp lại list)."""
+
+
+def classify(exc: Exception, endpoint: str = None) -> OCRError:
+    """Đổi exception của requests / aiohttp thành OCRError tương ứng."""
+    if isinstance(exc, OCRError):
+        return exc
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return OCRHTTPError(str(exc), exc.response.status_code, endpoint)
+    if isinstance(exc, requests.Timeout):
+        return OCRTimeout(str(exc) or "timeout", endpoint)
+    if isinstance(exc, requests.ConnectionError):
+        return OCRUnavailable(str(exc), endpoint)
+    if aiohttp is not None:
+        if isinstance(exc, aiohttp.ClientResponseError):
+            return OCRHTTPError(f"{exc.status} {exc.message}", exc.status, endpoint)
+        if isinstance(exc, aiohttp.ClientConnectionError):
+            return OCRUnavailable(str(exc), endpoint)
+    if isinstance(exc, TimeoutError):  # asyncio.TimeoutError là alias từ 3.11
+        return OCRTimeout(str(exc) or "timeout", endpoint)
+    if isinstance(exc, (ValueError, KeyError, IndexError, TypeError)):
+        return OCRResponseError(f"Invalid response: {exc!r}", endpoint)
+    return OCRError(str(exc), endpoint)
+
+
+def parse_completion(content: bytes):
+    """Body JSON /chat/completions -> (data, text); sai định dạng -> OCRResponseError."""
+    try:
+        data = json.loads(content)
+        return data, data["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise OCRResponseError(f"Invalid response: {e!r}") from e
+
+
+def describe_error(err: Exception) -> str:
+    """Câu ngắn hiển thị cho người dùng."""
+    if isinstance(err, CircuitOpenError):
+        wait = f", thử lại sau {err.retry_after:.0f}s" if err.retry_after else ""
+        return f"Server OCR đang lỗi, tạm ngừng gửi request{wait}."
+    if isinstance(err, DeadlineExceeded):
+        return "Quá thời gian cho phép của job OCR."
+    if isinstance(err, OCRTimeout):
+        return "Server OCR không phản hồi kịp (timeout)."
+    if isinstance(err, OCRUnavailable):
+        return "Không kết nối được server OCR."
+    if isinstance(err, OCRHTTPError):
+        return f"Server OCR trả lỗi HTTP {err.status}."
+    if isinstance(err, OCRCancelled):
+        return "Đã hủy job OCR."
+    if isinstance(err, OCRResponseError):
+        return "Server OCR trả kết quả không đúng định dạng."
+    return f"{type(err).__name__}: {err}"
@@ -0,0 +1,132 @@
+import json, logging, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+METRICS_LOG = "n6_ocrmedical/data/logs/ocr_metrics.jsonl"
+METRICS_LOG_MAX_BYTES = 5 * 1024 * 1024
+METRICS_LOG_BACKUPS = 3
+METRICS_KEEP = 5000  # số record giữ trong RAM để tính p50/p95
+
+# Thứ tự hiển thị các stage trong bảng tổng hợp
+STAGES = ("queue_wait", "hash", "phash", "read", "cache", "preprocess", "encode", "serialize",
+          "upload", "inference", "request", "download", "first_token", "generate",
+          "parse", "backoff", "ocr", "total")
+
+
+def percentile(values, p: float):
+    if not values:
+        return None
+    s = sorted(values)
+    k = (len(s) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+class JobTrace:
+    """Thời gian từng stage (ms) + thông tin phụ (byte, token, cache) của 1 lần OCR."""
+
+    def __init__(self, kind: str, label: str):
+        self.kind = kind
+        self.label = label
+        self.ts = time.time()
+        self.stages = {}
+        self.info = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t) * 1000)
+
+    def add(self, name: str, ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def set(self, **info):
+        self.info.update(info)
+
+    def set_usage(self, data: dict):
+        usage = data.get("usage") or {}
+        self.set(prompt_tokens=usage.get("prompt_tokens"),
+                 completion_tokens=usage.get("completion_tokens"),
+                 finish_reason=((data.get("choices") or [{}])[0]).get("finish_reason"))
+
+    def record(self) -> dict:
+        rec = {"ts": round(self.ts, 3), "kind": self.kind, "label": self.label,
+               "total_ms": round((time.perf_counter() - self._t0) * 1000, 2),
+               "stages": {k: round(v, 2) for k, v in self.stages.items()}}
+        rec.update(self.info)
+        return rec
+
+
+class MetricsSink:
+    """Nhận JobTrace: ghi JSONL (xoay vòng file), giữ record gần nhất, gọi hook.
+
+    log_path=None -> không ghi file. Hook: fn(record_dict), gọi trên thread chạy OCR.
+    """
+
+    def __init__(self, log_path: str = METRICS_LOG, max_bytes: int = METRICS_LOG_MAX_BYTES,
+                 backups: int = METRICS_LOG_BACKUPS, keep: int = METRICS_KEEP):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=keep)
+        self._hooks = []
+        self._logger = None
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups,
+                                          encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"ocr_metrics.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def add_hook(self, fn):
+        with self._lock:
+            self._hooks.append(fn)
+
+    def remove_hook(self, fn):
+        with self._lock:
+            if fn in self._hooks:
+                self._hooks.remove(fn)
+
+    def emit(self, trace: JobTrace):
+        rec = trace.record()
+        with self._lock:
+            self._recent.append(rec)
+            hooks = list(self._hooks)
+        if self._logger is not None:
+            self._logger.info(json.dumps(rec, ensure_ascii=False))
+        for fn in hooks:
+            try:
+                fn(rec)
+            except Exception:
+                pass  # hook lỗi không được làm hỏng OCR
+
+    def summary(self, kind: str = None) -> dict:
+        """{stage: {"count", "p50", "p95"}} trên các record gần nhất."""
+        with self._lock:
+            recs = [r for r in self._recent if kind is None or r["kind"] == kind]
+        per_stage = {}
+        for r in recs:
+            for name, ms in r["stages"].items():
+                per_stage.setdefault(name, []).append(ms)
+            per_stage.setdefault("total", []).append(r["total_ms"])
+        order = {name: i for i, name in enumerate(STAGES)}
+        return {name: {"count": len(v), "p50": percentile(v, 50), "p95": percentile(v, 95)}
+                for name, v in sorted(per_stage.items(), key=lambda kv: order.get(kv[0], len(order)))}
+
+
+_default_sink = None
+_default_lock = threading.Lock()
+
+def get_metrics() -> MetricsSink:
+    """Sink dùng chung cho app (ghi ra METRICS_LOG)."""
+    global _default_sink
+    with _default_lock:
+        if _default_sink is None:
+            _default_sink = MetricsSink()
+        return _default_sink
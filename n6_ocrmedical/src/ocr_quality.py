@@ -0,0 +1,70 @@
+import re
+from collections import namedtuple
+
+MIN_CHARS = 40             # ít hơn chừng này ký tự (bỏ khoảng trắng) -> nhiều khả năng model đọc không ra
+MAX_GARBLED_RATIO = 0.1    # tỉ lệ ký tự "rác" tối đa (ký hiệu lạ, U+FFFD, chữ Hán/Hàn/Nhật)
+MAX_REPEAT_RATIO = 0.5     # > nửa số dòng là dòng lặp lại -> model bị kẹt vòng lặp
+MIN_FIELDS = 2             # số nhóm trường cần thấy trên 1 phiếu xét nghiệm
+
+PUNCT = set(".,:;/\\-+*=<>()[]{}%#&_|!?'\"`~^@°µ·–—…“”‘’•")
+
+# Nhóm trường phiếu xét nghiệm nào cũng có; viết cả có dấu / không dấu như PATIENT_ID_RE
+EXPECTED_FIELDS = {
+    "patient": re.compile(
+        r"h[ọo]\s*(?:v[àa]\s*)?t[êe]n|b[ệe]nh\s*nh[âa]n|ng[ưu][ờo]i\s*b[ệe]nh|patient|\bname\b|\bpid\b",
+        re.IGNORECASE),
+    "test": re.compile(
+        r"x[ée]t\s*nghi[ệe]m|k[ếe]t\s*qu[ảa]|ch[ỉi]\s*s[ốo]|tham\s*chi[ếe]u|\bresult|\btest\b",
+        re.IGNORECASE),
+    "unit": re.compile(
+        r"[mµu]?mol/l|[mnµu]?g/[dm]?l|\b[ui]?u/l|10\^?\d+/l|\bfl\b|\bpg\b|\d\s*%",
+        re.IGNORECASE),
+}
+
+Quality = namedtuple("Quality", "ok issues")  # issues: tuple tên lỗi ("short", "garbled", ...)
+
+
+def is_garbled_char(c: str) -> bool:
+    if c.isspace() or c in PUNCT:
+        return False
+    cp = ord(c)
+    if c == "\ufffd" or 0x2E80 <= cp <= 0x9FFF or 0xAC00 <= cp <= 0xD7AF:
+        return True  # ký tự thay thế / CJK: phiếu tiếng Việt không có, model đoán bừa khi ảnh mờ
+    return not c.isalnum()
+
+
+def garbled_ratio(text: str) -> float:
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0.0
+    return sum(1 for c in chars if is_garbled_char(c)) / len(chars)
+
+
+def repeat_ratio(text: str) -> float:
+    lines = [l.strip() for l in text.splitlines() if len(l.strip()) > 3]
+    if len(lines) < 8:
+        return 0.0
+    return 1 - len(set(lines)) / len(lines)
+
+
+def assess(text: str, finish_reason: str = None, fields=EXPECTED_FIELDS,
+           min_fields: int = MIN_FIELDS) -> Quality:
+    """Kiểm tra nhanh text OCR có dùng được không (không gọi model).
+
+    Lỗi: short (quá ngắn), garbled (nhiều ký tự rác), repetitive (lặp dòng),
+    truncated (bị cắt bởi max_tokens), fields (thiếu trường phiếu xét nghiệm).
+    fields=None / min_fields=0 -> không kiểm tra trường (tài liệu không phải phiếu xét nghiệm).
+    """
+    text = text or ""
+    issues = []
+    if len("".join(text.split())) < MIN_CHARS:
+        issues.append("short")
+    if garbled_ratio(text) > MAX_GARBLED_RATIO:
+        issues.append("garbled")
+    if repeat_ratio(text) > MAX_REPEAT_RATIO:
+        issues.append("repetitive")
+    if finish_reason == "length":
+        issues.append("truncated")
+    if fields and min_fields and sum(1 for rx in fields.values() if rx.search(text)) < min_fields:
+        issues.append("fields")
+    return Quality(not issues, tuple(issues))
@@ -0,0 +1,148 @@
+import asyncio, random, time
+
+from ocr_errors import DeadlineExceeded, OCRError, OCRTimeout
+
+RETRY_ATTEMPTS = 3      # tổng số lần gửi (kể cả lần đầu)
+RETRY_BASE_DELAY = 0.5  # giây; lần thử thứ k chờ ngẫu nhiên trong [0, base * 2^k]
+RETRY_MAX_DELAY = 8.0
+JOB_DEADLINE = 300      # giây cho 1 ảnh / 1 trang, tính cả các lần thử lại
+
+BREAKER_FAILURES = 5    # lỗi liên tiếp thì ngắt mạch
+BREAKER_RESET = 30      # giây ngắt mạch trước khi cho 1 request thử lại (half-open)
+
+
+class Deadline:
+    """Mốc thời gian tuyệt đối của 1 job; seconds=None -> không giới hạn."""
+
+    def __init__(self, seconds: float = None):
+        self.at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        return None if self.at is None else max(self.at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("OCR job deadline exceeded")
+
+    def explain(self, err: OCRError) -> OCRError:
+        """Timeout do chính deadline cắt ngắn -> DeadlineExceeded (không phải lỗi server)."""
+        if isinstance(err, OCRTimeout) and not isinstance(err, DeadlineExceeded) and self.expired():
+            return DeadlineExceeded(f"OCR job deadline exceeded ({err})", err.endpoint)
+        return err
+
+    def timeout(self, connect: float, read: float):
+        """(connect, read) timeout của 1 lần gửi, không vượt quá thời gian còn lại."""
+        rem = self.remaining()
+        if rem is None:
+            return connect, read
+        rem = max(rem, 0.001)
+        return min(connect, rem), min(read, rem)
+
+
+class RetryPolicy:
+    """Thử lại lỗi tạm thời (OCRError.retryable) với exponential backoff + full jitter."""
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, rng: random.Random = None):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay_for(self, attempt: int, err: Exception, deadline: Deadline):
+        """Số giây chờ trước lần thử attempt+1, hoặc None nếu không nên thử lại."""
+        if not (isinstance(err, OCRError) and err.retryable) or attempt + 1 >= self.attempts:
+            return None
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        rem = deadline.remaining()
+        if rem is not None and delay >= rem:
+            return None
+        return delay
+
+    def call(self, fn, deadline: Deadline, on_retry=None):
+        """fn(attempt) -> kết quả; on_retry(attempt, err, delay) gọi trước mỗi lần chờ."""
+        attempt = 0
+        while True:
+            deadline.check()
+            try:
+                return fn(attempt)
+            except OCRError as e:
+                delay = self.delay_for(attempt, e, deadline)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn, deadline: Deadline, on_retry=None):
+        """Bản async của call(): fn(attempt) là coroutine function."""
+        attempt = 0
+        while True:
+            deadline.check()
+            try:
+                return await fn(attempt)
+            except OCRError as e:
+                delay = self.delay_for(attempt, e, deadline)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class CircuitBreaker:
+    """closed -> (lỗi liên tiếp >= failures) -> open -> (sau reset_s) -> half_open: cho 1 request thử.
+
+    Thử thành công -> closed; thất bại -> open lại. Không tự khoá: người gọi giữ lock.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_s: float = BREAKER_RESET):
+        self.max_failures = failures
+        self.reset_s = reset_s
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def ready(self, now: float) -> bool:
+        """Có được gửi request lúc này không (half_open đang có request thử -> không)."""
+        if self.state == self.CLOSED:
+            return True
+        return self.state == self.OPEN and now >= self.opened_at + self.reset_s
+
+    def retry_after(self, now: float) -> float:
+        return max(self.opened_at + self.reset_s - now, 0.0)
+
+    def on_pick(self):
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def failure(self, now: float):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+            self.trip(now)
+
+    def abandon(self):
+        """Request thử bị bỏ giữa chừng (hủy, chưa biết server sống hay chết) -> cho request khác thử."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def expire(self, now: float):
+        """Đang open mà biết server đã sống lại (health check) -> cho thử ngay."""
+        if self.state == self.OPEN:
+            self.opened_at = min(self.opened_at, now - self.reset_s)
+
+    def trip(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+
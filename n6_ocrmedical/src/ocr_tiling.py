@@ -0,0 +1,75 @@
+import io, re
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Dải ngang: cao = rộng * TILE_BAND_RATIO, 2 dải liền nhau chồng lên nhau TILE_OVERLAP
+TILE_BAND_RATIO = 0.6
+TILE_OVERLAP = 0.12
+TILE_WORKERS = 4
+MERGE_MAX_LINES = 12  # số dòng tối đa so khớp ở vùng chồng
+
+
+def plan_bands(width: int, height: int, band_ratio: float = TILE_BAND_RATIO,
+               overlap: float = TILE_OVERLAP):
+    """Trả về list (top, bottom) các dải ngang phủ hết ảnh; ảnh thấp -> 1 dải."""
+    band_h = max(int(width * band_ratio), 64)
+    if height <= band_h * 1.25:
+        return [(0, height)]
+    step = max(int(band_h * (1 - overlap)), 1)
+    bands, top = [], 0
+    while True:
+        bottom = min(top + band_h, height)
+        if height - bottom < band_h * 0.25:
+            bottom = height  # mẩu cuối quá thấp -> gộp vào dải này
+        bands.append((top, bottom))
+        if bottom >= height:
+            return bands
+        top += step
+
+
+def should_tile(width: int, height: int, band_ratio: float = TILE_BAND_RATIO) -> bool:
+    return len(plan_bands(width, height, band_ratio)) > 1
+
+
+def crop_bands(raw: bytes, band_ratio: float = TILE_BAND_RATIO, overlap: float = TILE_OVERLAP):
+    """Cắt ảnh (bytes) thành các dải PNG; trả về list bytes theo thứ tự từ trên xuống."""
+    if Image is None:
+        raise ImportError("Tiled OCR cần Pillow: pip install Pillow")
+    with Image.open(io.BytesIO(raw)) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        out = []
+        for top, bottom in plan_bands(im.width, im.height, band_ratio, overlap):
+            buf = io.BytesIO()
+            im.crop((0, top, im.width, bottom)).save(buf, "PNG", compress_level=1)
+            out.append(buf.getvalue())
+        return out
+
+
+def _norm(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().casefold()
+
+
+def merge_band_texts(texts, max_lines: int = MERGE_MAX_LINES) -> str:
+    """Nối text các dải, bỏ các dòng bị lặp ở vùng chồng.
+
+    Với 2 dải liền nhau, tìm k lớn nhất sao cho k dòng cuối (khác rỗng) của
+    dải trên trùng k dòng đầu của dải dưới, rồi bỏ k dòng đó ở dải dưới.
+    """
+    merged = []
+    for text in texts:
+        lines = [l for l in (text or "").splitlines()]
+        tail = [_norm(l) for l in merged if l.strip()][-max_lines:]
+        head_idx = [i for i, l in enumerate(lines) if l.strip()][:max_lines]
+        head = [_norm(lines[i]) for i in head_idx]
+        drop = 0
+        for k in range(min(len(tail), len(head)), 0, -1):
+            if tail[-k:] == head[:k]:
+                drop = head_idx[k - 1] + 1
+                break
+        merged.extend(lines[drop:])
+    return "\n".join(merged).strip()
@@ -0,0 +1,57 @@
+import io
+
+try:  # PDF: PyMuPDF (không bắt buộc)
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+    except ImportError:
+        pymupdf = None
+
+try:  # TIFF nhiều trang: Pillow
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PDF_DPI = 200  # đủ nét cho chữ in trên phiếu xét nghiệm
+DOCUMENT_EXTENSIONS = (".pdf", ".tif", ".tiff")
+
+
+def is_document(path: str) -> bool:
+    return path.lower().endswith(DOCUMENT_EXTENSIONS)
+
+
+def _require(mod, name: str):
+    if mod is None:
+        raise ImportError(f"Đọc file nhiều trang cần {name}")
+
+
+def count_pages(path: str) -> int:
+    if path.lower().endswith(".pdf"):
+        _require(pymupdf, "PyMuPDF: pip install pymupdf")
+        with pymupdf.open(path) as doc:
+            return doc.page_count
+    _require(Image, "Pillow: pip install Pillow")
+    with Image.open(path) as im:
+        return getattr(im, "n_frames", 1)
+
+
+def iter_pages(path: str, dpi: int = PDF_DPI):
+    """Yield (page_no, png_bytes) lần lượt từng trang, không nạp cả tài liệu vào RAM."""
+    if path.lower().endswith(".pdf"):
+        _require(pymupdf, "PyMuPDF: pip install pymupdf")
+        with pymupdf.open(path) as doc:
+            for i in range(doc.page_count):
+                pix = doc.load_page(i).get_pixmap(dpi=dpi)
+                yield i + 1, pix.tobytes("png")
+                del pix
+        return
+
+    _require(Image, "Pillow: pip install Pillow")
+    with Image.open(path) as im:
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            frame = im.convert("RGB") if im.mode not in ("RGB", "L") else im
+            buf = io.BytesIO()
+            frame.save(buf, "PNG", compress_level=1)
+            yield i + 1, buf.getvalue()
@@ -0,0 +1,172 @@
+import os, sqlite3, threading
+
+try:  # Pillow + NumPy không bắt buộc: thiếu Pillow thì không phát hiện ảnh trùng
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from page_source import is_document
+
+PHASH_PATH = "n6_ocrmedical/data/db/phash.sqlite3"
+HASH_SIZE = 16            # dHash 16x16 = 256 bit: phiếu cùng mẫu khác bệnh nhân vẫn lệch đủ nhiều bit
+HASH_BITS = HASH_SIZE * HASH_SIZE
+HASH_BYTES = HASH_BITS // 8
+DEFAULT_SIMILARITY = 0.97  # tỉ lệ bit giống nhau tối thiểu để coi là cùng 1 trang giấy
+
+
+def dhash(path: str, hash_size: int = HASH_SIZE):
+    """dHash (so sánh độ sáng 2 pixel kề nhau trên ảnh xám (n+1)xn) -> bytes; None nếu không đọc được."""
+    if Image is None or is_document(path):
+        return None
+    try:
+        with Image.open(path) as im:
+            im.draft("L", (hash_size * 8, hash_size * 8))  # JPEG: decode ở độ phân giải thấp
+            im = ImageOps.exif_transpose(im).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    except (OSError, ValueError):
+        return None
+    if np is not None:
+        px = np.asarray(im, dtype=np.int16)
+        return np.packbits(px[:, 1:] > px[:, :-1]).tobytes()
+    px = list(im.getdata())
+    bits = 0
+    for y in range(hash_size):
+        row = px[y * (hash_size + 1):(y + 1) * (hash_size + 1)]
+        for x in range(hash_size):
+            bits = (bits << 1) | (row[x + 1] > row[x])
+    return bits.to_bytes(HASH_BYTES, "big")
+
+
+def hamming(a: bytes, b: bytes) -> int:
+    return bin(int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).count("1")
+
+
+def max_distance(similarity: float) -> int:
+    return int(HASH_BITS * (1.0 - similarity))
+
+
+class PHashIndex:
+    """Perceptual hash của mọi file đã thêm vào list, tra theo khoảng cách Hamming.
+
+    Lưu trên đĩa (SQLite, kèm size + mtime để không tính lại file không đổi);
+    tra cứu quét toàn bộ hash trong RAM bằng NumPy (XOR + đếm bit, ~ms với 100k ảnh).
+    """
+
+    def __init__(self, path: str = PHASH_PATH, similarity: float = DEFAULT_SIMILARITY):
+        self.path = path
+        self.similarity = similarity
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS phashes ("
+            " path TEXT PRIMARY KEY, hash BLOB NOT NULL, size INTEGER, mtime_ns INTEGER)"
+        )
+        self._db.commit()
+
+        # bản sao trong RAM để tra Hamming: paths[i] <-> hàng i của _hashes
+        self._paths, self._row, self._stat = [], {}, {}
+        raw = []
+        for p, h, size, mtime in self._db.execute("SELECT path, hash, size, mtime_ns FROM phashes"):
+            self._row[p] = len(self._paths)
+            self._paths.append(p)
+            self._stat[p] = (size, mtime)
+            raw.append(h)
+        if np is not None:
+            self._hashes = np.frombuffer(b"".join(raw), dtype=np.uint8).reshape(-1, HASH_BYTES).copy()
+            self._n = len(raw)
+        else:
+            self._hashes = raw
+
+    # ---- ghi ----
+    def hash_file(self, path: str):
+        """Hash đã lưu nếu file không đổi (size + mtime), không thì tính lại và lưu."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        sig = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._stat.get(path) == sig:
+                return self._get(path)
+        h = dhash(path)
+        if h is None:
+            return None
+        with self._lock:
+            self._put(path, h, sig)
+            self._db.execute("INSERT OR REPLACE INTO phashes(path, hash, size, mtime_ns) VALUES (?,?,?,?)",
+                             (path, h, sig[0], sig[1]))
+            self._db.commit()
+        return h
+
+    def _put(self, path, h, sig):
+        self._stat[path] = sig
+        i = self._row.get(path)
+        if np is None:
+            if i is None:
+                self._row[path] = len(self._paths)
+                self._paths.append(path)
+                self._hashes.append(h)
+            else:
+                self._hashes[i] = h
+            return
+        if i is None:
+            i = self._row[path] = self._n
+            self._paths.append(path)
+            if self._n == len(self._hashes):  # mảng đầy -> nhân đôi (append khấu hao O(1))
+                grown = np.zeros((max(64, 2 * self._n), HASH_BYTES), dtype=np.uint8)
+                grown[:self._n] = self._hashes[:self._n]
+                self._hashes = grown
+            self._n += 1
+        self._hashes[i] = np.frombuffer(h, dtype=np.uint8)
+
+    def _get(self, path):
+        i = self._row[path]
+        return self._hashes[i].tobytes() if np is not None else self._hashes[i]
+
+    # ---- đọc ----
+    def matches(self, h: bytes, similarity: float = None, exclude: str = None) -> list:
+        """[(path, similarity)] các ảnh gần trùng h, giống nhất trước."""
+        limit = max_distance(self.similarity if similarity is None else similarity)
+        with self._lock:
+            if np is not None:
+                x = np.bitwise_xor(self._hashes[:self._n], np.frombuffer(h, dtype=np.uint8))
+                dist = np.unpackbits(x, axis=1).sum(axis=1, dtype=np.int32)
+                idx = np.flatnonzero(dist <= limit)
+                found = [(self._paths[i], int(dist[i])) for i in idx[np.argsort(dist[idx], kind="stable")]]
+            else:
+                found = sorted(((p, hamming(h, o)) for p, o in zip(self._paths, self._hashes)),
+                               key=lambda t: t[1])
+                found = [t for t in found if t[1] <= limit]
+        return [(p, 1.0 - d / HASH_BITS) for p, d in found if p != exclude]
+
+    def find_duplicates(self, path: str, similarity: float = None) -> list:
+        h = self.hash_file(path)
+        return [] if h is None else self.matches(h, similarity, exclude=path)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._paths)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+def get_phash_index() -> PHashIndex:
+    """Chỉ mục dùng chung cho app (tạo lười ở lần gọi đầu)."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = PHashIndex()
+        return _default_index
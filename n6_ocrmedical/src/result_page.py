@@ -2,14 +2,17 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QFileDialog,
     QTextEdit, QFrame, QButtonGroup, QGridLayout
 )
-from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QIcon, QPixmap
+from PySide6.QtCore import Qt, QSize, QTimer
+from PySide6.QtGui import QIcon, QPixmap, QTextCursor
 import os
 
+from thumbnails import ThumbnailLoader
+
 
 PANEL_BG   = "#ffffff"
 GAP_PANEL  = 26
 SIDE_MENU_ALIGN_WITH_DROP = 44
+STREAM_FLUSH_MS = 80  # gom token stream, vẽ lại tối đa ~12 lần/giây
 
 
 class UploadRow(QWidget):
@@ -66,6 +69,19 @@ class ResultPage(QWidget):
         mid_panel = self._build_middle_panel()
         root.addWidget(mid_panel, 0, 2, 12, 10)
 
+        # Stream OCR: buffer delta + timer flush
+        self._stream_buf = []
+        self._streaming = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(STREAM_FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush_stream)
+
+        # Preview: decode-at-size trên thread nền + cache RAM/đĩa
+        self._preview_path = None
+        self.thumbs = ThumbnailLoader(self)
+        self.thumbs.ready.connect(self._on_thumb_ready)
+
     # ---------------- Sidebar ----------------
     def _build_left_panel(self) -> QWidget:
         panel = QFrame()
@@ -176,6 +192,13 @@ class ResultPage(QWidget):
 
         # Right side: OCR result
         right = QVBoxLayout()
+        self.error_lbl = QLabel()
+        self.error_lbl.setWordWrap(True)
+        self.error_lbl.setStyleSheet(
+            "background:#fef2f2; color:#b91c1c; border:1px solid #fecaca;"
+            "border-radius:8px; padding:8px; font-weight:600;")
+        self.error_lbl.hide()
+        right.addWidget(self.error_lbl)
         self.result_text = QTextEdit()
         self.result_text.setReadOnly(True)
         self.result_text.setStyleSheet("""
@@ -217,19 +240,53 @@ class ResultPage(QWidget):
 
     # ---------------- Chức năng ----------------
     def set_result(self, text: str):
+        self._flush_timer.stop()
+        self._stream_buf.clear()
+        self._streaming = False
+        self.error_lbl.hide()
         self.result_text.setPlainText(text)
 
+    def set_error(self, message: str):
+        """OCR lỗi: hiện thông báo riêng, giữ phần text đã stream được (nếu có)."""
+        self._flush_stream()
+        self._flush_timer.stop()
+        if not self._streaming:
+            self.result_text.clear()  # bỏ placeholder "đang quét"
+        self._streaming = False
+        self.error_lbl.setText(message)
+        self.error_lbl.show()
+
+    def append_result_delta(self, delta: str):
+        """Nhận 1 đoạn text stream; gom lại và vẽ theo nhịp STREAM_FLUSH_MS."""
+        self._stream_buf.append(delta)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_stream(self):
+        if not self._stream_buf:
+            return
+        chunk = "".join(self._stream_buf)
+        self._stream_buf.clear()
+        if not self._streaming:
+            # đoạn đầu tiên: thay placeholder "đang quét"
+            self.result_text.clear()
+            self._streaming = True
+        cursor = self.result_text.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(chunk)
+
     def set_image_info(self, image_path: str):
         """Hiển thị ảnh input + file info giống Home."""
         if not os.path.exists(image_path):
             return
 
-        # Preview ảnh
-        pix = QPixmap(image_path).scaled(
-            self.preview.width(), self.preview.height(),
-            Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        self.preview.setPixmap(pix)
+        # Preview ảnh (có trong cache -> hiện ngay, không thì chờ thread decode)
+        self._preview_path = image_path
+        img = self.thumbs.request(image_path, self.preview.width(), self.preview.height())
+        if img is not None:
+            self.preview.setPixmap(QPixmap.fromImage(img))
+        else:
+            self.preview.clear()
 
         # Thông tin file
         name = os.path.basename(image_path)
@@ -244,6 +301,15 @@ class ResultPage(QWidget):
         # Thêm UploadRow (giống Home)
         row = UploadRow(1, name, size, "Ready")
         self.file_info_container.addWidget(row)
+
+    def prefetch_preview(self, image_path: str):
+        """Decode trước preview (file vừa được chọn ở Dashboard) vào cache của ThumbnailLoader."""
+        self.thumbs.request(image_path, self.preview.width(), self.preview.height())
+
+    def _on_thumb_ready(self, path: str, img):
+        if path == self._preview_path:  # bỏ qua preview của file đã chuyển đi
+            self.preview.setPixmap(QPixmap.fromImage(img))
+
     def on_download_clicked(self):
         text = self.result_text.toPlainText()
         if not text.strip():
@@ -0,0 +1,123 @@
+from datetime import datetime
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, QPoint, Signal
+from PySide6.QtWidgets import QLineEdit, QListWidget, QListWidgetItem
+
+from search_index import SearchIndex, get_search_index
+
+SEARCH_DEBOUNCE_MS = 200  # chờ người dùng ngừng gõ rồi mới truy vấn
+POPUP_MAX_ROWS = 8
+
+
+class SearchSignals(QObject):
+    done = Signal(int, list)  # (query_id, hits)
+
+
+class SearchTask(QRunnable):
+    """1 truy vấn FTS chạy trên thread nền; kết quả cũ bị bỏ qua theo query_id."""
+
+    def __init__(self, query_id: int, query: str, index: SearchIndex = None):
+        super().__init__()
+        self.query_id = query_id
+        self.query = query
+        self.index = index
+        self.signals = SearchSignals()
+
+    def run(self):
+        try:
+            hits = (self.index or get_search_index()).search(self.query)
+        except Exception:
+            hits = []  # câu truy vấn FTS lỗi cú pháp / DB đang khóa: coi như không có kết quả
+        self.signals.done.emit(self.query_id, hits)
+
+
+class SearchBox(QLineEdit):
+    """Ô "Search files, patients IDs…": gõ -> debounce -> truy vấn nền -> popup kết quả."""
+    hit_activated = Signal(str)  # đường dẫn file được chọn
+
+    def __init__(self, index: SearchIndex = None, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.setPlaceholderText("Search files, patients IDs…")
+
+        self._query_id = 0
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)  # chỉ truy vấn mới nhất là đáng chạy
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(SEARCH_DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._run_query)
+        self.textEdited.connect(lambda _: self._debounce.start())
+        self.returnPressed.connect(self._activate_current)
+
+        self.popup = QListWidget(self)
+        self.popup.setWindowFlags(Qt.Tool | Qt.FramelessWindowHint)
+        self.popup.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.popup.setFocusPolicy(Qt.NoFocus)
+        self.popup.setStyleSheet(
+            "QListWidget{border:1px solid #e5e7eb; border-radius:8px; background:#fff;}"
+            "QListWidget::item{padding:4px 6px;}"
+            "QListWidget::item:selected{background:#eff6ff; color:#111827;}"
+        )
+        self.popup.itemClicked.connect(self._on_item_clicked)
+
+    def _run_query(self):
+        self._query_id += 1
+        query = self.text().strip()
+        if not query:
+            self.popup.hide()
+            return
+        self._pool.clear()  # bỏ truy vấn còn xếp hàng, chưa chạy
+        task = SearchTask(self._query_id, query, self.index)
+        task.signals.done.connect(self._on_results)
+        self._pool.start(task)
+
+    def _on_results(self, query_id: int, hits: list):
+        if query_id != self._query_id:
+            return  # người dùng đã gõ tiếp
+        self.popup.clear()
+        if not hits:
+            self.popup.hide()
+            return
+        for h in hits:
+            when = datetime.fromtimestamp(h.ts).strftime("%d/%m/%Y %H:%M")
+            title = f"{h.name}  ·  {h.patient_id}" if h.patient_id else h.name
+            item = QListWidgetItem(f"{title}   {when}\n{h.snippet}")
+            item.setData(Qt.UserRole, h.path)
+            item.setToolTip(h.path)
+            self.popup.addItem(item)
+        self.popup.setCurrentRow(0)
+        self._show_popup()
+
+    def _show_popup(self):
+        rows = min(self.popup.count(), POPUP_MAX_ROWS)
+        self.popup.setFixedSize(max(self.width(), 360), self.popup.sizeHintForRow(0) * rows + 6)
+        self.popup.move(self.mapToGlobal(QPoint(0, self.height() + 2)))
+        self.popup.show()
+
+    def _on_item_clicked(self, item: QListWidgetItem):
+        self.popup.hide()
+        self.hit_activated.emit(item.data(Qt.UserRole))
+
+    def _activate_current(self):
+        if self.popup.isVisible() and self.popup.currentItem() is not None:
+            self._on_item_clicked(self.popup.currentItem())
+
+    def keyPressEvent(self, e):
+        if self.popup.isVisible() and e.key() in (Qt.Key_Down, Qt.Key_Up):
+            row = self.popup.currentRow() + (1 if e.key() == Qt.Key_Down else -1)
+            self.popup.setCurrentRow(max(0, min(row, self.popup.count() - 1)))
+            return
+        if e.key() == Qt.Key_Escape:
+            self.popup.hide()
+            return
+        super().keyPressEvent(e)
+
+    def focusOutEvent(self, e):
+        # trì hoãn để click chuột vào popup vẫn kịp tới itemClicked
+        QTimer.singleShot(150, lambda: self.hasFocus() or self.popup.hide())
+        super().focusOutEvent(e)
+
+    def hideEvent(self, e):
+        self.popup.hide()
+        super().hideEvent(e)
@@ -0,0 +1,199 @@
+import os, re, sqlite3, threading, time, unicodedata
+from collections import namedtuple
+
+INDEX_PATH = "n6_ocrmedical/data/db/ocr_index.sqlite3"
+SEARCH_LIMIT = 50
+RANK_WINDOW = 1000  # chỉ xếp hạng trong N tài liệu mới nhất khớp (từ khóa phổ biến khớp cả triệu dòng)
+SNIPPET_TOKENS = 10
+
+# "Mã BN: 23-004512", "Mã bệnh nhân 2300451", "Patient ID: P12345", "Số hồ sơ: HS/2023/01"
+PATIENT_ID_RE = re.compile(
+    r"(?:m[ãa]\s*(?:s[ốo]\s*)?(?:bn|b[ệe]nh\s*nh[âa]n|ng[ưu][ờo]i\s*b[ệe]nh|y\s*t[ếe])"
+    r"|patient\s*(?:id|no\.?|number)|pid|s[ốo]\s*h[ồo]\s*s[ơo])"
+    r"\s*[:#.\-]?\s*([A-Za-z0-9][A-Za-z0-9\-/.]{3,23})",
+    re.IGNORECASE)
+
+SearchHit = namedtuple("SearchHit", "path name patient_id ts snippet")
+
+
+def extract_patient_id(text: str):
+    """Mã bệnh nhân đầu tiên tìm thấy trong text OCR (None nếu không có)."""
+    m = PATIENT_ID_RE.search(text or "")
+    return m.group(1).rstrip(".-/") if m else None
+
+
+def fold(text: str) -> str:
+    """Bỏ dấu + chữ thường giống tokenizer unicode61 remove_diacritics 2 ("Xét" -> "xet")."""
+    text = text or ""
+    if text.isascii():  # tên file / mã bệnh nhân: gần như luôn ASCII, bỏ qua NFD cho nhanh
+        return text.lower()
+    text = unicodedata.normalize("NFD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def query_terms(text: str) -> list:
+    return re.findall(r"\w+", text or "")
+
+
+def build_query(text: str):
+    """Chuỗi người dùng gõ -> câu MATCH của FTS5, các từ AND với nhau.
+
+    Từ cuối (đang gõ dở) khớp theo prefix, các từ trước khớp nguyên từ: prefix dài hơn
+    chỉ mục prefix ('2 3') bắt FTS5 gộp cả doclist, chậm theo số tài liệu.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return None
+    return " ".join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def term_pattern(text: str):
+    """Regex trên text đã fold(): khớp các từ theo đúng luật của build_query (None nếu rỗng)."""
+    terms = [re.escape(fold(t)) for t in query_terms(text)]
+    if not terms:
+        return None
+    exact = f"(?:{'|'.join(terms[:-1])})(?!\\w)|" if len(terms) > 1 else ""
+    return re.compile(rf"(?<!\w)(?:{exact}{terms[-1]})")
+
+
+def make_snippet(body: str, pattern, tokens: int = SNIPPET_TOKENS) -> str:
+    """~tokens từ quanh từ khớp đầu tiên, từ khớp bọc trong [ ] (như snippet() của FTS5)."""
+    words = list(re.finditer(r"\w+", body or ""))
+    if not words:
+        return ""
+    hit = [bool(pattern.match(fold(m.group()))) for m in words]
+    first = hit.index(True) if True in hit else 0
+    lo = max(0, min(first - tokens // 2, len(words) - tokens))
+    hi = min(len(words), lo + tokens)
+    out, pos = [], words[lo].start()
+    for m, h in zip(words[lo:hi], hit[lo:hi]):
+        out.append(body[pos:m.start()])
+        out.append(f"[{m.group()}]" if h else m.group())
+        pos = m.end()
+    text = " ".join("".join(out).split())
+    return ("…" if lo > 0 else "") + text + ("…" if hi < len(words) else "")
+
+
+class SearchIndex:
+    """Chỉ mục full-text (SQLite FTS5) cho kết quả OCR: tên file, mã bệnh nhân, nội dung.
+
+    Không dấu vẫn tìm được ("xet nghiem" khớp "xét nghiệm"); mỗi file 1 dòng (ghi đè khi OCR lại).
+    Ghi và đọc dùng 2 connection riêng (WAL) để tìm kiếm không phải chờ lượt ghi.
+    Chỉ lấy rank_window dòng mới nhất khớp (FTS5 duyệt doclist theo rowid giảm dần, dừng sớm)
+    rồi xếp hạng trong đó: khớp mã bệnh nhân > tên file > nội dung, cùng hạng thì mới hơn trước.
+    Không dùng bm25 của FTS5: IDF của nó quét toàn bộ doclist từng từ khóa, truy vấn nhiều từ
+    trên 1M tài liệu mất vài trăm ms dù đã giới hạn cửa sổ.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, rank_window: int = RANK_WINDOW):
+        self.path = path
+        self.rank_window = rank_window
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, name TEXT NOT NULL,"
+            " patient_id TEXT, ts REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_docs_patient ON docs(patient_id)")
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+            " name, patient_id, body,"
+            " tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        self._db.commit()
+
+        if path == ":memory:":
+            self._read, self._read_lock = self._db, self._lock
+        else:
+            self._read = sqlite3.connect(path, check_same_thread=False)
+            self._read_lock = threading.Lock()
+
+    # ---- ghi ----
+    def add(self, path: str, text: str, ts: float = None, patient_id: str = None):
+        self.add_many([(path, text, ts, patient_id)])
+
+    def add_many(self, items):
+        """items: (path, text, ts, patient_id); ts/patient_id None -> now / tự trích từ text."""
+        with self._lock:
+            for path, text, ts, patient_id in items:
+                pid = patient_id or extract_patient_id(text)
+                name = os.path.basename(path)
+                ts = time.time() if ts is None else ts
+                self._delete(path)  # OCR lại -> id mới, nằm trong cửa sổ "mới nhất"
+                doc_id = self._db.execute(
+                    "INSERT INTO docs(path, name, patient_id, ts) VALUES (?,?,?,?)",
+                    (path, name, pid, ts)).lastrowid
+                self._db.execute("INSERT INTO docs_fts(rowid, name, patient_id, body) VALUES (?,?,?,?)",
+                                 (doc_id, name, pid or "", text))
+            self._db.commit()
+
+    def remove(self, path: str):
+        with self._lock:
+            self._delete(path)
+            self._db.commit()
+
+    def _delete(self, path: str):
+        row = self._db.execute("SELECT id FROM docs WHERE path=?", (path,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM docs_fts WHERE rowid=?", (row[0],))
+            self._db.execute("DELETE FROM docs WHERE id=?", (row[0],))
+
+    # ---- đọc ----
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """Hit xếp theo khớp mã bệnh nhân > tên file > nội dung trong rank_window dòng mới nhất."""
+        match = build_query(query)
+        if match is None:
+            return []
+        with self._read_lock:
+            rows = self._read.execute(
+                "SELECT d.id, d.path, d.name, d.patient_id, d.ts FROM ("
+                "   SELECT rowid AS id FROM docs_fts WHERE docs_fts MATCH ?"
+                "   ORDER BY rowid DESC LIMIT ?) w"
+                " JOIN docs d ON d.id = w.id",
+                (match, self.rank_window)).fetchall()
+            pattern = term_pattern(query)
+
+            def tier(row):
+                pid_hit = row[3] is not None and pattern.search(fold(row[3])) is not None
+                return 2 * pid_hit + (pattern.search(fold(row[2])) is not None)
+            rows.sort(key=lambda r: (tier(r), r[0]), reverse=True)
+            hits = []
+            for doc_id, path, name, pid, ts in rows[:limit]:
+                body = self._read.execute("SELECT body FROM docs_fts WHERE rowid=?", (doc_id,)).fetchone()
+                hits.append(SearchHit(path, name, pid, ts, make_snippet(body[0] if body else "", pattern)))
+        return hits
+
+    def get_text(self, path: str):
+        with self._read_lock:
+            row = self._read.execute(
+                "SELECT f.body FROM docs d JOIN docs_fts f ON f.rowid = d.id WHERE d.path=?",
+                (path,)).fetchone()
+        return row[0] if row else None
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._read.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        if self._read is not self._db:
+            with self._read_lock:
+                self._read.close()
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+def get_search_index() -> SearchIndex:
+    """Chỉ mục dùng chung cho app (tạo lười ở lần gọi đầu)."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SearchIndex()
+        return _default_index
@@ -0,0 +1,107 @@
+import hashlib, os
+from collections import OrderedDict
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, Signal
+from PySide6.QtGui import QImage, QImageReader
+
+THUMB_DIR = "n6_ocrmedical/data/cache/thumbs"
+THUMB_MEM_ITEMS = 64  # số preview giữ trong RAM
+
+
+def thumb_key(path: str, width: int, height: int):
+    """(path, mtime, size, WxH) -> file đổi là key đổi; None nếu không stat được."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{width}x{height}"
+
+
+def decode_at_size(path: str, width: int, height: int) -> QImage:
+    """Decode thẳng ra kích thước preview (JPEG decode ở độ phân giải thấp, không dựng ảnh gốc)."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    src = reader.size()
+    if src.isValid() and (src.width() > width or src.height() > height):
+        reader.setScaledSize(src.scaled(QSize(width, height), Qt.KeepAspectRatio))
+    img = reader.read()
+    if not img.isNull() and (img.width() > width or img.height() > height):
+        # ảnh xoay EXIF / định dạng không hỗ trợ scaled decode
+        img = img.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return img
+
+
+class ThumbnailSignals(QObject):
+    ready = Signal(str, str, QImage)  # (path, key, image)
+
+
+class ThumbnailTask(QRunnable):
+    """Đọc thumbnail từ cache đĩa, không có thì decode-at-size rồi ghi cache."""
+
+    def __init__(self, path: str, key: str, width: int, height: int, disk_dir: str):
+        super().__init__()
+        self.path = path
+        self.key = key
+        self.width = width
+        self.height = height
+        self.disk_dir = disk_dir
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        disk_path = None
+        if self.disk_dir:
+            disk_path = os.path.join(self.disk_dir, hashlib.sha1(self.key.encode("utf-8")).hexdigest() + ".jpg")
+            if os.path.exists(disk_path):
+                img = QImage(disk_path)
+                if not img.isNull():
+                    self.signals.ready.emit(self.path, self.key, img)
+                    return
+        img = decode_at_size(self.path, self.width, self.height)
+        if disk_path and not img.isNull():
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                img.save(disk_path, "JPG", 85)
+            except OSError:
+                pass
+        self.signals.ready.emit(self.path, self.key, img)
+
+
+class ThumbnailLoader(QObject):
+    """Preview cho ResultPage: LRU trong RAM + cache đĩa, decode trên QThreadPool.
+
+    request() trả về QImage ngay nếu có trong RAM, còn không thì trả None
+    và emit ready(path, image) khi decode xong.
+    """
+    ready = Signal(str, QImage)
+
+    def __init__(self, parent=None, mem_items: int = THUMB_MEM_ITEMS, disk_dir: str = THUMB_DIR):
+        super().__init__(parent)
+        self.mem_items = mem_items
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        self._pending = set()
+        self.pool = QThreadPool.globalInstance()
+
+    def request(self, path: str, width: int, height: int):
+        key = thumb_key(path, width, height)
+        if key is None:
+            return None
+        img = self._mem.get(key)
+        if img is not None:
+            self._mem.move_to_end(key)
+            return img
+        if key not in self._pending:
+            self._pending.add(key)
+            task = ThumbnailTask(path, key, width, height, self.disk_dir)
+            task.signals.ready.connect(self._on_ready)
+            self.pool.start(task)
+        return None
+
+    def _on_ready(self, path: str, key: str, img: QImage):
+        self._pending.discard(key)
+        if img.isNull():
+            return
+        self._mem[key] = img
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+        self.ready.emit(path, img)
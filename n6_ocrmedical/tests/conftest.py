@@ -0,0 +1,20 @@
+import os, sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # test Qt không cần màn hình
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """JobStore / SearchIndex / PHashIndex / MetricsSink dùng chung của app trỏ vào thư mục tạm."""
+    import job_store, search_index, phash_index, ocr_metrics
+    js = job_store.JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_store, "_default_store", js)
+    monkeypatch.setattr(search_index, "_default_index", search_index.SearchIndex(str(tmp_path / "index.sqlite3")))
+    monkeypatch.setattr(phash_index, "_default_index", phash_index.PHashIndex(str(tmp_path / "phash.sqlite3")))
+    monkeypatch.setattr(ocr_metrics, "_default_sink", ocr_metrics.MetricsSink(log_path=None))
+    yield js
+    js.close()
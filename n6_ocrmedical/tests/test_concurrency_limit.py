@@ -0,0 +1,151 @@
+import threading, time
+
+import pytest
+
+import concurrency_limit
+from concurrency_limit import AdaptiveLimiter
+from ocr_errors import DeadlineExceeded, OCRHTTPError, OCRTimeout
+
+
+class Clock:
+    """time giả cho limiter: thời điểm chỉ đổi khi test gọi advance()."""
+
+    def __init__(self):
+        self.t = 1000.0
+
+    def monotonic(self):
+        return self.t
+
+    def perf_counter(self):
+        return self.t
+
+    def advance(self, seconds):
+        self.t += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(concurrency_limit, "time", c)
+    return c
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def run(lim, n, latency_ms=None, error=None):
+    """n request cùng bay rồi cùng xong."""
+    for _ in range(n):
+        assert lim.acquire(timeout=0)
+    for _ in range(n):
+        lim.release(latency_ms, error)
+
+
+def test_limit_grows_additively_only_while_fully_used(clock):
+    lim = AdaptiveLimiter(initial=2, max_limit=4)
+    run(lim, 2, 100)
+    assert lim._limit == 2.5 and lim.increases == 1  # request thứ 2 xong khi chỉ còn 1/2.5 slot dùng
+
+    for _ in range(20):
+        run(lim, lim.limit, 100)
+    assert lim.limit == 4  # không vượt max_limit
+
+    idle = AdaptiveLimiter(initial=8)
+    for _ in range(10):
+        run(idle, 1, 100)  # 1 request / lần với limit 8: limit không phải nút thắt
+    assert idle.limit == 8 and idle.increases == 0
+
+
+def test_latency_above_tolerance_decreases_once_per_latency(clock):
+    lim = AdaptiveLimiter(initial=10, tolerance=1.5, backoff=0.5)
+    run(lim, 1, 100)  # baseline 100 ms
+    run(lim, 1, 400)  # EWMA 190 ms > 1.5 x 100 -> giảm
+    assert lim.limit == 5 and lim.decreases == 1
+
+    run(lim, 1, 400)  # vẫn trong 1 latency kể từ lần giảm trước -> không giảm tiếp
+    assert lim.limit == 5
+
+    clock.advance(1.0)
+    run(lim, 1, 400)
+    assert lim.limit == 2 and lim.decreases == 2
+
+
+def test_overload_errors_back_off_but_client_errors_do_not(clock):
+    lim = AdaptiveLimiter(initial=8, min_limit=2, error_backoff=0.5)
+    run(lim, 1, error=OCRHTTPError("bad request", 400))
+    run(lim, 1, error=DeadlineExceeded("job deadline"))
+    assert lim.limit == 8 and lim.decreases == 0
+
+    run(lim, 1, error=OCRTimeout("read timeout"))
+    assert lim.limit == 4
+    clock.advance(1.0)
+    run(lim, 1, error=OCRHTTPError("too many requests", 429))
+    assert lim.limit == 2
+    clock.advance(1.0)
+    run(lim, 1, error=OCRTimeout("read timeout"))
+    assert lim.limit == 2  # không xuống dưới min_limit
+
+
+def test_sporadic_5xx_is_tolerated_but_high_error_rate_backs_off(clock):
+    lim = AdaptiveLimiter(initial=8, error_backoff=0.5)
+    run(lim, 1, error=OCRHTTPError("boom", 500))
+    assert lim.limit == 8
+    run(lim, 1, error=OCRHTTPError("boom", 502))
+    run(lim, 1, error=OCRHTTPError("boom", 503))  # error_rate ~0.27 > ERROR_RATE_MAX
+    assert lim.limit == 4
+
+
+def test_slot_releases_on_error_and_on_abandoned_request(clock):
+    lim = AdaptiveLimiter(initial=4)
+    with pytest.raises(OCRTimeout):
+        with lim.slot():
+            raise OCRTimeout("read timeout")
+    assert lim.in_flight == 0 and lim.limit == 2
+
+    def stream():
+        with lim.slot():
+            yield "token"
+    gen = stream()
+    next(gen)
+    assert lim.in_flight == 1
+    gen.close()  # GeneratorExit: chỉ trả slot, không tính là lỗi hay latency
+    assert lim.in_flight == 0 and lim.limit == 2 and lim.latency_ms is None
+
+
+def test_urgent_request_uses_reserve_slot():
+    lim = AdaptiveLimiter(initial=1, urgent_reserve=1)
+    assert lim.acquire(timeout=0)
+    assert not lim.acquire(timeout=0)
+    assert lim.acquire(timeout=0, urgent=True)  # vượt limit 1 slot
+    assert not lim.acquire(timeout=0, urgent=True)
+    assert lim.in_flight == 2
+
+
+def test_waiting_urgent_request_goes_before_waiting_batch():
+    lim = AdaptiveLimiter(initial=2, urgent_reserve=0)
+    assert lim.acquire(timeout=0) and lim.acquire(timeout=0)
+    got = []
+
+    def waiter(name, urgent):
+        if lim.acquire(timeout=5, urgent=urgent):
+            got.append(name)
+
+    batch = threading.Thread(target=waiter, args=("batch", False))
+    batch.start()
+    assert wait_for(lambda: lim.waiting == 1)
+    urgent = threading.Thread(target=waiter, args=("urgent", True))
+    urgent.start()
+    assert wait_for(lambda: lim.urgent_waiting == 1)
+
+    lim.release()  # 1 slot trống: request gấp lấy, batch tiếp tục chờ
+    urgent.join(5)
+    assert got == ["urgent"] and lim.waiting == 1
+    lim.release()
+    batch.join(5)
+    assert got == ["urgent", "batch"] and lim.in_flight == 2
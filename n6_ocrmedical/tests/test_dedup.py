@@ -0,0 +1,63 @@
+import shutil
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+ImageFont = pytest.importorskip("PIL.ImageFont")
+pytest.importorskip("PySide6")
+
+import Ocr_App
+from ocr_metrics import JobTrace
+from phash_index import HASH_BITS, dhash, hamming
+
+TESTS = ("Glucose", "Ure", "Creatinin", "AST", "ALT", "Cholesterol", "Triglycerid", "HDL", "LDL")
+
+
+def make_form(path, name: str, patient_id: str):
+    """Phiếu xét nghiệm cùng mẫu: chỉ họ tên và mã bệnh nhân khác nhau."""
+    im = Image.new("RGB", (1240, 1754), "white")
+    d = ImageDraw.Draw(im)
+    big, font = ImageFont.load_default(size=40), ImageFont.load_default(size=26)
+    d.text((300, 80), "PHIEU KET QUA XET NGHIEM", fill="black", font=big)
+    d.text((80, 200), f"Ho ten: {name}", fill="black", font=font)
+    d.text((750, 200), f"Ma BN: {patient_id}", fill="black", font=font)
+    for i, test in enumerate(TESTS):
+        y = 320 + i * 60
+        d.line((60, y - 10, 1180, y - 10), fill="black", width=2)
+        d.text((80, y), test, fill="black", font=font)
+        d.text((600, y), "5.6", fill="black", font=font)
+        d.text((850, y), "mmol/L", fill="black", font=font)
+    im.save(path, quality=90)
+    return str(path)
+
+
+def ocr_done(path: str, text: str):
+    trace = JobTrace("ui_job", path)
+    assert Ocr_App.begin_job(path, trace) is None
+    Ocr_App.save_result(path, text, trace)
+
+
+def test_same_template_forms_of_different_patients_are_not_reused(stores, tmp_path):
+    a = make_form(tmp_path / "a.jpg", "Nguyen Van An", "BN123456")
+    b = make_form(tmp_path / "b.jpg", "Tran Thi Binh", "BN987654")
+    # dHash không phân biệt được 2 phiếu này: đây là lý do không dùng lại text theo phash
+    similarity = 1 - hamming(dhash(a), dhash(b)) / HASH_BITS
+    assert similarity >= Ocr_App.DEDUP_SIMILARITY
+
+    ocr_done(a, "Họ tên: Nguyen Van An  Mã BN: BN123456")
+    trace = JobTrace("ui_job", b)
+    assert Ocr_App.begin_job(b, trace) is None  # phải OCR riêng
+    assert "duplicate_of" not in trace.info
+
+
+def test_exact_copy_reuses_result(stores, tmp_path):
+    a = make_form(tmp_path / "a.jpg", "Nguyen Van An", "BN123456")
+    copy = str(tmp_path / "copy.jpg")
+    shutil.copyfile(a, copy)
+    ocr_done(a, "Họ tên: Nguyen Van An")
+
+    trace = JobTrace("ui_job", copy)
+    assert Ocr_App.begin_job(copy, trace) == "Họ tên: Nguyen Van An"
+    assert trace.info["duplicate_of"] == a
+    assert stores.result(copy) == "Họ tên: Nguyen Van An"
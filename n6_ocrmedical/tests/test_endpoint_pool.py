@@ -0,0 +1,47 @@
+import pytest
+
+from endpoint_pool import EndpointPool
+from ocr_errors import CircuitOpenError, OCRCancelled, OCRHTTPError
+from ocr_retry import CircuitBreaker
+
+
+def fail(pool, exc):
+    with pytest.raises(type(exc)):
+        with pool.acquire():
+            raise exc
+
+
+def test_abandoned_request_does_not_count_as_success():
+    pool = EndpointPool(["http://a/v1"], breaker_failures=3)
+    ep = pool.endpoints[0]
+    fail(pool, OCRHTTPError("boom", 500))
+    fail(pool, OCRHTTPError("boom", 500))
+    fail(pool, KeyboardInterrupt())
+    fail(pool, OCRCancelled("cancelled"))
+    assert ep.outstanding == 0
+    assert ep.breaker.failures == 2 and ep.breaker.state == CircuitBreaker.CLOSED
+
+    fail(pool, OCRHTTPError("boom", 500))  # lỗi thứ 3 liên tiếp vẫn ngắt mạch
+    assert ep.breaker.state == CircuitBreaker.OPEN
+
+
+def test_abandoned_stream_releases_half_open_probe():
+    pool = EndpointPool(["http://a/v1"], breaker_failures=1, breaker_reset=0)
+    ep = pool.endpoints[0]
+    fail(pool, OCRHTTPError("boom", 503))
+    assert ep.breaker.state == CircuitBreaker.OPEN
+
+    def stream():
+        with pool.acquire():
+            yield "token"
+    gen = stream()
+    next(gen)  # request thử (half_open) đang stream
+    assert ep.breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        pool.pick()
+    gen.close()  # người dùng bấm Back: GeneratorExit trong acquire()
+
+    assert ep.outstanding == 0 and ep.breaker.state == CircuitBreaker.OPEN
+    with pool.acquire():  # request khác được thử ngay, không kẹt ở half_open
+        pass
+    assert ep.breaker.state == CircuitBreaker.CLOSED
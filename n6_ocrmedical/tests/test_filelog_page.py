@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("PySide6")
+from PySide6.QtWidgets import QApplication
+
+import Ocr_App
+from ocr_metrics import JobTrace
+
+
+@pytest.fixture
+def window(stores):
+    app = QApplication.instance() or QApplication([])
+    w = Ocr_App.MainWindow()
+    yield w
+    w.close()
+    w.dashboard.jobs.cancel_all()
+
+
+def test_all_files_opens_file_log_and_search_hit_opens_result(window, stores, tmp_path):
+    path = str(tmp_path / "scan_01.jpg")
+    (tmp_path / "scan_01.jpg").write_bytes(b"fake image bytes")
+    trace = JobTrace("ui_job", path)
+    assert Ocr_App.begin_job(path, trace) is None
+    Ocr_App.save_result(path, "Mã BN: BN1234 Glucose 5.6 mmol/L", trace)
+
+    window.dashboard.btn_all.click()
+    assert window.stacked.currentWidget() is window.file_log
+    window.file_log.refresh()
+    assert window.file_log.history.count() == 1
+
+    window.file_log.search_box.hit_activated.emit(path)
+    assert window.stacked.currentWidget() is window.result_page
+
+    window.result_page.btn_all.click()
+    window.file_log.history.itemActivated.emit(window.file_log.history.item(0))
+    assert window.stacked.currentWidget() is window.result_page
+
+    window.result_page.btn_all.click()
+    window.file_log.btn_home.click()
+    assert window.stacked.currentWidget() is window.dashboard
+
+
+def test_search_hit_for_overwritten_file_runs_ocr_again(window, stores, tmp_path, monkeypatch):
+    scan = tmp_path / "scan_02.jpg"
+    scan.write_bytes(b"patient A")
+    path = str(scan)
+    trace = JobTrace("ui_job", path)
+    assert Ocr_App.begin_job(path, trace) is None
+    Ocr_App.save_result(path, "Mã BN: BN0001 Glucose 5.6", trace)
+    scan.write_bytes(b"patient B, same file name")  # máy scan ghi đè file cũ
+
+    submitted = []
+    monkeypatch.setattr(window.dashboard.jobs, "submit", lambda fn, priority: submitted.append(priority) or 1)
+    assert stores.result(path) == "Mã BN: BN0001 Glucose 5.6"
+    assert Ocr_App.stored_result(path) is None
+
+    window.dashboard.open_search_hit(path)
+    assert submitted == [Ocr_App.INTERACTIVE]
+    assert "BN0001" not in window.result_page.result_text.toPlainText()
+
+
+def test_stored_result_only_hashes_when_size_or_mtime_changed(stores, tmp_path, monkeypatch):
+    import os
+    scan = tmp_path / "scan_03.pdf"
+    scan.write_bytes(b"large document")
+    path = str(scan)
+    trace = JobTrace("ui_job", path)
+    assert Ocr_App.begin_job(path, trace) is None
+    Ocr_App.save_result(path, "Mã BN: BN0003", trace)
+
+    hashed = []
+    real_hash = Ocr_App.file_hash
+    monkeypatch.setattr(Ocr_App, "file_hash", lambda p: hashed.append(p) or real_hash(p))
+    assert Ocr_App.stored_result(path) == "Mã BN: BN0003"
+    assert hashed == []  # file không đổi -> không hash trên GUI thread
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # touch: nội dung không đổi
+    assert Ocr_App.stored_result(path) == "Mã BN: BN0003"
+    assert Ocr_App.stored_result(path) == "Mã BN: BN0003"
+    assert hashed == [path]  # hash 1 lần rồi ghi lại size + mtime mới
@@ -0,0 +1,175 @@
+import base64, os, time, tracemalloc
+
+import pytest
+
+from fake_lmstudio import FakeLMStudio
+from lmstudio_client import OCRClient
+from ocr_cache import OCRCache
+from ocr_errors import CircuitOpenError, OCRHTTPError
+from ocr_retry import CircuitBreaker, RetryPolicy
+
+PROMPT = "Trích xuất văn bản"
+
+
+@pytest.fixture
+def image(tmp_path):
+    p = tmp_path / "scan.png"
+    p.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64)
+    return str(p)
+
+
+def data_url(path):
+    with open(path, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode("ascii")
+
+
+def make_client(srv, **kw):
+    kw.setdefault("retry", RetryPolicy(attempts=3, base_delay=0.01))
+    return OCRClient(base_url=srv.base_url, preprocessor=None, **kw)
+
+
+def wait_until(cond, timeout=5.0, app=None):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        if app is not None:
+            app.processEvents()
+        time.sleep(0.01)
+    return True
+
+
+def test_transient_errors_are_retried(image):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=20, fail_first=2) as srv, make_client(srv) as c:
+        assert c.ocr(image, PROMPT)
+        assert srv.stats["requests"] == 3 and srv.stats["errors"] == 2
+        ep = c.endpoints.endpoints[0]
+        assert ep.outstanding == 0 and ep.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_gives_up_after_last_attempt(image):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=20, fail_first=10) as srv, \
+            make_client(srv, retry=RetryPolicy(attempts=2, base_delay=0.01)) as c:
+        with pytest.raises(OCRHTTPError) as ei:
+            c.ocr(image, PROMPT)
+        assert ei.value.status == 500
+        assert srv.stats["requests"] == 2
+
+
+def test_breaker_opens_and_stops_calling_failing_server(image):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=20, fail_first=100) as srv, \
+            make_client(srv, retry=None) as c:
+        ep = c.endpoints.endpoints[0]
+        n = 0
+        while ep.breaker.state == CircuitBreaker.CLOSED:
+            with pytest.raises(OCRHTTPError):
+                c.ocr(image, PROMPT, use_cache=False)
+            n += 1
+            assert n <= 10
+        assert srv.stats["requests"] == n
+        with pytest.raises(CircuitOpenError):
+            c.ocr(image, PROMPT, use_cache=False)
+        assert srv.stats["requests"] == n  # mạch mở: không gửi request tới server
+        assert ep.outstanding == 0
+
+
+def test_body_is_sent_with_content_length_not_chunked(image):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=20) as srv, make_client(srv) as c:
+        expected = c.build_payload(data_url(image), PROMPT)
+        c.ocr(image, PROMPT)
+        assert srv.last_request == expected
+
+        assert "".join(c.ocr_stream(image, PROMPT))
+        assert srv.last_request == c.build_payload(data_url(image), PROMPT, stream=True)
+        assert srv.stats["chunked_uploads"] == 0
+
+
+def test_request_memory_does_not_grow_with_file_size(tmp_path):
+    big = tmp_path / "big.png"
+    big.write_bytes(os.urandom(32 * 1024 * 1024))  # Pillow không đọc được -> gửi nguyên file
+    c = OCRClient(base_url="http://127.0.0.1:1/v1", cache=OCRCache(":memory:"))  # preprocessor + cache bật
+    tracemalloc.start()
+    try:
+        key = c.cache_key(str(big), PROMPT)
+        body = c.prepare_body(str(big), None, None, PROMPT).open()
+        sent = 0
+        while chunk := body.read(64 * 1024):
+            sent += len(chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        c.close()
+    assert sent == len(body)
+    assert peak < 4 * 1024 * 1024
+    assert key == c.cache_key(big.read_bytes(), PROMPT)  # key như cũ: cache đã có vẫn dùng được
+
+
+def test_closing_stream_releases_endpoint_without_failure(image):
+    with FakeLMStudio(latency_ms=5, tps=50, tokens=200) as srv, make_client(srv) as c:
+        gen = c.ocr_stream(image, PROMPT)
+        assert next(gen)
+        gen.close()  # người dùng bấm Back giữa lúc stream
+        ep = c.endpoints.endpoints[0]
+        assert ep.outstanding == 0
+        assert ep.breaker.state == CircuitBreaker.CLOSED and ep.breaker.failures == 0
+        assert wait_until(lambda: srv.stats["inflight"] == 0)  # server thấy kết nối bị ngắt
+
+
+def test_cancelled_result_job_is_requeued_not_failed(stores, image, monkeypatch):
+    pytest.importorskip("PySide6")
+    from PySide6.QtWidgets import QApplication
+    import Ocr_App, lmstudio_client
+    from job_manager import INTERACTIVE, JobManager
+    from job_store import QUEUED
+
+    app = QApplication.instance() or QApplication([])
+    with FakeLMStudio(latency_ms=5, tps=50, tokens=200) as srv, make_client(srv) as c:
+        monkeypatch.setattr(lmstudio_client, "_default_client", c)
+        jobs = JobManager()
+        deltas, ended = [], []
+        jobs.delta.connect(lambda i, d: deltas.append(d))
+        jobs.cancelled.connect(lambda i: ended.append("cancelled"))
+        jobs.failed.connect(lambda i, e: ended.append("failed"))
+        jobs.done.connect(lambda i, r, info: ended.append("done"))
+
+        job_id = jobs.submit(lambda job: Ocr_App.result_job(job, image, PROMPT, stream=True), INTERACTIVE)
+        assert wait_until(lambda: deltas, app=app)
+        jobs.cancel(job_id)
+        assert wait_until(lambda: ended, app=app)
+        jobs.interactive_pool.waitForDone(5000)
+
+        assert ended == ["cancelled"]
+        assert stores.get(image).status == QUEUED
+        assert c.endpoints.endpoints[0].outstanding == 0
+        assert c.endpoints.endpoints[0].breaker.failures == 0
+
+
+@pytest.fixture
+def large_scan(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    p = tmp_path / "large.png"
+    Image.new("L", (1200, 1800), 255).save(p)  # lớn hơn CASCADE_LONG_SIDE -> có lượt ảnh nhỏ
+    return str(p)
+
+
+def cascade_client(srv, tmp_path):
+    return OCRClient(base_url=srv.base_url, retry=None, cache=OCRCache(str(tmp_path / "cache.sqlite3")))
+
+
+def test_cascade_accepts_low_pass_and_serves_rerun_from_cache(large_scan, tmp_path):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=60) as srv, cascade_client(srv, tmp_path) as c:
+        first = c.ocr_cascade(large_scan, PROMPT)
+        assert srv.stats["requests"] == 1  # lượt ảnh nhỏ qua assess -> không gửi ảnh đầy đủ
+        assert c.ocr_cascade(large_scan, PROMPT) == first
+        assert srv.stats["requests"] == 1
+
+
+def test_rejected_low_pass_is_not_cached(large_scan, tmp_path):
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=60, truncate=True) as srv, \
+            cascade_client(srv, tmp_path) as c:
+        c.ocr_cascade(large_scan, PROMPT)
+        assert srv.stats["requests"] == 2  # lượt nhỏ bị cắt (finish_reason=length) -> lên cỡ đầy đủ
+
+        c.ocr_cascade(large_scan, PROMPT)
+        # chạy lại: lượt nhỏ lại bị loại thay vì trả text bị cắt từ cache, lượt đầy đủ lấy từ cache
+        assert srv.stats["requests"] == 3
@@ -0,0 +1,78 @@
+import itertools
+
+import pytest
+
+import ocr_cache
+from ocr_cache import OCRCache, make_key
+
+
+class Clock:
+    """time.time() giả: mỗi lần gọi tăng 1 giây -> thứ tự last_access không bị trùng."""
+
+    def __init__(self):
+        self._t = itertools.count(1000)
+
+    def time(self):
+        return float(next(self._t))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "time", Clock())
+    c = OCRCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    yield c
+    c.close()
+
+
+def test_entry_cap_evicts_least_recently_used(cache):
+    for k in "abc":
+        cache.put(k, f"text {k}")
+    assert cache.get("a") == "text a"  # hit: "a" mới dùng gần nhất, "b" cũ nhất
+
+    cache.put("d", "text d")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["text a", "text c", "text d"]
+    assert cache.stats()["entries"] == 3
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+def test_overwriting_a_key_does_not_count_twice(cache):
+    for k in "abc":
+        cache.put(k, "x")
+    cache.put("a", "y")
+    assert cache.stats()["entries"] == 3
+    assert [cache.get(k) for k in "abc"] == ["y", "x", "x"]
+
+
+def test_byte_cap_evicts_oldest_and_skips_oversized(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "time", Clock())
+    c = OCRCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    c.put("a", "1234")
+    c.put("b", "5678")
+    c.put("c", "90ab")  # 12 byte > 10 -> bỏ "a"
+    assert c.get("a") is None and c.get("b") == "5678"
+    c.put("big", "x" * 11)  # lớn hơn cả cache -> không lưu, không đuổi entry khác
+    assert c.get("big") is None and c.get("c") == "90ab"
+    assert c.stats()["bytes"] == 8
+    c.close()
+
+
+def test_reopen_applies_smaller_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "time", Clock())
+    path = str(tmp_path / "cache.sqlite3")
+    c = OCRCache(path)
+    for k in "abcd":
+        c.put(k, k)
+    c.close()
+    c = OCRCache(path, max_entries=2)
+    assert c.stats()["entries"] == 2 and [c.get(k) for k in "abcd"] == [None, None, "c", "d"]
+    c.close()
+
+
+def test_key_depends_on_image_prompt_model_and_params():
+    base = make_key(b"img", "prompt", "model", {"t": 0.1})
+    assert base == make_key(b"img", "prompt", "model", {"t": 0.1})
+    assert len({base, make_key(b"img2", "prompt", "model", {"t": 0.1}),
+                make_key(b"img", "prompt 2", "model", {"t": 0.1}),
+                make_key(b"img", "prompt", "model 2", {"t": 0.1}),
+                make_key(b"img", "prompt", "model", {"t": 0.2})}) == 5
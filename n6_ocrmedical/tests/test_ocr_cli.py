@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import ocr_cli
+from fake_lmstudio import FakeLMStudio
+
+
+@pytest.fixture
+def server():
+    with FakeLMStudio(latency_ms=5, tps=5000, tokens=20) as srv:
+        yield srv
+
+
+def make_images(folder, n):
+    folder.mkdir()
+    for i in range(n):
+        (folder / f"scan_{i}.png").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes([i]) * 64)
+    return sorted(str(p) for p in folder.iterdir())
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_resume_after_kill_mid_line_skips_done_and_keeps_jsonl_valid(server, tmp_path):
+    paths = make_images(tmp_path / "raw", 3)
+    out = tmp_path / "out.jsonl"
+    done = json.dumps({"path": paths[0], "text": "ok", "error": None}, ensure_ascii=False)
+    out.write_text(done + "\n" + '{"path": "' + paths[1] + '", "te', encoding="utf-8")  # bị kill giữa dòng
+
+    rc = ocr_cli.main([str(tmp_path / "raw"), "-o", str(out), "-j", "2", "--resume",
+                       "--base-url", server.base_url, "--retries", "0"])
+    assert rc == 0
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert lines[1].endswith('"te')  # dòng dở giữ nguyên, không dính vào bản ghi mới
+    records = [json.loads(l) for l in lines[:1] + lines[2:]]
+    assert sorted(r["path"] for r in records) == paths
+    assert all(r["error"] is None and r["text"] for r in records)
+
+
+def test_resume_on_complete_file_does_not_add_blank_line(server, tmp_path):
+    paths = make_images(tmp_path / "raw", 2)
+    out = tmp_path / "out.jsonl"
+    args = [str(tmp_path / "raw"), "-o", str(out), "-j", "1", "--base-url", server.base_url]
+    assert ocr_cli.main(args) == 0
+    first = out.read_text(encoding="utf-8").splitlines(keepends=True)[0]
+    out.write_text(first, encoding="utf-8")  # lần trước dừng sau 1 ảnh, dòng cuối đầy đủ
+
+    assert ocr_cli.main(args + ["--resume"]) == 0
+    assert len(read_records(out)) == 2
+    assert "\n\n" not in out.read_text(encoding="utf-8")
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+from ocr_tiling import crop_bands, merge_band_texts, plan_bands, should_tile
+
+
+def test_short_image_is_one_band():
+    assert plan_bands(1000, 700) == [(0, 700)]
+    assert not should_tile(1000, 700)
+
+
+def test_tall_image_bands_cover_it_with_overlap():
+    bands = plan_bands(1000, 3000, band_ratio=0.6, overlap=0.12)
+    assert len(bands) > 1 and should_tile(1000, 3000)
+    assert bands[0][0] == 0 and bands[-1][1] == 3000
+    for (top, bottom), (next_top, _) in zip(bands, bands[1:]):
+        assert bottom - top == 600
+        assert bottom - next_top == 600 - int(600 * 0.88)  # vùng chồng giữa 2 dải liền nhau
+
+
+def test_short_leftover_is_merged_into_last_band():
+    bands = plan_bands(1000, 1160, band_ratio=0.6, overlap=0.0)  # 600 + 560: cả 2 dải đủ cao
+    assert bands == [(0, 600), (600, 1160)]
+    bands = plan_bands(1000, 1300, band_ratio=0.6, overlap=0.0)  # mẩu cuối 100 px < 25% dải
+    assert bands == [(0, 600), (600, 1300)]
+
+
+def test_merge_drops_lines_repeated_in_overlap():
+    top = "KẾT QUẢ XÉT NGHIỆM\nHọ tên: Nguyễn Văn A\nGlucose  5.6 mmol/L\nUre 4.1 mmol/L"
+    bottom = "glucose 5.6 mmol/L\n\nUre  4.1 mmol/L\nCreatinin 80 umol/L"  # OCR lại khác hoa/thường, khoảng trắng
+    assert merge_band_texts([top, bottom]) == (
+        "KẾT QUẢ XÉT NGHIỆM\nHọ tên: Nguyễn Văn A\nGlucose  5.6 mmol/L\nUre 4.1 mmol/L\nCreatinin 80 umol/L")
+
+
+def test_merge_keeps_everything_without_overlap():
+    # dải trắng (model trả text rỗng) không thêm dòng trống
+    assert merge_band_texts(["Dòng 1\nDòng 2", "Dòng 3", "", "Dòng 4"]) == "Dòng 1\nDòng 2\nDòng 3\nDòng 4"
+
+
+def test_merge_only_matches_tail_against_head():
+    # dòng trùng nằm giữa dải dưới (không phải ở đầu dải) không bị coi là vùng chồng
+    assert merge_band_texts(["A\nGlucose 5.6", "B\nGlucose 5.6\nC"]) == "A\nGlucose 5.6\nB\nGlucose 5.6\nC"
+
+
+def test_crop_bands_follows_plan():
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGBA", (500, 1500), (255, 255, 255, 0)).save(buf, "PNG")
+    bands = crop_bands(buf.getvalue(), band_ratio=0.6, overlap=0.12)
+    plan = plan_bands(500, 1500, band_ratio=0.6, overlap=0.12)
+    assert len(bands) == len(plan) > 1
+    for png, (top, bottom) in zip(bands, plan):
+        with Image.open(io.BytesIO(png)) as im:
+            assert im.size == (500, bottom - top) and im.mode == "RGB"
@@ -0,0 +1,78 @@
+import io, threading, time
+
+import pytest
+
+import lmstudio_client
+import page_source
+from lmstudio_client import OCRClient
+from page_source import count_pages, is_document, iter_pages
+
+Image = pytest.importorskip("PIL.Image")
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255)]
+
+
+@pytest.fixture
+def tiff(tmp_path):
+    p = tmp_path / "scan.tiff"
+    frames = [Image.new("RGB", (40, 60), c) for c in COLORS]
+    frames[0].save(p, save_all=True, append_images=frames[1:])
+    return str(p)
+
+
+def page_color(png):
+    with Image.open(io.BytesIO(png)) as im:
+        return im.convert("RGB").getpixel((0, 0))
+
+
+def test_tiff_pages_stream_in_order(tiff):
+    assert is_document(tiff) and not is_document("scan.jpg")
+    assert count_pages(tiff) == len(COLORS)
+    pages = list(iter_pages(tiff))
+    assert [n for n, _ in pages] == [1, 2, 3, 4, 5]
+    assert [page_color(png) for _, png in pages] == COLORS
+
+
+def test_pdf_pages_stream_in_order(tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+    p = str(tmp_path / "report.pdf")
+    doc = pymupdf.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"Trang {i + 1}")
+    doc.save(p)
+    doc.close()
+    assert count_pages(p) == 3
+    pages = list(iter_pages(p, dpi=50))
+    assert [n for n, _ in pages] == [1, 2, 3]
+    assert all(png.startswith(b"\x89PNG") for _, png in pages)
+
+
+def test_ocr_document_reports_pages_in_order_with_bounded_lookahead(tiff, monkeypatch):
+    rastered, reported = [], []
+    lock = threading.Lock()
+    real_iter = page_source.iter_pages
+
+    def counting_iter(path, *args, **kw):
+        for page_no, png in real_iter(path, *args, **kw):
+            with lock:
+                rastered.append(page_no)
+                assert len(rastered) - len(reported) <= 2  # chỉ max_workers trang đã raster chưa xong
+            yield page_no, png
+    monkeypatch.setattr(lmstudio_client, "iter_pages", counting_iter)
+
+    client = OCRClient(base_url="http://127.0.0.1:1/v1", preprocessor=None)
+
+    def fake_ocr_bytes(png, mime, prompt, use_cache=True, label="", **kw):
+        page_no = int(label.rsplit("#page", 1)[1])
+        time.sleep(0.05 if page_no % 2 else 0.0)  # trang lẻ xong sau trang chẵn kế tiếp
+        return f"text {page_no} {page_color(png)}"
+    monkeypatch.setattr(client, "ocr_bytes", fake_ocr_bytes)
+
+    def on_page(page_no, total, text):
+        with lock:
+            reported.append((page_no, total))
+
+    text = client.ocr_document(tiff, "prompt", on_page=on_page, max_workers=2)
+    assert reported == [(n, 5) for n in range(1, 6)]
+    assert text == "\n\n".join(f"--- Page {n} ---\ntext {n} {c}" for n, c in enumerate(COLORS, 1))
+    client.close()
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+pytest.importorskip("PySide6")
+from PySide6.QtWidgets import QApplication
+
+import Ocr_App
+from job_manager import BACKGROUND, INTERACTIVE, PREFETCH
+
+
+@pytest.fixture
+def dashboard(stores, monkeypatch):
+    app = QApplication.instance() or QApplication([])
+    w = Ocr_App.MainWindow()
+    d = w.dashboard
+    gate = threading.Event()
+    calls = []
+
+    def fake_result_job(job, image_path, prompt, stream=False, **kw):
+        calls.append((job.priority, image_path, stream))
+        gate.wait(5)
+        return "text"
+    monkeypatch.setattr(Ocr_App, "result_job", fake_result_job)
+    d.jobs.set_background_workers(1)
+    d.jobs.submit(lambda job: gate.wait(5), BACKGROUND)  # giữ làn batch -> job PREFETCH nằm chờ
+    d.calls = calls
+    yield d
+    gate.set()
+    d.jobs.cancel_all()
+    d.jobs.background_pool.waitForDone(5000)
+    d.jobs.interactive_pool.waitForDone(5000)
+    w.close()
+
+
+def add_rows(d, tmp_path, n, status="Ready"):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"scan_{i}.jpg"
+        p.write_bytes(f"image {i}".encode())
+        paths.append(str(p))
+    d.add_files(paths)
+    for r in range(n):
+        d.file_model.set_status(r, status, "≈ other.jpg (99%)" if status == "Duplicate" else None)
+    return paths
+
+
+def select(d, row):
+    d.file_list.setCurrentIndex(d.file_model.index(row))
+    d.prefetch_chk.setChecked(True)
+    d.prefetch_selection()
+
+
+def test_withdraw_only_takes_jobs_that_have_not_started(dashboard):
+    queued = dashboard.jobs.submit(lambda job: None, PREFETCH)
+    assert dashboard.jobs.withdraw(queued)
+    assert not dashboard.jobs.is_active(queued)
+    assert not dashboard.jobs.withdraw(queued)
+
+
+def test_result_click_resubmits_queued_prefetch_as_interactive_stream(dashboard, tmp_path):
+    d = dashboard
+    paths = add_rows(d, tmp_path, 1)
+    select(d, 0)
+    prefetch_id = d._prefetch[paths[0]]
+    assert d.jobs.is_active(prefetch_id)
+
+    d.on_result_clicked()
+    assert not d.jobs.is_active(prefetch_id)
+    assert d._result_job != prefetch_id and d.jobs.is_active(d._result_job)
+    assert d.jobs.pending(INTERACTIVE) == 1 and d.jobs.pending(PREFETCH) == 0
+    d.jobs.interactive_pool.waitForDone(200)
+    assert d.calls == [(INTERACTIVE, paths[0], Ocr_App.OCR_STREAM)]
+
+
+def test_cancelled_prefetch_restores_duplicate_status(dashboard, tmp_path):
+    d = dashboard
+    add_rows(d, tmp_path, 2, status="Duplicate")
+    select(d, 0)
+    assert d.jobs.pending(PREFETCH) == 2
+
+    d.prefetch_chk.setChecked(False)  # -> _cancel_prefetch
+    assert d.jobs.pending(PREFETCH) == 0
+    assert [d.file_model.status(r) for r in range(2)] == ["Duplicate", "Duplicate"]
+    assert d.file_model.error(0) == "≈ other.jpg (99%)"
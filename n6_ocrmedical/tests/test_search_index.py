@@ -0,0 +1,52 @@
+import pytest
+
+from search_index import SearchIndex, build_query
+
+
+@pytest.fixture
+def index():
+    idx = SearchIndex(":memory:")
+    yield idx
+    idx.close()
+
+
+def paths(hits):
+    return [h.path for h in hits]
+
+
+def test_build_query_prefixes_only_last_term():
+    assert build_query("xét  nghiem glu") == '"xét" "nghiem" "glu"*'
+    assert build_query(" -- ") is None
+
+
+def test_multi_term_query_requires_all_terms(index):
+    index.add_many([
+        ("/a.jpg", "Kết quả xét nghiệm Glucose 5.6 mmol/L Ure 4.1", 1.0, None),
+        ("/b.jpg", "Kết quả xét nghiệm Glucose 6.0 mmol/L", 2.0, None),
+        ("/c.jpg", "Ure 3.9 Creatinin 80", 3.0, None),
+    ])
+    assert paths(index.search("glucose ure")) == ["/a.jpg"]
+    assert paths(index.search("xet nghiem glu")) == ["/b.jpg", "/a.jpg"]  # không dấu, từ cuối là prefix
+    assert index.search("glu ure") == []  # từ đã gõ xong khớp nguyên từ
+
+
+def test_patient_id_and_name_rank_above_body(index):
+    index.add_many([
+        ("/scan/BN1234.jpg", "Glucose 5.6", 1.0, "P0001"),
+        ("/scan/other.jpg", "Mã BN: BN1234 Glucose 6.1", 2.0, None),
+        ("/scan/latest.jpg", "Ghi chú: xem lại BN1234, Glucose 7.0", 3.0, "P0003"),
+    ])
+    hits = index.search("bn1234 glucose")
+    assert paths(hits) == ["/scan/other.jpg", "/scan/BN1234.jpg", "/scan/latest.jpg"]
+    assert hits[0].patient_id == "BN1234"
+    assert "[BN1234]" in hits[0].snippet and "[Glucose]" in hits[0].snippet
+
+
+def test_multi_term_candidates_bounded_to_newest_window():
+    index = SearchIndex(":memory:", rank_window=5)
+    # khớp mã bệnh nhân (hạng cao nhất) nhưng nằm ngoài 5 tài liệu mới nhất -> không được xét
+    index.add_many([("/old-pid.jpg", "Glucose Ure", 0.0, "GLUCOSE1")]
+                   + [(f"/{i:02d}.jpg", f"Glucose {i} Ure {i}", float(i), None) for i in range(1, 21)])
+    hits = index.search("ure glucose")
+    assert paths(hits) == [f"/{i:02d}.jpg" for i in range(20, 15, -1)]
+    index.close()